@@ -0,0 +1,419 @@
+"""Offline batch jobs: JSONL of {id, tool, input} in, JSONL of results out
+
+Records whose tool maps its input to a single model prompt (see
+@tool_prompt) are submitted in bulk in the OpenAI Batch API format and
+polled until the provider finishes; everything else runs locally. Each
+result is appended to the output file as {"id", "output"} or
+{"id", "error"} as soon as it is known.
+
+Batched prompts go to the model of their preferred route (see
+routing.py), and their answers are cached under it, as ai_call would.
+
+Runs are resumable: submitted batches are recorded in state before
+polling starts, so a re-run with the same output file picks them up
+instead of resubmitting, and records already answered are skipped.
+Records that failed, or were answered by the stub fallback while the
+model was unavailable (written with "source": "stub"), are retried on
+the next run.
+"""
+import json
+import os
+import time
+from vibe_coding import utils
+from vibe_coding.utils import TOOLS, AIText, get_state, transact_state
+
+BATCH_DIR = "agent_batches"
+BATCH_SIZE = int(os.getenv("AGENT_BATCH_SIZE", 1000))
+POLL_INTERVAL = float(os.getenv("AGENT_BATCH_POLL_SECONDS", 30))
+# Consecutive poll errors after which a batch is left for the next run
+MAX_POLL_ERRORS = 5
+
+# State key holding {output path: [submitted batch jobs]}
+JOBS_KEY = "batch_jobs"
+ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def batch_model(prompt):
+    """The model a batched prompt is sent to and cached under"""
+    from vibe_coding.routing import get_router
+
+    return get_router().preferred(prompt).model
+
+
+def request_line(custom_id, prompt):
+    """One Batch API request for prompt"""
+    return {"custom_id": custom_id, "method": "POST", "url": ENDPOINT,
+            "body": {"model": batch_model(prompt), "messages": utils.chat_messages(prompt)}}
+
+
+# ----------------------
+# Backends
+# ----------------------
+class OpenAIBatchBackend:
+    """Bulk submission through the OpenAI Batch API"""
+
+    name = "openai"
+
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, requests_file):
+        """Upload a requests JSONL file and start a batch; return its id"""
+        with open(requests_file, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(input_file_id=uploaded.id, endpoint=ENDPOINT,
+                                           completion_window="24h")
+        return batch.id
+
+    def poll(self, batch_id):
+        """Return (status, output lines), with lines None until the batch ends"""
+        batch = self.client.batches.retrieve(batch_id)
+        if batch.status not in TERMINAL_STATUSES:
+            return batch.status, None
+        lines = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                lines.extend(self.client.files.content(file_id).text.splitlines())
+        return batch.status, [json.loads(line) for line in lines if line.strip()]
+
+
+class LocalBatchBackend:
+    """File-based stand-in for the Batch API
+
+    Submitting copies the requests into BATCH_DIR; the first poll answers
+    them with ai_call and writes an output file in the Batch API format.
+    """
+
+    name = "local"
+
+    def __init__(self, directory=None):
+        self.directory = directory or BATCH_DIR
+
+    def _path(self, batch_id, kind):
+        return os.path.join(self.directory, f"{batch_id}.{kind}.jsonl")
+
+    def submit(self, requests_file):
+        import shutil
+        import uuid
+
+        os.makedirs(self.directory, exist_ok=True)
+        batch_id = f"local-{uuid.uuid4().hex}"
+        shutil.copyfile(requests_file, self._path(batch_id, "input"))
+        return batch_id
+
+    def poll(self, batch_id):
+        output_file = self._path(batch_id, "output")
+        if not os.path.exists(output_file):
+            if not os.path.exists(self._path(batch_id, "input")):
+                return "expired", []
+            self._process(batch_id)
+        with open(output_file, "r") as f:
+            return "completed", [json.loads(line) for line in f if line.strip()]
+
+    def _process(self, batch_id):
+        output_file = self._path(batch_id, "output")
+        tmp_file = f"{output_file}.{os.getpid()}.tmp"
+        with open(self._path(batch_id, "input"), "r") as src, open(tmp_file, "w") as dst:
+            for line in src:
+                request = json.loads(line)
+                prompt = request["body"]["messages"][-1]["content"]
+                try:
+                    content = utils.ai_call(prompt)
+                except Exception as e:
+                    result = {"response": None, "error": {"message": str(e)}}
+                else:
+                    message = {"role": "assistant", "content": content}
+                    body = {"choices": [{"message": message}],
+                            "source": getattr(content, "source", "model")}
+                    result = {"response": {"status_code": 200, "body": body}, "error": None}
+                dst.write(json.dumps({"custom_id": request["custom_id"], **result}) + "\n")
+        os.replace(tmp_file, output_file)
+
+
+def get_backend(name=None):
+    """Return the named backend (default: OpenAI when a key is set, else local)"""
+    from vibe_coding.client import get_client
+
+    if name is None:
+        name = "openai" if get_client() else "local"
+    if name == "local":
+        return LocalBatchBackend()
+    client = get_client()
+    if client is None:
+        raise ValueError("The openai batch backend needs OPENAI_API_KEY")
+    return OpenAIBatchBackend(client)
+
+
+# ----------------------
+# Input and output files
+# ----------------------
+def read_records(path):
+    """Return valid {id, tool, input} records, warning about bad lines"""
+    records = []
+    seen = set()
+    with open(path, "r") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                key = json.dumps(record["id"])
+                record["tool"], record["input"]
+            except (ValueError, TypeError, KeyError):
+                print(f"Skipping line {number}: expected a JSON object with id, tool and input")
+                continue
+            if key in seen:
+                print(f"Skipping line {number}: duplicate id {record['id']!r}")
+                continue
+            seen.add(key)
+            records.append(record)
+    return records
+
+
+def _read_results(path):
+    """Return {id key: result} from an output file, last line per id winning"""
+    results = {}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                    results[json.dumps(result["id"])] = result
+                except (ValueError, KeyError, TypeError):
+                    continue  # torn last line from an interrupted run
+    return results
+
+
+def _terminate_last_line(path):
+    """Fence off a torn final line so appended results start on a new one"""
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return
+    with open(path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def _finalize_output(path, records):
+    """Rewrite the output with one line per id, in input order"""
+    results = _read_results(path)
+    ordered = [results.pop(json.dumps(record["id"])) for record in records
+               if json.dumps(record["id"]) in results]
+    ordered.extend(results.values())
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        for result in ordered:
+            f.write(json.dumps(result) + "\n")
+    os.replace(tmp_file, path)
+    return ordered
+
+
+# ----------------------
+# Running a batch
+# ----------------------
+class BatchRun:
+    """One `agent batch` run over an input file"""
+
+    def __init__(self, input_file, output_file, backend=None, batch_size=None,
+                 poll_interval=None):
+        self.input_file = input_file
+        self.output_file = output_file
+        self.backend_name = backend
+        self.batch_size = batch_size or BATCH_SIZE
+        self.poll_interval = POLL_INTERVAL if poll_interval is None else poll_interval
+        self.key = os.path.abspath(output_file)
+        self.backends = {}
+        self.records = {}
+        self.out = None
+
+    def backend(self, name=None):
+        name = name or self.backend_name
+        if name not in self.backends:
+            self.backends[name] = get_backend(name)
+        return self.backends[name]
+
+    def write(self, record_id, output=None, error=None):
+        result = {"id": record_id}
+        if error is None:
+            result["output"] = output
+            # Stub answers are kept but not counted as done (see run())
+            if getattr(output, "source", None) == "stub":
+                result["source"] = "stub"
+        else:
+            result["error"] = error
+        self.out.write(json.dumps(result) + "\n")
+        self.out.flush()
+
+    def save_jobs(self, jobs):
+        def merge(state):
+            all_jobs = dict(state.get(JOBS_KEY, {}))
+            if jobs:
+                all_jobs[self.key] = jobs
+            else:
+                all_jobs.pop(self.key, None)
+            return {JOBS_KEY: all_jobs}
+
+        transact_state(merge)
+
+    def run(self):
+        """Answer every record not already in the output file"""
+        records = read_records(self.input_file)
+        self.records = {json.dumps(record["id"]): record for record in records}
+        done = {key for key, result in _read_results(self.output_file).items()
+                if "error" not in result and result.get("source") != "stub"}
+        jobs = list(get_state(JOBS_KEY, {}).get(self.key, []))
+        in_flight = {json.dumps(record_id) for job in jobs for record_id in job["ids"]}
+        skip = done | in_flight
+        todo = [record for record in records if json.dumps(record["id"]) not in skip]
+        print(f"{len(records)} records: {len(done)} already done, "
+              f"{len(in_flight)} in submitted batches, {len(todo)} to run")
+
+        _terminate_last_line(self.output_file)
+        with open(self.output_file, "a") as self.out:
+            local, prompts = self.plan(todo)
+            # Submit first so the provider works while local records run
+            for start in range(0, len(prompts), self.batch_size):
+                job = self.submit(prompts[start:start + self.batch_size])
+                if job:
+                    jobs.append(job)
+                    self.save_jobs(jobs)
+            self.run_local(local)
+            self.wait(jobs)
+
+        results = _finalize_output(self.output_file, records)
+        errors = sum(1 for result in results if "error" in result)
+        stubs = sum(1 for result in results if result.get("source") == "stub")
+        print(f"Wrote {len(results)} results ({errors} errors, {stubs} stubs) "
+              f"to {self.output_file}")
+        if jobs:
+            print(f"{len(jobs)} batches still running; re-run to collect them")
+
+    def plan(self, records):
+        """Split records into local ones and (record, prompt) pairs to batch"""
+        from vibe_coding.cache import get_cache
+
+        cache = get_cache()
+        local, prompts = [], []
+        for record in records:
+            entry = TOOLS.get(record["tool"])
+            if not entry:
+                self.write(record["id"], error=f"Tool not found: {record['tool']}")
+                continue
+            try:
+                prompt = entry["prompt"](record["input"]) if "prompt" in entry else None
+            except Exception as e:
+                # e.g. an input of the wrong type; the other records still run
+                self.write(record["id"], error=f"bad input: {e}")
+                continue
+            if prompt is None:
+                local.append(record)
+                continue
+            found = (cache.lookup(batch_model(prompt), utils.SYSTEM_PROMPT, prompt)
+                     if cache else None)
+            if found and found.value is not None:
+                self.write(record["id"], found.value)
+            else:
+                prompts.append((record, prompt))
+        return local, prompts
+
+    def submit(self, group):
+        """Submit one bulk request; return its job record, or None on failure"""
+        requests_file = f"{self.output_file}.{os.getpid()}.requests"
+        try:
+            with open(requests_file, "w") as f:
+                for i, (record, prompt) in enumerate(group):
+                    f.write(json.dumps(request_line(str(i), prompt)) + "\n")
+            backend = self.backend()
+            batch_id = backend.submit(requests_file)
+        except Exception as e:
+            print(f"Could not submit batch ({e}); its records will be retried next run")
+            for record, _ in group:
+                self.write(record["id"], error=f"submit failed: {e}")
+            return None
+        finally:
+            if os.path.exists(requests_file):
+                os.remove(requests_file)
+
+        print(f"Submitted batch {batch_id} ({len(group)} requests)")
+        return {"id": batch_id, "backend": backend.name,
+                "ids": [record["id"] for record, _ in group]}
+
+    def run_local(self, records):
+        """Run records whose tools cannot be batched, concurrently"""
+        from vibe_coding.fanout import run_many
+
+        def job(record):
+            return TOOLS[record["tool"]]["fn"](record["input"])
+
+        def on_result(record, output, error):
+            if error:
+                self.write(record["id"], error=str(error))
+            else:
+                self.write(record["id"], output)
+
+        if records:
+            run_many(records, job, on_result)
+
+    def wait(self, jobs):
+        """Poll submitted batches until each finishes, collecting results"""
+        errors = {}
+        while jobs:
+            for job in list(jobs):
+                try:
+                    status, lines = self.backend(job["backend"]).poll(job["id"])
+                except Exception as e:
+                    errors[job["id"]] = errors.get(job["id"], 0) + 1
+                    print(f"Polling batch {job['id']} failed ({e})")
+                    if errors[job["id"]] >= MAX_POLL_ERRORS:
+                        return  # left in state for the next run
+                    continue
+                if lines is None:
+                    print(f"Batch {job['id']}: {status}")
+                    continue
+                self.collect(job, status, lines)
+                jobs.remove(job)
+                self.save_jobs(jobs)
+            if jobs:
+                time.sleep(self.poll_interval)
+
+    def collect(self, job, status, lines):
+        """Write the results of a finished batch, caching model responses"""
+        from vibe_coding.cache import cache_key, get_cache, signature
+
+        cache = get_cache()
+        answered = set()
+        for line in lines:
+            try:
+                index = int(line["custom_id"])
+                record_id = job["ids"][index]
+            except (KeyError, ValueError, IndexError, TypeError):
+                continue
+            answered.add(index)
+            response = line.get("response") or {}
+            body = response.get("body") or {}
+            if line.get("error") or response.get("status_code") != 200:
+                error = line.get("error") or body.get("error") or {}
+                message = error.get("message") or f"HTTP {response.get('status_code')}"
+                self.write(record_id, error=message)
+                continue
+            try:
+                content = body["choices"][0]["message"]["content"]
+            except (KeyError, IndexError, TypeError):
+                self.write(record_id, error="malformed batch result")
+                continue
+            source = body.get("source", "model")
+            if source == "stub":
+                content = AIText(content, "stub")
+            record = self.records.get(json.dumps(record_id))
+            if cache and record and source == "model":
+                prompt = TOOLS[record["tool"]]["prompt"](record["input"])
+                model = batch_model(prompt)
+                sig = (signature(model, utils.SYSTEM_PROMPT, prompt)
+                       if cache.similar_threshold else None)
+                cache.put(cache_key(model, utils.SYSTEM_PROMPT, prompt), content, sig)
+            self.write(record_id, content)
+
+        for index, record_id in enumerate(job["ids"]):
+            if index not in answered:
+                self.write(record_id, error=f"batch {status} without a result")
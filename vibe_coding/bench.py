@@ -0,0 +1,389 @@
+"""Micro-benchmarks for the CPU and I/O hot paths
+
+Every benchmark runs on seeded synthetic text, so two runs with the same
+--seed and sizes measure exactly the same work. Results are written as
+JSON (bench_output.txt by default) and can be compared across revisions:
+
+    git checkout main && python -m vibe_coding.bench run --output base.json
+    git checkout my-branch && python -m vibe_coding.bench run --compare base.json
+
+`run --compare` (or `compare OLD NEW`) exits with status 1 when any
+benchmark got slower than the threshold allows.
+
+Corpus sizes go from 1 KB up to --max-size (32 MB by default; pass
+--max-size 1G for the full ladder). ai_call is stubbed out, so nothing
+here touches the network.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+OUTPUT_FILE = "bench_output.txt"
+SIZES = [1 << 10, 1 << 15, 1 << 20, 1 << 25, 1 << 30]
+DEFAULT_MAX_SIZE = 1 << 25
+
+# In-memory benchmarks (whole text as one string) stop at this size;
+# larger corpora only go through the streaming paths
+IN_MEMORY_MAX = 1 << 25
+
+# A benchmark regresses when it is this much slower than the baseline...
+REGRESSION_THRESHOLD = 0.2
+# ...and slower by at least this many seconds, to ignore timer noise
+NOISE_FLOOR = 0.001
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_WORDS = (
+    "fix update review deploy write test refactor check merge document "
+    "the a new old broken flaky slow cache state server client parser "
+    "config build release endpoint handler query index report module "
+    "before after during today tomorrow quickly carefully again"
+).split()
+
+
+# ----------------------
+# Synthetic corpora
+# ----------------------
+def iter_corpus(size, seed=0, block_size=1 << 20):
+    """Yield exactly size bytes of ASCII sentence text in blocks
+
+    Sentences are drawn from a seeded pool, so the text is identical for
+    the same (size, seed) and cheap to produce even at 1 GB.
+    """
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(4096):
+        words = rng.choices(_WORDS, k=rng.randint(3, 12))
+        pool.append(" ".join(words).capitalize() + ". ")
+    per_block = block_size // 40 + 1  # sentences average ~45 bytes
+
+    remaining = size
+    while remaining > 0:
+        block = "".join(rng.choices(pool, k=per_block))[:remaining]
+        remaining -= len(block)
+        yield block
+
+
+def make_corpus(size, seed=0):
+    """Return a seeded corpus of size bytes as one string"""
+    return "".join(iter_corpus(size, seed))
+
+
+def write_corpus(path, size, seed=0):
+    """Write a seeded corpus of size bytes to path"""
+    with open(path, "w") as f:
+        for block in iter_corpus(size, seed):
+            f.write(block)
+    return path
+
+
+def parse_size(text):
+    """Parse sizes such as 4096, 32K, 1M or 1G"""
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def format_size(size):
+    for unit, scale in (("G", 1 << 30), ("M", 1 << 20), ("K", 1 << 10)):
+        if size >= scale and size % scale == 0:
+            return f"{size // scale}{unit}"
+    return str(size)
+
+
+# ----------------------
+# Timing
+# ----------------------
+def best_of(fn, repeat, setup=None):
+    """Return the fastest of repeat timed calls to fn (after setup, untimed)"""
+    best = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _result(name, size, seconds, **extra):
+    result = {"name": name, "size": size, "seconds": seconds}
+    if size and seconds:
+        result["mb_per_s"] = size / seconds / (1 << 20)
+    result.update(extra)
+    return result
+
+
+# ----------------------
+# Benchmarks
+# ----------------------
+def bench_todos(sizes, seed, repeat, work_dir):
+    """generate_todos on in-memory text and iter_todos_file on disk"""
+    from vibe_coding.tools.todo import generate_todos, iter_todos_file
+
+    results = []
+    for size in sizes:
+        if size <= IN_MEMORY_MAX:
+            text = make_corpus(size, seed)
+            seconds = best_of(lambda: generate_todos(text), repeat)
+            results.append(_result("todo.generate_todos", size, seconds))
+            del text
+
+        path = write_corpus(os.path.join(work_dir, f"todo-{size}.txt"), size, seed)
+        seconds = best_of(lambda: sum(1 for _ in iter_todos_file(path)), repeat)
+        results.append(_result("todo.iter_todos_file", size, seconds))
+        os.remove(path)
+    return results
+
+
+def bench_state(sizes, seed, repeat, work_dir):
+    """save_state, update_state and load_state as the state file grows"""
+    from vibe_coding import utils
+
+    results = []
+    state_file = os.path.join(work_dir, "agent_state.json")
+    with patch.object(utils, "STATE_FILE", state_file):
+        for size in sizes:
+            if size > IN_MEMORY_MAX:
+                continue
+            # ~1 KB values, like summaries and todo lists
+            value_size = min(size, 1 << 10)
+            corpus = make_corpus(value_size, seed)
+            state = {f"file-{i}.txt": corpus for i in range(max(1, size // value_size))}
+
+            def reset():
+                if os.path.exists(state_file):
+                    os.remove(state_file)
+
+            seconds = best_of(lambda: utils.save_state(state), repeat, setup=reset)
+            results.append(_result("state.save_state", size, seconds))
+
+            seconds = best_of(lambda: utils.update_state({"file-0.txt": "changed"}), repeat)
+            results.append(_result("state.update_state", size, seconds))
+
+            seconds = best_of(utils.load_state, repeat)
+            results.append(_result("state.load_state", size, seconds))
+            reset()
+    return results
+
+
+def bench_cold_start(seed, repeat, work_dir):
+    """Wall time of fresh interpreters importing the CLI and running `todo`"""
+    env = dict(os.environ, PYTHONPATH=PACKAGE_ROOT, OPENAI_API_KEY="")
+    path = write_corpus(os.path.join(work_dir, "cold.txt"), 1 << 10, seed)
+    commands = {
+        "cli.import": [sys.executable, "-c", "import vibe_coding.cli"],
+        "cli.todo": [sys.executable, "-m", "vibe_coding.cli", "--no-daemon", "todo", path],
+    }
+
+    results = []
+    for name, argv in commands.items():
+        seconds = best_of(lambda: subprocess.run(argv, cwd=work_dir, env=env, check=True,
+                                                 stdout=subprocess.DEVNULL), repeat)
+        results.append(_result(name, 0, seconds))
+    return results
+
+
+def bench_orchestrator(sizes, seed, repeat, runs=100):
+    """Orchestrator and scheduler overhead with ai_call stubbed out"""
+    from vibe_coding import utils
+    from vibe_coding.orchestrator import run_tools
+
+    results = []
+    with patch.object(utils, "ai_call", utils._stub):
+        small = make_corpus(1 << 10, seed)
+        seconds = best_of(lambda: [run_tools(small) for _ in range(runs)], repeat)
+        results.append(_result("orchestrator.per_run", 0, seconds / runs))
+
+        for size in sizes:
+            if size > IN_MEMORY_MAX:
+                continue
+            text = make_corpus(size, seed)
+            seconds = best_of(lambda: run_tools(text), repeat)
+            results.append(_result("orchestrator.run_tools", size, seconds))
+    return results
+
+
+def bench_extractive(sizes, seed, repeat):
+    """The local extractive summarizer (the `--summarizer local` backend)"""
+    from vibe_coding import extractive
+
+    results = []
+    for size in sizes:
+        if size > IN_MEMORY_MAX:
+            continue
+        text = make_corpus(size, seed)
+        seconds = best_of(lambda: extractive.summarize(text), repeat)
+        results.append(_result("extractive.summarize", size, seconds))
+    return results
+
+
+def bench_workers(sizes, seed, repeat, work_dir):
+    """todo on one file split across 1 and cpu_count() worker processes"""
+    from vibe_coding import workers
+
+    counts = sorted({1, os.cpu_count() or 1})
+    configured = workers.WORKERS
+    results = []
+    try:
+        for size in sizes:
+            if size < workers.PARTITION_MIN_BYTES:
+                continue
+            path = write_corpus(os.path.join(work_dir, f"workers-{size}.txt"), size, seed)
+            for count in counts:
+                workers.configure(count)
+                workers.run_file("todo", path)  # start the pool outside the timing
+                seconds = best_of(lambda: workers.run_file("todo", path), repeat)
+                results.append(_result(f"workers.run_file[{count}]", size, seconds))
+            os.remove(path)
+    finally:
+        workers.configure(configured)
+    return results
+
+
+def run_benchmarks(max_size=DEFAULT_MAX_SIZE, seed=0, repeat=3, only=None):
+    """Run the suite and return a JSON-serializable report"""
+    sizes = [size for size in SIZES if size <= max_size]
+    work_dir = tempfile.mkdtemp(prefix="agent-bench-")
+    suites = {
+        "todo": lambda: bench_todos(sizes, seed, repeat, work_dir),
+        "state": lambda: bench_state(sizes, seed, repeat, work_dir),
+        "cold_start": lambda: bench_cold_start(seed, repeat, work_dir),
+        "orchestrator": lambda: bench_orchestrator(sizes, seed, repeat),
+        "extractive": lambda: bench_extractive(sizes, seed, repeat),
+        "workers": lambda: bench_workers(sizes, seed, repeat, work_dir),
+    }
+
+    results = []
+    try:
+        for name, suite in suites.items():
+            if only and name not in only:
+                continue
+            for result in suite():
+                print(_format_result(result), flush=True)
+                results.append(result)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def git_revision():
+    """Current commit (with a -dirty suffix for local changes), or None"""
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PACKAGE_ROOT,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               cwd=PACKAGE_ROOT, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return rev + ("-dirty" if dirty else "")
+
+
+# ----------------------
+# Reporting and comparison
+# ----------------------
+def _format_result(result):
+    size = format_size(result["size"]) if result["size"] else "-"
+    line = f"{result['name']:<24} {size:>6} {result['seconds'] * 1000:>12.3f} ms"
+    if "mb_per_s" in result:
+        line += f" {result['mb_per_s']:>10.1f} MB/s"
+    return line
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """Return (name, size, old, new) for benchmarks slower than threshold allows"""
+    old = {(r["name"], r["size"]): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        key = (result["name"], result["size"])
+        if key not in old:
+            continue
+        before, after = old[key], result["seconds"]
+        if after > before * (1 + threshold) and after - before > NOISE_FLOOR:
+            regressions.append((key[0], key[1], before, after))
+    return regressions
+
+
+def report_comparison(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """Print the comparison; return True when there are no regressions"""
+    regressions = compare(baseline, current, threshold)
+    print(f"\nCompared {baseline.get('revision')} -> {current.get('revision')} "
+          f"(threshold {threshold:.0%})")
+    for name, size, before, after in regressions:
+        size = format_size(size) if size else "-"
+        print(f"REGRESSION {name} {size}: {before * 1000:.3f} ms -> "
+              f"{after * 1000:.3f} ms ({after / before - 1:+.0%})")
+    if not regressions:
+        print("No regressions.")
+    return not regressions
+
+
+def load_report(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m vibe_coding.bench")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--max-size", type=parse_size, default=DEFAULT_MAX_SIZE,
+                            help="largest corpus, e.g. 1M or 1G (default: 32M)")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--repeat", type=int, default=3,
+                            help="runs per benchmark; the fastest is kept")
+    run_parser.add_argument("--only", action="append",
+                            choices=["todo", "state", "cold_start", "orchestrator", "extractive",
+                                     "workers"])
+    run_parser.add_argument("--output", default=OUTPUT_FILE)
+    run_parser.add_argument("--compare", metavar="BASELINE",
+                            help="report regressions against an earlier output file")
+    run_parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+
+    compare_parser = subparsers.add_parser("compare", help="compare two output files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    return parser
+
+
+def main(argv=None):
+    """Run or compare benchmarks; return the process exit status"""
+    args = build_parser().parse_args(argv)
+    if args.command == "compare":
+        ok = report_comparison(load_report(args.baseline), load_report(args.current),
+                               args.threshold)
+        return 0 if ok else 1
+
+    report = run_benchmarks(args.max_size, args.seed, args.repeat, args.only)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        return 0 if report_comparison(load_report(args.compare), report, args.threshold) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
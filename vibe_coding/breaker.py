@@ -0,0 +1,174 @@
+"""Per-call deadlines, hedged requests and circuit breakers for model calls
+
+Each model request gets DEADLINE seconds (`agent --deadline` or
+AGENT_DEADLINE), counted from when it is first sent and covering its
+retries and backoff; every attempt is sent with the time left as its
+timeout. A degraded API then costs at most one deadline per call instead
+of a read timeout per attempt.
+
+Latencies are kept per route and prompt size, in buckets that double
+from LATENCY_BUCKET_TOKENS estimated tokens, since a long prompt takes
+longer to answer. Once a bucket has HEDGE_MIN_SAMPLES successful
+latencies, a call of that size still unanswered after their
+HEDGE_PERCENTILE-th percentile sends one duplicate request and takes
+whichever answer arrives first.
+
+Each route also has a circuit breaker. After BREAKER_FAILURES calls in a
+row fail it opens, and calls go straight to the fallback (the stub, which
+summarize replaces with a local summary) without touching the API. After
+BREAKER_COOLDOWN seconds a single call is let through as a probe: if it
+succeeds the breaker closes, otherwise it stays open for another
+cooldown.
+"""
+import contextvars
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+DEADLINE = float(os.getenv("AGENT_DEADLINE", 60))
+
+# Hedge after this percentile of recent latencies (0 turns hedging off)
+HEDGE_PERCENTILE = float(os.getenv("AGENT_HEDGE_PERCENTILE", 95))
+# Latencies needed before the percentile is trusted
+HEDGE_MIN_SAMPLES = 20
+# Recent successful latencies kept per route and prompt size bucket
+LATENCY_SAMPLES = 200
+# Prompts under this many estimated tokens share the first latency
+# bucket; each later bucket covers prompts twice as large
+LATENCY_BUCKET_TOKENS = 256
+# Never hedge sooner than this; below it a duplicate only adds load
+HEDGE_MIN_SECONDS = 0.1
+
+BREAKER_FAILURES = int(os.getenv("AGENT_BREAKER_FAILURES", 5))
+BREAKER_COOLDOWN = float(os.getenv("AGENT_BREAKER_COOLDOWN", 30))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitBreaker:
+    """Failure state and recent latencies of one model route"""
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.latencies = {}
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may go to the API; the first call after the cooldown is the probe"""
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            # A probe that never reports back (e.g. an abandoned stream)
+            # is replaced by another one after the next cooldown
+            if now - self.opened_at >= BREAKER_COOLDOWN:
+                self.state = HALF_OPEN
+                self.opened_at = now
+                return True
+            return False
+
+    def record(self, ok, seconds=None, tokens=0):
+        """Record a finished call; seconds is its latency if it succeeded,
+        for a prompt of about tokens tokens
+        """
+        with self.lock:
+            if ok:
+                self.state = CLOSED
+                self.failures = 0
+                if seconds is not None:
+                    bucket = size_bucket(tokens)
+                    latencies = self.latencies.get(bucket)
+                    if latencies is None:
+                        latencies = self.latencies[bucket] = deque(maxlen=LATENCY_SAMPLES)
+                    latencies.append(seconds)
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= BREAKER_FAILURES:
+                if self.state != OPEN:
+                    print("Model API keeps failing — using the fallback "
+                          f"for {BREAKER_COOLDOWN:g}s before trying again.")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def hedge_delay(self, tokens=0):
+        """Seconds to wait before hedging a prompt of about tokens tokens,
+        or None while there are too few samples of its size
+        """
+        if HEDGE_PERCENTILE <= 0:
+            return None
+        with self.lock:
+            latencies = self.latencies.get(size_bucket(tokens), ())
+            if len(latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            latencies = sorted(latencies)
+        index = min(len(latencies) - 1, int(len(latencies) * HEDGE_PERCENTILE / 100))
+        return max(latencies[index], HEDGE_MIN_SECONDS)
+
+
+def size_bucket(tokens):
+    """Latency bucket of a prompt of about tokens estimated tokens"""
+    return (max(0, tokens) // LATENCY_BUCKET_TOKENS).bit_length()
+
+
+def get_breaker(name):
+    """Return the process-wide CircuitBreaker for route name"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker()
+        return breaker
+
+
+def reset():
+    """Forget every route's failures and latencies"""
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def hedged(send, hedge_after):
+    """Call send() and, if it has not answered within hedge_after seconds,
+    once more in parallel
+
+    Returns (result, hedged): the first result that is not None (None if
+    every attempt failed) and whether the duplicate was sent. send must
+    bound its own running time; the slower attempt is left to finish in
+    the background and its result is dropped.
+    """
+    results = queue.Queue()
+
+    def attempt():
+        try:
+            results.put(send())
+        except Exception:
+            results.put(None)
+
+    def start():
+        # Carry context variables (e.g. the daemon job's output) into the thread
+        threading.Thread(target=contextvars.copy_context().run, args=(attempt,),
+                         daemon=True).start()
+
+    start()
+    pending, duplicated, may_hedge = 1, False, True
+    while pending:
+        try:
+            result = results.get(timeout=hedge_after if may_hedge else None)
+        except queue.Empty:
+            start()
+            pending += 1
+            duplicated, may_hedge = True, False
+            continue
+        pending -= 1
+        # A failed first attempt was already retried; a duplicate would not help
+        may_hedge = False
+        if result is not None:
+            return result, duplicated
+    return None, duplicated
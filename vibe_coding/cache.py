@@ -0,0 +1,403 @@
+"""On-disk, content-addressed response cache for ai_call
+
+Besides exact lookups, the cache can answer prompts that are near
+duplicates of an earlier one (the same log with other timestamps, hosts
+or request ids). Each stored prompt keeps a SimHash signature of its
+normalized text (see vibe_coding.similarity); a lookup first tries an
+exact match on the normalized text, then multi-index block keys of the
+fingerprint, and accepts the closest stored prompt at or above
+SIMILAR_THRESHOLD.
+Only prompts sent with the same model and system message are candidates.
+"""
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from vibe_coding.similarity import (PROBES_PER_QUERY, blocks, from_signed, hamming, normalize,
+                                    probes, simhash, to_signed)
+
+CACHE_FILE = "agent_cache.db"
+CACHE_MAX_BYTES = int(os.getenv("AGENT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+CACHE_TTL = float(os.getenv("AGENT_CACHE_TTL", 0)) or None
+
+# Set to False (e.g. by `agent --no-cache`) to bypass the cache entirely
+ENABLED = not os.getenv("AGENT_NO_CACHE")
+
+# Minimum similarity (1 - differing fingerprint bits / 64) for a near-duplicate
+# prompt to reuse a cached response; 0 turns near-duplicate lookups off
+SIMILAR_THRESHOLD = float(os.getenv("AGENT_SIMILAR_THRESHOLD", 0))
+
+# Lookups probe every block value within max_distance // BLOCKS bits of the
+# prompt's (see vibe_coding.similarity), which grows quickly as the distance
+# does; lower thresholds are treated as this one (697 probes per block)
+MIN_SIMILAR_THRESHOLD = 0.8
+
+# Oldest entries read at a time while choosing what to evict
+_EVICT_BATCH = 64
+
+# Layout of the near-duplicate tables (PRAGMA user_version): 1 added the
+# model/system scope, 2 replaced threshold-sized bands with blocks
+_INDEX_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS signatures (
+    key TEXT PRIMARY KEY,
+    scope TEXT NOT NULL,
+    normalized TEXT NOT NULL,
+    fingerprint INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS signatures_normalized ON signatures (normalized);
+CREATE TABLE IF NOT EXISTS signature_bands (
+    scope TEXT NOT NULL,
+    band INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS signature_bands_lookup ON signature_bands (scope, band, value);
+CREATE INDEX IF NOT EXISTS signature_bands_key ON signature_bands (key);
+"""
+
+# A prompt's near-duplicate lookup keys: a hash of its normalized text
+# (model and system message included), a hash of the model and system
+# message alone (near duplicates are only looked for within it), its
+# SimHash and normalized length
+Signature = namedtuple("Signature", "normalized scope fingerprint length")
+
+# Result of ResponseCache.lookup(): value is None on a miss, similarity is
+# None for exact hits, and key/sig are what put() stores the answer under
+Lookup = namedtuple("Lookup", "key value similarity sig")
+
+
+def cache_key(model, system, prompt):
+    """Return a stable hash of (model, system message, prompt)"""
+    h = hashlib.sha256()
+    for part in (model, system, prompt):
+        data = part.encode("utf-8")
+        # Length-prefix each part so ("ab", "c") and ("a", "bc") differ
+        h.update(len(data).to_bytes(8, "big"))
+        h.update(data)
+    return h.hexdigest()
+
+
+def signature(model, system, prompt):
+    """Return the near-duplicate Signature of a prompt"""
+    normalized = normalize(prompt)
+    return Signature(cache_key(model, system, normalized), cache_key(model, system, ""),
+                     simhash(normalized), len(normalized))
+
+
+# ----------------------
+# Cache store
+# ----------------------
+class ResponseCache:
+    """SQLite-backed LRU cache with optional TTL, safe across processes"""
+
+    def __init__(self, path=None, max_bytes=None, ttl=None, similar_threshold=None):
+        self.path = path or CACHE_FILE
+        self.max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.ttl = CACHE_TTL if ttl is None else ttl
+        self.similar_threshold = (SIMILAR_THRESHOLD if similar_threshold is None
+                                  else similar_threshold)
+        # Fingerprints within max_distance bits meet the threshold
+        self.max_distance = math.floor(
+            (1 - max(self.similar_threshold, MIN_SIMILAR_THRESHOLD)) * 64 + 1e-9)
+        self._local = threading.local()
+
+    def _connect(self):
+        """Return this thread's connection, reopening after a fork"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        # Autocommit mode; transactions are opened explicitly below
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if conn.execute("PRAGMA user_version").fetchone()[0] < _INDEX_VERSION:
+            self._upgrade_signatures(conn)
+        conn.executescript(_SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _upgrade_signatures(self, conn):
+        """Bring older near-duplicate tables up to _INDEX_VERSION
+
+        Signatures from before model/system scoping are dropped: their
+        prompts were not kept, so their scope is unknown (the responses
+        stay available to exact lookups). Scoped ones are re-keyed from
+        bands to blocks.
+        """
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have upgraded them while we waited
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < 1:
+                conn.execute("DROP TABLE IF EXISTS signatures")
+                conn.execute("DROP TABLE IF EXISTS signature_bands")
+            elif version < _INDEX_VERSION:
+                conn.execute("DELETE FROM signature_bands")
+                rows = conn.execute("SELECT key, scope, fingerprint FROM signatures").fetchall()
+                conn.executemany(
+                    "INSERT INTO signature_bands (scope, band, value, key) VALUES (?, ?, ?, ?)",
+                    [(scope, block, value, key) for key, scope, fingerprint in rows
+                     for block, value in blocks(from_signed(fingerprint))])
+            if version < _INDEX_VERSION:
+                conn.execute(f"PRAGMA user_version = {_INDEX_VERSION}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _bump(self, conn, name, amount=1):
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def get(self, key):
+        """Return the cached response for key, or None on a miss"""
+        try:
+            conn = self._connect()
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT value, size, created FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row and self.ttl and row[2] + self.ttl < now:
+                    self._delete(conn, key)
+                    self._bump(conn, "bytes", -row[1])
+                    row = None
+                if row:
+                    conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+                    self._bump(conn, "hits")
+                else:
+                    self._bump(conn, "misses")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            print(f"Warning: Could not read response cache ({e})")
+            return None
+
+    def lookup(self, model, system, prompt):
+        """Find a response for prompt: the exact key first, then a near duplicate"""
+        key = cache_key(model, system, prompt)
+        value = self.get(key)
+        if value is not None or not self.similar_threshold:
+            return Lookup(key, value, None, None)
+        sig = signature(model, system, prompt)
+        found = self.get_similar(sig)
+        if found is None:
+            return Lookup(key, None, None, sig)
+        return Lookup(key, found[0], found[1], sig)
+
+    def get_similar(self, sig):
+        """Return (response, similarity) for the closest near-duplicate prompt
+
+        Returns None when near-duplicate lookups are off or nothing stored
+        is at least similar_threshold alike.
+        """
+        if not self.similar_threshold:
+            return None
+        try:
+            conn = self._connect()
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                best = conn.execute(
+                    "SELECT key, 0 FROM signatures WHERE normalized = ? LIMIT 1",
+                    (sig.normalized,)).fetchone()
+                if best is None:
+                    best = self._closest(conn, sig)
+                row = None
+                if best:
+                    row = conn.execute("SELECT value, created FROM entries WHERE key = ?",
+                                       (best[0],)).fetchone()
+                    if row and self.ttl and row[1] + self.ttl < now:
+                        row = None  # expired; removed by the next exact lookup or eviction
+                if row:
+                    conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, best[0]))
+                    self._bump(conn, "similar_hits")
+                    self._bump(conn, "similar_distance", best[1])
+                else:
+                    self._bump(conn, "similar_misses")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            print(f"Warning: Could not read response cache ({e})")
+            return None
+        if not row:
+            return None
+        return row[0], 1 - best[1] / 64
+
+    def _closest(self, conn, sig):
+        """(key, distance) of the nearest stored fingerprint within max_distance"""
+        best = None
+        seen = set()
+        # Prompts whose lengths differ more than the threshold allows are not
+        # near duplicates, however their fingerprints compare
+        shortest = sig.length * self.similar_threshold
+        longest = sig.length / self.similar_threshold
+        for block, values in probes(sig.fingerprint, self.max_distance):
+            for i in range(0, len(values), PROBES_PER_QUERY):
+                chunk = values[i:i + PROBES_PER_QUERY]
+                for key, fingerprint, length in conn.execute(
+                        "SELECT s.key, s.fingerprint, s.length FROM signature_bands b "
+                        "JOIN signatures s ON s.key = b.key WHERE b.scope = ? AND b.band = ? "
+                        f"AND b.value IN ({', '.join('?' * len(chunk))})",
+                        (sig.scope, block, *chunk)):
+                    if key in seen or not shortest <= length <= longest:
+                        continue
+                    seen.add(key)
+                    distance = hamming(sig.fingerprint, from_signed(fingerprint))
+                    if distance <= self.max_distance and (best is None or distance < best[1]):
+                        best = (key, distance)
+        return best
+
+    def put(self, key, value, sig=None):
+        """Store a response and evict least-recently-used entries over budget
+
+        With a Signature (and near-duplicate lookups on), the prompt can
+        later be found by get_similar().
+        """
+        size = len(value.encode("utf-8"))
+        try:
+            conn = self._connect()
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                old = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now, now),
+                )
+                if sig is not None and self.similar_threshold:
+                    self._put_signature(conn, key, sig)
+                self._bump(conn, "bytes", size - (old[0] if old else 0))
+                self._evict(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            print(f"Warning: Could not write response cache ({e})")
+
+    def _put_signature(self, conn, key, sig):
+        conn.execute("DELETE FROM signature_bands WHERE key = ?", (key,))
+        conn.execute(
+            "INSERT OR REPLACE INTO signatures (key, scope, normalized, fingerprint, length) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, sig.scope, sig.normalized, to_signed(sig.fingerprint), sig.length),
+        )
+        conn.executemany(
+            "INSERT INTO signature_bands (scope, band, value, key) VALUES (?, ?, ?, ?)",
+            [(sig.scope, block, value, key) for block, value in blocks(sig.fingerprint)],
+        )
+
+    def _delete(self, conn, key):
+        """Remove an entry and its near-duplicate signature"""
+        conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        conn.execute("DELETE FROM signatures WHERE key = ?", (key,))
+        conn.execute("DELETE FROM signature_bands WHERE key = ?", (key,))
+
+    def _evict(self, conn):
+        """Drop oldest-accessed entries until the cache fits in max_bytes"""
+        total = self._counter(conn, "bytes")
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        victims = []
+        # Read only as many of the oldest entries as it takes, not every key
+        cursor = conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC")
+        while total - freed > self.max_bytes:
+            rows = cursor.fetchmany(_EVICT_BATCH)
+            if not rows:
+                break
+            for key, size in rows:
+                if total - freed <= self.max_bytes:
+                    break
+                victims.append(key)
+                freed += size
+        cursor.close()
+        for key in victims:
+            self._delete(conn, key)
+        evicted = len(victims)
+        self._bump(conn, "bytes", -freed)
+        self._bump(conn, "evictions", evicted)
+
+    def _counter(self, conn, name):
+        row = conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current size"""
+        conn = self._connect()
+        entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        hits = self._counter(conn, "hits")
+        misses = self._counter(conn, "misses")
+        similar_hits = self._counter(conn, "similar_hits")
+        similar_misses = self._counter(conn, "similar_misses")
+        distance = self._counter(conn, "similar_distance")
+        return {
+            "entries": entries,
+            "bytes": self._counter(conn, "bytes"),
+            "hits": hits,
+            "misses": misses,
+            "evictions": self._counter(conn, "evictions"),
+            "similar_hits": similar_hits,
+            "similar_misses": similar_misses,
+            # Share of all lookups answered by either tier
+            "hit_rate": round((hits + similar_hits) / (hits + misses), 4) if hits + misses else 0.0,
+            "mean_similarity": (round(1 - distance / similar_hits / 64, 4)
+                                if similar_hits else None),
+        }
+
+    def clear(self):
+        """Remove all entries and reset counters"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM entries")
+        conn.execute("DELETE FROM counters")
+        conn.execute("DELETE FROM signatures")
+        conn.execute("DELETE FROM signature_bands")
+        conn.execute("COMMIT")
+        conn.execute("VACUUM")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide cache, or None when caching is disabled"""
+    global _cache
+    if not ENABLED:
+        return None
+    with _cache_lock:
+        if (_cache is None or _cache.path != CACHE_FILE
+                or _cache.similar_threshold != SIMILAR_THRESHOLD):
+            _cache = ResponseCache(CACHE_FILE)
+        return _cache
@@ -1,9 +1,12 @@
 import argparse
 import os
-from vibe_coding.utils import TOOLS, load_state, save_state
-from vibe_coding.tools.summarize import summarize_text
-from vibe_coding.tools.todo import generate_todos
-from vibe_coding.orchestrator import orchestrator
+import sys
+from vibe_coding import metrics, utils
+from vibe_coding.utils import TOOLS, update_state, set_concurrency, stream_to_state, join_stream
+from vibe_coding.fanout import expand_inputs, read_input, run_many, StateBatch
+
+# Tool modules, the orchestrator and the response cache are imported inside
+# the handlers that need them, keeping start-up cheap for every command.
 
 
 # ----------------------
@@ -11,69 +14,390 @@ from vibe_coding.orchestrator import orchestrator
 # ----------------------
 def summarize(args):
     """Handle summarize command"""
-    if not os.path.exists(args.input):
-        print(f"Input file not found: {args.input}")
+    paths = expand_inputs(args.input)
+    if len(paths) != 1:
+        return summarize_many(paths)
+
+    if not os.path.exists(paths[0]):
+        print(f"Input file not found: {paths[0]}")
         return
 
-    with open(args.input, "r") as f:
-        content = f.read()
+    content = read_input(paths[0])
+
+    if getattr(args, "stream", False):
+        # Print tokens as they arrive; state gets the assembled summary
+        summary = join_stream(TOOLS["summarize"]["stream"](content))
+    else:
+        summary = TOOLS["summarize"]["fn"](content)
+        print(summary)
+
+    source = getattr(summary, "source", "model")
+    if source == "stub":
+        print("(Model unavailable: showing a fallback summary.)")
+    update_state({"last_summary": summary, "last_summary_source": source})
+
+
+def summarize_many(paths):
+    """Summarize many files concurrently, printing each as it finishes"""
+    if not paths:
+        print("No input files found")
+        return
 
-    summary = summarize_text(content)
-    print(summary)
+    summarize_text = TOOLS["summarize"]["fn"]
+    batch = StateBatch("summaries", last_key="last_summary")
 
-    state = load_state()
-    state["last_summary"] = summary
-    save_state(state)
+    def on_result(path, summary, error):
+        print(f"==> {path} <==")
+        if error:
+            print(f"Error: {error}")
+            return
+        print(summary)
+        batch.add(path, summary)
+
+    run_many(paths, lambda path: summarize_text(read_input(path)), on_result)
+    batch.flush()
 
 
 def todo(args):
     """Generate todo list from text"""
+    dedup = getattr(args, "dedup", False)
+    paths = expand_inputs(args.input)
+    if len(paths) != 1:
+        return todo_many(paths, dedup)
+
+    if not os.path.exists(paths[0]):
+        print(f"Input file not found: {paths[0]}")
+        return
+
+    from vibe_coding import workers
+    from vibe_coding.tools.todo import iter_todos_file
+
+    size = os.path.getsize(paths[0])
+    if workers.can_partition("todo", size):
+        # Worker processes read the file; their spans stay in the workers
+        with metrics.span("tool", "todo") as span:
+            todos = workers.run_file("todo", paths[0])
+            span.add(bytes_in=size, bytes_out=metrics.size_of(todos))
+        todos = iter(todos)
+    else:
+        todos = iter_todos_file(paths[0])
+    if dedup:
+        from vibe_coding.tools.dedup import TodoIndex, format_cluster
+
+        clusters = TodoIndex().add_many(todos)
+        known = sum(1 for cluster in clusters if cluster["seen_before"])
+        total = sum(cluster["count"] for cluster in clusters)
+        print(f"{total} todos, {len(clusters)} unique, {known} seen in earlier runs")
+        todos = (format_cluster(cluster) for cluster in clusters)
+
+    # Stream todos to stdout and state without holding the file in memory
+    print("Generated TODOs:")
+    for line in stream_to_state("last_todo", todos):
+        print(line)
+
+
+def todo_many(paths, dedup=False):
+    """Generate todo lists for many files, printing each as it finishes"""
+    if not paths:
+        print("No input files found")
+        return
+
+    from vibe_coding import workers
+
+    generate_todos = TOOLS["todo"]["fn"]
+    dedup_todos = TOOLS["dedup"]["fn"] if dedup else None
+    batch = StateBatch("todos", last_key="last_todo")
+
+    def job(path):
+        if workers.WORKERS > 1:
+            # Files are read (and large ones partitioned) in worker processes
+            todos = workers.run_file("todo", path)
+        else:
+            todos = generate_todos(read_input(path))
+        return dedup_todos(todos) if dedup_todos else todos
+
+    def on_result(path, todos, error):
+        print(f"==> {path} <==")
+        if error:
+            print(f"Error: {error}")
+            return
+        print("Generated TODOs:")
+        print("\n".join(todos))
+        batch.add(path, todos)
+
+    # Worker processes do the work, so keep one file in flight per worker
+    # rather than capping at the AI concurrency limit
+    limit = workers.WORKERS if workers.WORKERS > 1 else None
+    run_many(paths, job, on_result, limit=limit)
+    batch.flush()
+
+
+def orchestrate(args):
+    """Run the multi-tool orchestrator"""
+    from vibe_coding.orchestrator import orchestrator
+
+    return orchestrator(args)
+
+
+def watch_command(args):
+    """Run tools on content appended to files as it arrives"""
+    from vibe_coding.watch import Watcher
+
+    for name in args.tool or ["todo"]:
+        if name not in TOOLS:
+            print(f"Tool not found: {name}")
+            return
+    watcher = Watcher(args.input, tools=args.tool or ["todo"], interval=args.interval)
+    try:
+        watcher.run(once=args.once)
+    except KeyboardInterrupt:
+        print("\nStopped watching; offsets are saved.")
+
+
+def batch_command(args):
+    """Answer a JSONL file of {id, tool, input} records in bulk"""
+    from vibe_coding.batch import BatchRun
+
     if not os.path.exists(args.input):
         print(f"Input file not found: {args.input}")
         return
+    BatchRun(args.input, args.output, backend=args.backend, batch_size=args.batch_size,
+             poll_interval=args.poll_interval).run()
 
-    with open(args.input, "r") as f:
-        content = f.read()
 
-    todos = generate_todos(content)
-    print("Generated TODOs:")
-    print("\n".join(todos))
+def cache_command(args):
+    """Show or clear the response cache"""
+    from vibe_coding import cache
+
+    store = cache.ResponseCache(cache.CACHE_FILE)
+    if args.action == "clear":
+        store.clear()
+        print("Response cache cleared.")
+        return
 
-    state = load_state()
-    state["last_todo"] = todos
-    save_state(state)
+    for name, value in store.stats().items():
+        print(f"{name}: {value}")
 
 
 # ----------------------
 # CLI entry point
 # ----------------------
-def main():
-    """Parse arguments and run the appropriate command"""
+def similarity_threshold(text):
+    """argparse type for --similar-threshold: 0 (off) or cache.MIN_SIMILAR_THRESHOLD to 1"""
+    from vibe_coding.cache import MIN_SIMILAR_THRESHOLD
+
+    value = float(text)
+    if value and not MIN_SIMILAR_THRESHOLD <= value <= 1:
+        raise argparse.ArgumentTypeError(
+            f"must be 0 (off) or between {MIN_SIMILAR_THRESHOLD:g} and 1")
+    return value
+
+
+def positive_seconds(text):
+    """argparse type for --deadline: a positive number of seconds"""
+    value = float(text)
+    if value <= 0:
+        raise argparse.ArgumentTypeError("must be greater than 0")
+    return value
+
+
+def routes_file(path):
+    """argparse type for --routes: a readable, valid routes file"""
+    from vibe_coding.routing import load_routes
+
+    try:
+        load_routes(path)
+    except (OSError, ValueError) as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return path
+
+
+def build_parser():
+    """Build the argument parser for every subcommand"""
     parser = argparse.ArgumentParser(prog="agent")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="bypass the on-disk response cache")
+    parser.add_argument("--similar-threshold", type=similarity_threshold, metavar="S",
+                        help="reuse cached responses for near-duplicate prompts at least "
+                             "S alike, e.g. 0.9 (default: AGENT_SIMILAR_THRESHOLD, off)")
+    parser.add_argument("--concurrency", type=int,
+                        help="max files/AI calls in flight at once")
+    parser.add_argument("--workers", type=int, metavar="N",
+                        help="worker processes for CPU-bound tools; large inputs are split "
+                             "across them (default: AGENT_WORKERS or 1)")
+    parser.add_argument("--base-url",
+                        help="OpenAI-compatible API base URL (default: OPENAI_BASE_URL)")
+    parser.add_argument("--timeout", type=float,
+                        help="API read timeout in seconds")
+    parser.add_argument("--deadline", type=positive_seconds, metavar="SECONDS",
+                        help="time allowed per model call, retries included, before "
+                             "falling back (default: AGENT_DEADLINE or 60)")
+    parser.add_argument("--routes", type=routes_file, metavar="FILE",
+                        help="JSON model routes chosen by prompt size and latency "
+                             "(default: AGENT_ROUTES, or a single route for the default model)")
+    parser.add_argument("--summarizer", choices=["model", "local"],
+                        help="summarize with the model or the local extractive engine "
+                             "(default: AGENT_SUMMARIZER or model)")
+    parser.add_argument("--no-daemon", action="store_true",
+                        help="run locally even if `agent serve` is running here")
+    parser.add_argument("--profile", action="store_true",
+                        help="print time, bytes, tokens and retries per operation")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="append one JSON line per timed operation to FILE")
+    parser.add_argument("--metrics-file", metavar="FILE",
+                        help="write Prometheus text-format metrics to FILE")
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     # Summarize
     summarize_parser = subparsers.add_parser("summarize")
-    summarize_parser.add_argument("input", help="path to input file")
+    summarize_parser.add_argument("input", nargs="+", help="input files, globs or directories")
+    summarize_parser.add_argument("--stream", action="store_true",
+                                  help="print the summary as it is generated (single file)")
     summarize_parser.set_defaults(func=summarize)
 
     # TODO
     todo_parser = subparsers.add_parser("todo")
-    todo_parser.add_argument("input", help="path to input file")
+    todo_parser.add_argument("input", nargs="+", help="input files, globs or directories")
+    todo_parser.add_argument("--dedup", action="store_true",
+                             help="collapse near-duplicate todos (checked against earlier runs)")
     todo_parser.set_defaults(func=todo)
 
     # Orchestrator
     orchestrator_parser = subparsers.add_parser("orchestrate")
-    orchestrator_parser.add_argument("input", help="path to input file")
-    orchestrator_parser.set_defaults(func=orchestrator)
+    orchestrator_parser.add_argument("input", nargs="*", help="input files, globs or directories")
+    orchestrator_parser.add_argument("--manifest", metavar="FILE",
+                                     help="run over the inputs listed in FILE (one per line), "
+                                          "checkpointing each stage so the run can resume")
+    orchestrator_parser.add_argument("--restart", action="store_true",
+                                     help="with --manifest, discard earlier progress")
+    orchestrator_parser.add_argument("--pipeline",
+                                     help="JSON pipeline spec (default: summarize -> todo)")
+    orchestrator_parser.add_argument("--stream", action="store_true",
+                                     help="print the summary as it is generated (single file)")
+    orchestrator_parser.add_argument("--pipelined", action="store_true",
+                                     help="start stages that consume a stream (todo) while "
+                                          "their input is still being generated")
+    orchestrator_parser.add_argument("--incremental", action="store_true",
+                                     help="skip stages whose inputs, tool version and model "
+                                          "settings are unchanged since the last run")
+    orchestrator_parser.set_defaults(func=orchestrate)
+
+    # Watch
+    watch_parser = subparsers.add_parser("watch")
+    watch_parser.add_argument("input", nargs="+", help="files, globs or directories to follow")
+    watch_parser.add_argument("--tool", action="append",
+                              help="tool to run on new content; repeatable (default: todo)")
+    watch_parser.add_argument("--interval", type=float,
+                              help="seconds between checks when polling (default: 1)")
+    watch_parser.add_argument("--once", action="store_true",
+                              help="process what was appended since the last run, then exit")
+    watch_parser.set_defaults(func=watch_command)
+
+    # Batch
+    batch_parser = subparsers.add_parser("batch")
+    batch_parser.add_argument("input", help="JSONL file of {id, tool, input} records")
+    batch_parser.add_argument("output", help="JSONL file of results keyed by id (appended)")
+    batch_parser.add_argument("--backend", choices=["openai", "local"],
+                              help="bulk API to use (default: openai with an API key, else local)")
+    batch_parser.add_argument("--batch-size", type=int,
+                              help="requests per bulk submission (default: 1000)")
+    batch_parser.add_argument("--poll-interval", type=float,
+                              help="seconds between status checks (default: 30)")
+    batch_parser.set_defaults(func=batch_command)
 
-    args = parser.parse_args()
+    # Cache
+    cache_parser = subparsers.add_parser("cache")
+    cache_parser.add_argument("action", choices=["stats", "clear"],
+                              help="show counters or remove all entries")
+    cache_parser.set_defaults(func=cache_command)
+
+    # Daemon
+    serve_parser = subparsers.add_parser("serve")
+    serve_parser.set_defaults(func=serve_command)
+
+    return parser
+
+
+def apply_global_options(args):
+    """Apply process-wide options such as --no-cache and --concurrency"""
+    if args.no_cache or args.similar_threshold is not None:
+        from vibe_coding import cache
+        if args.no_cache:
+            cache.ENABLED = False
+        if args.similar_threshold is not None:
+            cache.SIMILAR_THRESHOLD = args.similar_threshold
+    if args.concurrency:
+        set_concurrency(args.concurrency)
+    if args.workers:
+        from vibe_coding import workers
+        workers.configure(args.workers)
+    if args.base_url or args.timeout:
+        from vibe_coding.client import configure_client
+        configure_client(base_url=args.base_url, read_timeout=args.timeout)
+    if args.deadline:
+        from vibe_coding import breaker
+        breaker.DEADLINE = args.deadline
+    if args.profile or args.trace or args.metrics_file:
+        metrics.configure(trace_file=args.trace)
+    if args.summarizer:
+        utils.SUMMARIZER = args.summarizer
+    from vibe_coding import routing
+    if args.routes:
+        routing.configure(args.routes)
+    elif routing.ROUTES_FILE:
+        # Fail here, once, rather than in every model call
+        try:
+            routing.get_router()
+        except (OSError, ValueError) as e:
+            sys.exit(f"agent: error: AGENT_ROUTES file {routing.ROUTES_FILE}: {e}")
+
+
+def report_metrics(args):
+    """Print the --profile table and write the --metrics-file"""
+    if args.profile:
+        print("\n=== Profile ===")
+        print(metrics.format_table())
+    if args.metrics_file:
+        metrics.write_prometheus(args.metrics_file)
+
+
+def run_command(args):
+    """Run a parsed command, reporting errors instead of raising"""
     try:
-        args.func(args)
+        with metrics.span("command", args.command):
+            args.func(args)
     except Exception as e:
         print(f"Error running command: {e}")
 
 
+def serve_command(args):
+    """Keep a warm process serving forwarded commands"""
+    from vibe_coding.server import serve
+
+    serve(build_parser(), run_command)
+
+
+def main(argv=None):
+    """Parse arguments and run the appropriate command"""
+    argv = sys.argv[1:] if argv is None else argv
+    args = build_parser().parse_args(argv)
+
+    # Hand the job to a running daemon unless it needs process-wide options
+    overrides = (args.no_cache or args.similar_threshold is not None
+                 or args.concurrency or args.workers or args.base_url or args.timeout
+                 or args.deadline or args.profile or args.trace or args.metrics_file
+                 or args.summarizer or args.routes)
+    if not args.no_daemon and not overrides:
+        from vibe_coding import server
+        if args.command in server.FORWARDED_COMMANDS and server.forward(argv):
+            return
+
+    apply_global_options(args)
+    run_command(args)
+    if args.profile or args.metrics_file:
+        report_metrics(args)
+
+
 if __name__ == "__main__":
     # Print registered tools at startup
     print("Registered tools:", list(TOOLS.keys()))
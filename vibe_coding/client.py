@@ -0,0 +1,90 @@
+"""Process-wide OpenAI client with a pooled keep-alive HTTP connection"""
+import os
+import threading
+
+BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+CONNECT_TIMEOUT = float(os.getenv("AGENT_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.getenv("AGENT_READ_TIMEOUT", 60))
+POOL_SIZE = int(os.getenv("AGENT_POOL_SIZE", 16))
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+# Clients for other endpoints (model routes): {(base_url, api_key_env): (client, pid)}
+_profile_clients = {}
+
+
+def configure_client(base_url=None, connect_timeout=None, read_timeout=None, pool_size=None):
+    """Override client settings; the next get_client() builds a new client"""
+    global BASE_URL, CONNECT_TIMEOUT, READ_TIMEOUT, POOL_SIZE
+    with _client_lock:
+        if base_url is not None:
+            BASE_URL = base_url
+        if connect_timeout is not None:
+            CONNECT_TIMEOUT = connect_timeout
+        if read_timeout is not None:
+            READ_TIMEOUT = read_timeout
+        if pool_size is not None:
+            POOL_SIZE = pool_size
+        _reset()
+
+
+def _reset():
+    global _client, _client_pid
+    if _client is not None and _client_pid == os.getpid():
+        _client.close()
+    _client = None
+    _client_pid = None
+    for client, pid in _profile_clients.values():
+        if pid == os.getpid():
+            client.close()
+    _profile_clients.clear()
+
+
+def _build_client(api_key, base_url=None):
+    import httpx
+    import openai
+
+    timeout = httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+    http_client = httpx.Client(
+        timeout=timeout,
+        limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+    )
+    # Retries are handled by ai_call so they share the rate limiter
+    return openai.OpenAI(api_key=api_key, base_url=base_url or BASE_URL, timeout=timeout,
+                         max_retries=0, http_client=http_client)
+
+
+def get_client(base_url=None, api_key_env=None):
+    """Return the shared client, or None when no API key is configured
+
+    The client is built once per process (and rebuilt after a fork, since
+    pooled sockets must not be shared between processes). base_url and
+    api_key_env (the variable holding the key) select another endpoint,
+    e.g. for a model route; each gets its own shared client.
+    """
+    global _client, _client_pid
+    if base_url or api_key_env:
+        return _get_profile_client(base_url, api_key_env)
+    if _client is not None and _client_pid == os.getpid():
+        return _client
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                return None
+            _client = _build_client(api_key)
+            _client_pid = os.getpid()
+        return _client
+
+
+def _get_profile_client(base_url, api_key_env):
+    profile = (base_url, api_key_env)
+    with _client_lock:
+        entry = _profile_clients.get(profile)
+        if entry is None or entry[1] != os.getpid():
+            api_key = os.getenv(api_key_env or "OPENAI_API_KEY")
+            if not api_key:
+                return None
+            entry = _profile_clients[profile] = (_build_client(api_key, base_url), os.getpid())
+        return entry[0]
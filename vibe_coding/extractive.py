@@ -0,0 +1,259 @@
+"""Local extractive summarizer: TF-IDF sentence vectors ranked by TextRank
+
+Runs entirely on NumPy (imported on first use) with no model calls, so it
+serves as the `local` summarize backend and as the fallback when the API
+is unavailable.
+
+Text is processed as UTF-8 bytes in blocks cut at sentence boundaries.
+Words are found and hashed with vectorized array operations (a prefix
+polynomial hash, bucketed as in the hashing trick), giving a sparse
+sentence x term matrix X as coordinate arrays. TextRank's similarity
+graph S = X X^T is never built: each power iteration computes S v as
+X (X^T v) with two np.bincount passes, so a run is O(words), not
+O(sentences^2).
+"""
+import os
+from vibe_coding.similarity import hamming, simhash
+
+# Sentences in a summary
+SENTENCES = int(os.getenv("AGENT_SUMMARY_SENTENCES", 3))
+
+# Bytes tokenized per block; bounds the size of the temporary arrays
+BLOCK_BYTES = 4 << 20
+# Hashed term buckets (the sparse matrix width)
+TERM_BUCKETS = 1 << 20
+
+DAMPING = 0.85
+MAX_ITERATIONS = 30
+TOLERANCE = 1e-4
+
+# Chosen sentences whose SimHash fingerprints are this close count as
+# repeats, so repetitive logs do not fill the summary with one line
+REPEAT_DISTANCE = 7
+# Top-ranked sentences checked for repeats before settling for fewer
+MAX_CANDIDATES = 1000
+
+_STOPWORDS = (
+    "a an and are as at be been but by can do for from had has have he her his i if in "
+    "into is it its me my no not of on or our she so than that the their them then there "
+    "these they this to up was we were what when which who will with would you your"
+).split()
+
+_PRIME = 0x100000001B3
+_MIX = 0x9E3779B97F4A7C15
+
+_tables = None
+_powers = None  # (P^k, P^-k) arrays, replaced together when grown
+
+
+def summarize(text, sentences=None):
+    """Return the highest-ranked sentences of text, in document order"""
+    sentences = SENTENCES if sentences is None else sentences
+    data = text.encode("utf-8")
+    spans, rows, terms, counts = _sentence_terms(data)
+    if spans is None:
+        return text.strip()
+
+    import numpy as np
+
+    ranks = _textrank(len(spans), rows, terms, counts)
+    order = np.argsort(-ranks, kind="stable")[:MAX_CANDIDATES]
+
+    chosen = []
+    fingerprints = []
+    for index in order:
+        start, end = spans[index]
+        sentence = data[start:end].decode("utf-8", "replace").strip()
+        fingerprint = simhash(sentence)
+        if any(hamming(fingerprint, other) <= REPEAT_DISTANCE for other in fingerprints):
+            continue
+        chosen.append((start, sentence))
+        fingerprints.append(fingerprint)
+        if len(chosen) == sentences:
+            break
+    return " ".join(sentence for _, sentence in sorted(chosen))
+
+
+# ----------------------
+# Tokenizing
+# ----------------------
+def _get_tables():
+    """Byte lookup tables and stopword hashes, built once per process"""
+    global _tables
+    if _tables is None:
+        import numpy as np
+
+        is_word = np.zeros(256, dtype=bool)
+        for chars in (b"abcdefghijklmnopqrstuvwxyz", b"ABCDEFGHIJKLMNOPQRSTUVWXYZ", b"0123456789_"):
+            is_word[list(chars)] = True
+        is_word[0x80:] = True  # bytes of non-ASCII characters
+
+        lower = np.arange(256, dtype=np.uint64)
+        lower[ord("A"):ord("Z") + 1] += 32
+
+        ends_sentence = np.zeros(256, dtype=bool)
+        ends_sentence[list(b".!?")] = True
+        is_space = np.zeros(256, dtype=bool)
+        is_space[list(b" \t\r\n\f\v")] = True
+
+        stopwords = np.unique(np.concatenate([
+            _word_hashes(np.frombuffer(word.encode(), np.uint8), lower,
+                         np.array([0]), np.array([len(word)]))
+            for word in _STOPWORDS]))
+        _tables = is_word, lower, ends_sentence, is_space, stopwords
+    return _tables
+
+
+def _hash_powers(size):
+    """Arrays of P^k and P^-k modulo 2^64 for k <= size, grown as needed
+
+    P is odd, so it is invertible modulo 2^64; uint64 arithmetic wraps,
+    which is the modulus.
+    """
+    global _powers
+    if _powers is None or len(_powers[0]) <= size:
+        import numpy as np
+
+        length = 1 << size.bit_length()
+        with np.errstate(over="ignore"):
+            powers = np.full(length, _PRIME, dtype=np.uint64)
+            powers[0] = 1
+            inverse = np.full(length, pow(_PRIME, -1, 1 << 64), dtype=np.uint64)
+            inverse[0] = 1
+            _powers = np.cumprod(powers), np.cumprod(inverse)
+    return _powers
+
+
+def _word_hashes(block, lower, starts, ends):
+    """Hash block[start:end] for every word at once (case-insensitive)
+
+    With prefix[i] = sum(byte_k * P^k for k < i), a word's hash is
+    (prefix[end] - prefix[start]) * P^-start: the same for every occurrence.
+    """
+    import numpy as np
+
+    powers, inverse = _hash_powers(len(block))
+    with np.errstate(over="ignore"):
+        prefix = np.zeros(len(block) + 1, dtype=np.uint64)
+        np.cumsum(lower[block] * powers[:len(block)], out=prefix[1:])
+        hashes = (prefix[ends] - prefix[starts]) * inverse[starts]
+        # Final avalanche so the low bits used for bucketing are well mixed
+        hashes ^= hashes >> np.uint64(31)
+        hashes *= np.uint64(_MIX)
+        hashes ^= hashes >> np.uint64(29)
+    return hashes
+
+
+def _blocks(data):
+    """Yield (offset, block) pieces of data of at most BLOCK_BYTES, cut after sentences"""
+    offset = 0
+    while offset < len(data):
+        end = offset + BLOCK_BYTES
+        if end < len(data):
+            cut = max(data.rfind(b"\n", offset, end), data.rfind(b". ", offset, end - 1) + 1)
+            if cut > offset:
+                end = cut + 1
+        yield offset, data[offset:end]
+        offset = end
+
+
+def _sentence_terms(data):
+    """Split data into sentences and their hashed term counts
+
+    Returns (spans, rows, terms, counts): an array of the (start, end) byte
+    spans of sentences with at least one term, and the sparse matrix of term counts
+    as coordinate arrays (sentence row, term bucket, count).
+    """
+    if not data.strip():
+        return None, None, None, None
+
+    import numpy as np
+
+    is_word, lower, ends_sentence, is_space, stopwords = _get_tables()
+    all_spans, all_rows, all_terms, all_counts = [], [], [], []
+    sentences = 0
+    for offset, chunk in _blocks(data):
+        block = np.frombuffer(chunk, dtype=np.uint8)
+
+        # Sentences end at .!? followed by whitespace, and at line breaks
+        follows_space = np.zeros(len(block), dtype=bool)
+        follows_space[:-1] = is_space[block[1:]]
+        follows_space[-1] = True
+        ends = np.flatnonzero((ends_sentence[block] & follows_space) | (block == 10)) + 1
+        if not len(ends) or ends[-1] != len(block):
+            ends = np.append(ends, len(block))
+        starts = np.concatenate(([0], ends[:-1]))
+
+        # Words are maximal runs of word bytes; those starting with a digit
+        # (ids, counts, timestamps) are not terms
+        edges = np.diff(is_word[block].astype(np.int8), prepend=0, append=0)
+        word_starts = np.flatnonzero(edges == 1)
+        word_ends = np.flatnonzero(edges == -1)
+        keep = (block[word_starts] > ord("9")) | (block[word_starts] < ord("0"))
+        word_starts, word_ends = word_starts[keep], word_ends[keep]
+
+        hashes = _word_hashes(block, lower, word_starts, word_ends)
+        keep = ~np.isin(hashes, stopwords)
+        hashes, word_starts = hashes[keep], word_starts[keep]
+
+        sentence_of = np.searchsorted(ends, word_starts, side="right")
+        buckets = (hashes % np.uint64(TERM_BUCKETS)).astype(np.int64)
+        pairs, counts = np.unique(sentence_of * TERM_BUCKETS + buckets, return_counts=True)
+
+        # Renumber the sentences that have terms, continuing from earlier blocks
+        local, rows = np.unique(pairs // TERM_BUCKETS, return_inverse=True)
+        all_rows.append(rows + sentences)
+        all_terms.append(pairs % TERM_BUCKETS)
+        all_counts.append(counts)
+        all_spans.append(np.stack((starts[local], ends[local]), axis=1) + offset)
+        sentences += len(local)
+
+    if not sentences:
+        return None, None, None, None
+    return (np.concatenate(all_spans), np.concatenate(all_rows), np.concatenate(all_terms),
+            np.concatenate(all_counts))
+
+
+# ----------------------
+# Ranking
+# ----------------------
+def _textrank(n, rows, terms, counts):
+    """PageRank over cosine similarities of TF-IDF sentence vectors"""
+    import numpy as np
+
+    # Renumber the buckets in use so per-iteration arrays stay small
+    used = np.zeros(TERM_BUCKETS, dtype=bool)
+    used[terms] = True
+    used = np.flatnonzero(used)
+    renumber = np.empty(TERM_BUCKETS, dtype=np.int64)
+    renumber[used] = np.arange(len(used))
+    terms = renumber[terms]
+    width = len(used)
+
+    # Sublinear TF x smoothed IDF, then unit-length rows so S = X X^T is cosine
+    document_freq = np.bincount(terms, minlength=width)
+    idf = np.log((1 + n) / (1 + document_freq[terms])) + 1
+    values = (1 + np.log(counts)) * idf
+    norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=n))
+    values /= norms[rows]
+
+    def similarity_times(v):
+        """S v without the diagonal (a sentence is not similar to itself)"""
+        term_totals = np.bincount(terms, weights=values * v[rows], minlength=width)
+        return np.bincount(rows, weights=values * term_totals[terms], minlength=n) - v
+
+    degree = similarity_times(np.ones(n))
+    # Floating-point error can leave an isolated sentence a tiny degree
+    isolated = degree <= 1e-9
+    degree[isolated] = 1.0
+
+    ranks = np.full(n, 1.0 / n)
+    for _ in range(MAX_ITERATIONS):
+        spread = ranks / degree
+        spread[isolated] = 0.0
+        updated = (1 - DAMPING) / n + DAMPING * similarity_times(spread)
+        if np.abs(updated - ranks).sum() < TOLERANCE:
+            ranks = updated
+            break
+        ranks = updated
+    return ranks
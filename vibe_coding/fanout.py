@@ -0,0 +1,113 @@
+"""Fan a command out over many input files"""
+import glob
+import os
+from vibe_coding import metrics
+from vibe_coding.utils import carry_context, run_limited, transact_state
+
+# Number of finished files between state writes in batch runs
+STATE_FLUSH_EVERY = 100
+
+
+def expand_inputs(patterns):
+    """Expand paths, globs and directories into a de-duplicated file list"""
+    if isinstance(patterns, str):
+        patterns = [patterns]
+
+    paths = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = []
+            for root, dirs, files in os.walk(pattern):
+                dirs.sort()
+                matches.extend(os.path.join(root, name) for name in sorted(files))
+        elif glob.has_magic(pattern):
+            matches = sorted(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+        else:
+            # Kept even if missing so the handler reports "not found"
+            matches = [pattern]
+
+        for path in matches:
+            if path not in seen:
+                seen.add(path)
+                paths.append(path)
+    return paths
+
+
+def read_input(path):
+    """Read an input file as text"""
+    with metrics.span("io", "read_input") as span, open(path, "r") as f:
+        content = f.read()
+        span.add(bytes_in=len(content))
+        return content
+
+
+def run_many(paths, job, on_result, limit=None):
+    """Run job(path) for every path concurrently, calling on_result as each finishes
+
+    Jobs share the AI worker pool and its concurrency limit unless limit
+    is given; jobs that make no AI calls (local tools) pass their own.
+    """
+    import asyncio
+
+    if limit is None:
+        asyncio.run(_run_many(paths, job, on_result, run_limited))
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=max(1, limit), thread_name_prefix="run_many") as executor:
+        async def run_local(fn, path):
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, carry_context(fn), path)
+
+        asyncio.run(_run_many(paths, job, on_result, run_local))
+
+
+async def _run_many(paths, job, on_result, run):
+    import asyncio
+
+    async def run_one(path):
+        try:
+            return path, await run(job, path), None
+        except Exception as e:
+            return path, None, e
+
+    tasks = [asyncio.ensure_future(run_one(path)) for path in paths]
+    for finished in asyncio.as_completed(tasks):
+        path, result, error = await finished
+        on_result(path, result, error)
+
+
+class StateBatch:
+    """Collect per-file results and write them to state in batches"""
+
+    def __init__(self, key, last_key=None, flush_every=None):
+        self.key = key
+        self.last_key = last_key
+        self.flush_every = flush_every or STATE_FLUSH_EVERY
+        self.pending = {}
+        self.last = None
+
+    def add(self, path, value):
+        self.pending[path] = value
+        self.last = value
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        pending = self.pending
+
+        def merge(state):
+            # copy() leaves entries stored as blobs unloaded
+            merged = state.get(self.key, {}).copy()
+            merged.update(pending)
+            changes = {self.key: merged}
+            if self.last_key:
+                changes[self.last_key] = self.last
+            return changes
+
+        transact_state(merge)
+        self.pending = {}
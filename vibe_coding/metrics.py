@@ -0,0 +1,205 @@
+"""Timing, size and token metrics for ai_call, tools and state I/O
+
+Instrumented code opens a span around each operation:
+
+    with metrics.span("ai_call", MODEL) as span:
+        span.add(bytes_in=len(prompt))
+        ...
+
+Spans are aggregated per (kind, name) for the --profile table and the
+Prometheus text file, and each one can also be appended to a JSON-lines
+trace file. While metrics are off (the default) span() returns a shared
+no-op object, so instrumented code pays one flag check per call.
+"""
+import functools
+import json
+import os
+import threading
+import time
+
+ENABLED = False
+
+# Numeric span fields, summed per (kind, name)
+FIELDS = ("bytes_in", "bytes_out", "prompt_tokens", "completion_tokens",
+          "retries", "stubs", "cache_hits", "similar_hits", "errors",
+          "hedges", "short_circuits")
+
+_lock = threading.Lock()
+_totals = {}
+_trace = None
+
+
+# ----------------------
+# Configuration
+# ----------------------
+def configure(enabled=True, trace_file=None):
+    """Turn collection on or off; optionally append every span to trace_file"""
+    global ENABLED, _trace
+    with _lock:
+        if _trace is not None:
+            _trace.close()
+            _trace = None
+        if trace_file:
+            _trace = open(trace_file, "a", buffering=1)
+        ENABLED = enabled or bool(trace_file)
+
+
+def reset():
+    """Forget everything collected so far"""
+    with _lock:
+        _totals.clear()
+
+
+# ----------------------
+# Recording
+# ----------------------
+class Span:
+    """One timed operation; numeric fields passed to add() are summed"""
+
+    __slots__ = ("kind", "name", "fields", "start")
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.fields = {}
+
+    def add(self, **fields):
+        for key, value in fields.items():
+            self.fields[key] = self.fields.get(key, 0) + value
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            self.add(errors=1)
+        record(self.kind, self.name, time.perf_counter() - self.start, **self.fields)
+        return False
+
+
+class _NullSpan:
+    """Stand-in returned by span() while metrics are off"""
+
+    __slots__ = ()
+
+    def add(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+def span(kind, name):
+    """Return a context manager timing one operation (a no-op while off)"""
+    return Span(kind, name) if ENABLED else NULL_SPAN
+
+
+def record(kind, name, seconds, **fields):
+    """Add one finished operation to the totals and the trace file"""
+    if not ENABLED:
+        return
+    with _lock:
+        totals = _totals.get((kind, name))
+        if totals is None:
+            totals = _totals[(kind, name)] = dict.fromkeys(FIELDS, 0)
+            totals.update(calls=0, seconds=0.0, max_seconds=0.0)
+        totals["calls"] += 1
+        totals["seconds"] += seconds
+        totals["max_seconds"] = max(totals["max_seconds"], seconds)
+        for key, value in fields.items():
+            totals[key] = totals.get(key, 0) + value
+
+        if _trace is not None:
+            event = {"ts": time.time(), "pid": os.getpid(), "kind": kind, "name": name,
+                     "seconds": round(seconds, 6), **fields}
+            _trace.write(json.dumps(event) + "\n")
+
+
+def size_of(value):
+    """Approximate size in characters of a tool argument or result"""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(size_of(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(size_of(item) for item in value)
+    return 0
+
+
+def instrument(kind, name, func):
+    """Wrap func so each call is recorded as a span with its input/output sizes"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not ENABLED:
+            return func(*args, **kwargs)
+        with Span(kind, name) as span:
+            span.add(bytes_in=size_of(args))
+            result = func(*args, **kwargs)
+            span.add(bytes_out=size_of(result))
+            return result
+    return wrapper
+
+
+# ----------------------
+# Output
+# ----------------------
+def snapshot():
+    """Return {(kind, name): totals} collected so far"""
+    with _lock:
+        return {key: dict(totals) for key, totals in _totals.items()}
+
+
+def format_table(totals=None):
+    """Render the totals as the --profile summary table"""
+    totals = snapshot() if totals is None else totals
+    columns = ("calls", "total ms", "mean ms", "max ms", "bytes in", "bytes out",
+               "tok in", "tok out", "retries", "stubs", "cached", "similar")
+    rows = []
+    for (kind, name), t in sorted(totals.items(), key=lambda item: -item[1]["seconds"]):
+        rows.append((f"{kind}:{name}", t["calls"], f"{t['seconds'] * 1000:.1f}",
+                     f"{t['seconds'] * 1000 / t['calls']:.2f}", f"{t['max_seconds'] * 1000:.1f}",
+                     t["bytes_in"], t["bytes_out"], t["prompt_tokens"], t["completion_tokens"],
+                     t["retries"], t["stubs"], t["cache_hits"], t["similar_hits"]))
+
+    header = ("operation",) + columns
+    widths = [max(len(str(row[i])) for row in rows + [header]) for i in range(len(header))]
+    lines = ["  ".join(str(cell).ljust(widths[0]) if i == 0 else str(cell).rjust(widths[i])
+                       for i, cell in enumerate(row))
+             for row in [header] + rows]
+    return "\n".join(lines)
+
+
+def write_prometheus(path, totals=None):
+    """Write the totals in Prometheus text format (for the node exporter
+    textfile collector), replacing the file atomically"""
+    totals = snapshot() if totals is None else totals
+    metrics = [("calls", "Operations completed")]
+    metrics.append(("seconds", "Wall time spent in operations"))
+    metrics.extend((field, f"Sum of {field.replace('_', ' ')}") for field in FIELDS)
+
+    lines = []
+    for field, help_text in metrics:
+        metric = f"agent_{field}_total"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for (kind, name), t in sorted(totals.items()):
+            lines.append(f'{metric}{{kind="{_escape(kind)}",name="{_escape(name)}"}} {t[field]}')
+    lines.append("# HELP agent_last_run_timestamp_seconds When these metrics were written")
+    lines.append("# TYPE agent_last_run_timestamp_seconds gauge")
+    lines.append(f"agent_last_run_timestamp_seconds {time.time():.3f}")
+
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_file, path)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -1,41 +1,270 @@
 import os
-from vibe_coding.utils import TOOLS, load_state, save_state
+import sys
+import time
+from vibe_coding.utils import get_state, update_state, join_stream
+from vibe_coding.fanout import expand_inputs, read_input, run_many, StateBatch
+from vibe_coding.scheduler import (DEFAULT_PIPELINE, build_graph, find_pipes, load_pipeline,
+                                   run_pipe, run_pipeline, stage_fingerprint)
+
+# State key holding {input path: {stage: {"fingerprint", "result"}}}
+MEMO_KEY = "stage_memo"
+
+
+def run_tools(content, pipeline=None, memo=None):
+    """Run the tool pipeline on content and return {stage_name: result}"""
+    return run_pipeline(pipeline or DEFAULT_PIPELINE, {"text": content}, memo=memo)
+
+
+def run_tools_streaming(content, pipeline=None, memo=None):
+    """Like run_tools, but stream the first streamable root stage to stdout
+
+    That stage's output is printed under its header as it arrives; the
+    remaining stages then run on the assembled result. A stage that memo
+    shows is unchanged is reused rather than streamed.
+    """
+    pipeline = pipeline or DEFAULT_PIPELINE
+    data = {"text": content}
+    for stage in build_graph(pipeline, sources=tuple(data)):
+        if not stage["deps"] and "stream" in stage["entry"]:
+            args = [data[item] for item in stage["inputs"]]
+            previous = (memo or {}).get(stage["name"])
+            if previous and previous["fingerprint"] == stage_fingerprint(stage, args):
+                break
+            print(f"\n{_header(stage['name'])}:")
+            result = join_stream(stage["entry"]["stream"](*args))
+            done = {stage["name"]: result}
+            return run_pipeline(pipeline, data, done=done, memo=memo), done
+    return run_pipeline(pipeline, data, memo=memo), {}
+
+
+def run_tools_pipelined(content, pipeline=None, memo=None, stream=False):
+    """Like run_tools, but overlap streaming stages with their consumers
+
+    Each root stage with a stream variant feeds its chunks, as they are
+    generated, to downstream stages that can consume a stream (summarize
+    -> todo), so todos are produced while the summary is still being
+    written. The remaining stages then run as usual. With stream, the
+    first such stage is also printed under its header as it arrives.
+    Returns (results, names of stages already printed).
+    """
+    pipeline = pipeline or DEFAULT_PIPELINE
+    data = {"text": content}
+    done = {}
+    printed = []
+    for producer, consumers in find_pipes(build_graph(pipeline, sources=tuple(data))):
+        args = [data[item] for item in producer["inputs"]]
+        previous = (memo or {}).get(producer["name"])
+        if previous and previous["fingerprint"] == stage_fingerprint(producer, args):
+            continue  # reused by run_pipeline, along with any unchanged consumers
+        on_chunk = None
+        if stream and not printed:
+            print(f"\n{_header(producer['name'])}:")
+            on_chunk = _echo
+        done.update(run_pipe(producer, consumers, args, on_chunk))
+        if on_chunk:
+            print()
+            printed.append(producer["name"])
+    return run_pipeline(pipeline, data, done=done, memo=memo), printed
+
+
+def _echo(chunk):
+    sys.stdout.write(chunk)
+    sys.stdout.flush()
+
+
+def load_memo(path):
+    """Return the remembered stage results for an input path"""
+    return dict(get_state(MEMO_KEY, {}).get(os.path.abspath(path), {}))
+
+
+def _reused(before, memo):
+    """Names of stages whose fingerprint did not change"""
+    return [name for name, entry in memo.items()
+            if before.get(name) == entry["fingerprint"]]
+
+
+def _header(name):
+    return {"summarize": "Summary", "todo": "Todos"}.get(name, name)
+
+
+def print_results(state, printed=()):
+    """Print the results produced by run_tools, skipping stages already printed"""
+    for name in ("summarize", "todo"):
+        if name not in printed:
+            result = state.get(name, "" if name == "summarize" else [])
+            print(f"\n{_header(name)}:")
+            print("\n".join(result) if isinstance(result, list) else result)
+
+    for name, result in state.items():
+        if name not in ("summarize", "todo") and name not in printed:
+            print(f"\n{name}:")
+            print("\n".join(result) if isinstance(result, list) else result)
 
 
 def orchestrator(args):
-    """Multi-step agent orchestration that runs tools in sequence"""
+    """Multi-step agent orchestration that runs a graph of tools"""
+    pipeline_file = getattr(args, "pipeline", None)
+    pipeline = load_pipeline(pipeline_file) if pipeline_file else None
+
+    incremental = getattr(args, "incremental", False)
+    pipelined = getattr(args, "pipelined", False)
+    manifest = getattr(args, "manifest", None)
+    if manifest:
+        return orchestrate_manifest(manifest, pipeline, getattr(args, "restart", False))
+    paths = expand_inputs(args.input)
+    if len(paths) != 1:
+        return orchestrate_many(paths, pipeline, incremental, pipelined)
+
     print("=== Orchestrator Starting ===")
 
-    if not os.path.exists(args.input):
-        print(f"Input file not found: {args.input}")
+    if not os.path.exists(paths[0]):
+        print(f"Input file not found: {paths[0]}")
         return
 
-    with open(args.input, "r") as f:
-        content = f.read()
+    content = read_input(paths[0])
 
-    state = {}
-    # Call all tools in the order you want
-    for tool_name in ["summarize", "todo"]:
-        tool_entry = TOOLS.get(tool_name)
-        if not tool_entry:
-            print(f"Tool not found: {tool_name}")
-            continue
+    memo = load_memo(paths[0]) if incremental else None
+    before = {name: entry["fingerprint"] for name, entry in (memo or {}).items()}
 
-        result = tool_entry["fn"](content)
-        state[tool_name] = result
-        # Use output of summarize as input to todo
-        content = result if tool_name == "summarize" else content
+    if pipelined:
+        state, printed = run_tools_pipelined(content, pipeline, memo,
+                                             stream=getattr(args, "stream", False))
+    elif getattr(args, "stream", False):
+        state, printed = run_tools_streaming(content, pipeline, memo)
+    else:
+        state, printed = run_tools(content, pipeline, memo), ()
 
-    # Print results
-    print("\nSummary:")
-    print(state.get("summarize", ""))
+    if incremental:
+        reused = _reused(before, memo)
+        if reused:
+            print(f"Unchanged, reused previous results: {', '.join(reused)}")
 
-    print("\nTodos:")
-    print("\n".join(state.get("todo", [])))
+    # Print results
+    print_results(state, printed)
 
     # Save state
-    saved_state = load_state()
-    saved_state.update(state)
-    save_state(saved_state)
+    update_state(state)
+    if incremental:
+        memos = StateBatch(MEMO_KEY)
+        memos.add(os.path.abspath(paths[0]), memo)
+        memos.flush()
 
     print("=== Orchestrator Finished ===")
+
+
+def orchestrate_many(paths, pipeline=None, incremental=False, pipelined=False):
+    """Run the tool chain over many files concurrently"""
+    if not paths:
+        print("No input files found")
+        return
+
+    print(f"=== Orchestrator Starting ({len(paths)} files) ===")
+    batch = StateBatch("orchestrations")
+    memos = StateBatch(MEMO_KEY)
+    all_memos = get_state(MEMO_KEY, {}) if incremental else {}
+
+    def run(content, memo=None):
+        if pipelined:
+            return run_tools_pipelined(content, pipeline, memo)[0]
+        return run_tools(content, pipeline, memo)
+
+    def job(path):
+        if not incremental:
+            return run(read_input(path)), None
+        memo = dict(all_memos.get(os.path.abspath(path), {}))
+        return run(read_input(path), memo), memo
+
+    def on_result(path, result, error):
+        print(f"\n==> {path} <==")
+        if error:
+            print(f"Error: {error}")
+            return
+        state, memo = result
+        print_results(state)
+        batch.add(path, state)
+        if memo is not None:
+            memos.add(os.path.abspath(path), memo)
+
+    run_many(paths, job, on_result)
+    batch.flush()
+    memos.flush()
+
+    print("=== Orchestrator Finished ===")
+
+
+def orchestrate_manifest(manifest, pipeline=None, restart=False):
+    """Run the tool chain over a manifest of inputs, resumably
+
+    Progress is kept in state (see workqueue.py): each finished stage is
+    checkpointed, so after a crash or Ctrl-C the same command picks up
+    where the run stopped. Prints one progress line per file with an ETA.
+    """
+    from vibe_coding.workqueue import DONE, RUNNING, WorkQueue, read_manifest
+
+    if not os.path.exists(manifest):
+        print(f"Manifest not found: {manifest}")
+        return
+    pipeline = pipeline or DEFAULT_PIPELINE
+    paths = read_manifest(manifest)
+    queue = WorkQueue(manifest, pipeline)
+    resumed = queue.open(paths, restart)
+
+    print(f"=== Orchestrator Starting ({len(paths)} files from {manifest}) ===")
+    total = len(paths)
+    done_before = queue.count(DONE)
+    interrupted = queue.count(RUNNING)
+    remaining = queue.remaining()
+    if resumed and (done_before or interrupted):
+        print(f"Resuming: {done_before} done, {len(remaining)} to go"
+              + (f" ({interrupted} restart from their last checkpoint)" if interrupted else ""))
+
+    batch = StateBatch("orchestrations")
+    started = time.monotonic()
+    finished = 0
+    failed = []
+
+    def job(path):
+        queue.start(path)
+        item_started = time.monotonic()
+        results = run_pipeline(pipeline, {"text": read_input(path)}, done=queue.checkpoints(path),
+                               on_stage=lambda stage, result: queue.checkpoint(path, stage, result))
+        return results, time.monotonic() - item_started
+
+    def on_result(path, result, error):
+        nonlocal finished
+        finished += 1
+        if error:
+            queue.fail(path, error)
+            failed.append(path)
+            outcome = f"failed: {error}"
+        else:
+            results, seconds = result
+            queue.finish(path, seconds)
+            batch.add(path, results)
+            outcome = f"done in {seconds:.1f}s"
+        elapsed = time.monotonic() - started
+        eta = elapsed / finished * (len(remaining) - finished)
+        print(f"[{done_before + finished}/{total}] {path}: {outcome} "
+              f"(elapsed {_duration(elapsed)}, ETA {_duration(eta)})")
+
+    try:
+        run_many(remaining, job, on_result)
+    except KeyboardInterrupt:
+        batch.flush()
+        print(f"\nInterrupted with {done_before + finished - len(failed)} of {total} files done; "
+              "run the same command again to resume.")
+        return
+    batch.flush()
+
+    if failed:
+        print(f"{len(failed)} files failed; run the same command again to retry them.")
+    else:
+        queue.clear()
+    print("=== Orchestrator Finished ===")
+
+
+def _duration(seconds):
+    """Format seconds as h:mm:ss or m:ss"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
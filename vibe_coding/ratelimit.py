@@ -0,0 +1,107 @@
+"""Client-side rate limiting and retry backoff for model calls"""
+import email.utils
+import os
+import random
+import threading
+import time
+
+RPM_LIMIT = int(os.getenv("AGENT_RPM", 3500))
+TPM_LIMIT = int(os.getenv("AGENT_TPM", 90000))
+MAX_RETRIES = int(os.getenv("AGENT_MAX_RETRIES", 5))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 60.0
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """Take amount tokens now and return how long to wait before using them
+
+        The balance may go negative, so callers queue up fairly behind each
+        other instead of all retrying at once.
+        """
+        amount = min(amount, self.capacity)
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits shared by all callers"""
+
+    def __init__(self, rpm=None, tpm=None):
+        self.requests = TokenBucket(rpm or RPM_LIMIT)
+        self.tokens = TokenBucket(tpm or TPM_LIMIT)
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self, tokens):
+        """Reserve one request and tokens; return seconds to wait"""
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        with self.lock:
+            paused = self.blocked_until - time.monotonic()
+        return max(wait, paused)
+
+    def acquire(self, tokens):
+        """Block the calling thread until the request may be sent"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold back every caller for seconds, e.g. after a 429 with Retry-After"""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def retry_after_seconds(error):
+    """Return the server's requested delay from a rate-limit error, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Jittered exponential backoff, never shorter than the server's Retry-After"""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    if retry_after is not None:
+        # Small jitter on top so waiting callers don't all return together
+        delay = retry_after + random.uniform(0, BACKOFF_BASE)
+    return delay
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """Return the process-wide rate limiter"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
@@ -0,0 +1,151 @@
+"""Size- and latency-aware model routing for ai_call
+
+Routes are read from a JSON file (AGENT_ROUTES or `agent --routes FILE`),
+either a list or {"routes": [...]} of:
+
+    {"name": "small", "model": "gpt-4o-mini", "max_tokens": 4000}
+    {"name": "large", "model": "gpt-4o", "max_tokens": 100000,
+     "base_url": "https://...", "api_key_env": "LARGE_API_KEY"}
+
+Each call's prompt tokens are estimated locally. The smallest route
+whose max_tokens fits (a route without max_tokens fits anything) is
+preferred; summarize sends inputs larger than every route to its chunked
+path. An EWMA of each route's observed latency moves traffic off a route
+that is more than SLOW_FACTOR times slower than the fastest route that
+fits, to the next one up, while every PROBE_EVERY-th call still goes to
+it so a recovered route is noticed.
+
+Without a routes file there is a single route for utils.MODEL, which
+behaves exactly like calling it directly.
+"""
+import json
+import os
+import threading
+from collections import namedtuple
+from vibe_coding import utils
+
+ROUTES_FILE = os.getenv("AGENT_ROUTES") or None
+
+# A route this many times slower than the fastest fitting route is avoided
+SLOW_FACTOR = float(os.getenv("AGENT_ROUTE_SLOW_FACTOR", 2.0))
+# Weight of the newest latency sample in each route's moving average
+EWMA_ALPHA = 0.2
+# One call in this many still goes to an avoided route, to re-measure it
+PROBE_EVERY = 20
+# Latencies below this are treated as equal (noise, cache-warm endpoints)
+MIN_SECONDS = 0.05
+
+Route = namedtuple("Route", "name model base_url api_key_env max_tokens")
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def parse_routes(spec):
+    """Build Routes from a parsed routes file; raise ValueError if malformed"""
+    if isinstance(spec, dict):
+        spec = spec.get("routes")
+    if not isinstance(spec, list) or not spec:
+        raise ValueError("routes must be a non-empty list")
+    routes = []
+    for entry in spec:
+        if not isinstance(entry, dict) or not entry.get("model"):
+            raise ValueError(f"route needs a model: {entry!r}")
+        max_tokens = entry.get("max_tokens")
+        if max_tokens is not None and (not isinstance(max_tokens, int) or max_tokens <= 0):
+            raise ValueError(f"route max_tokens must be a positive integer: {entry!r}")
+        name = entry.get("name", entry["model"])
+        # Latency and breakers are kept per name; two routes cannot share one
+        if any(route.name == name for route in routes):
+            raise ValueError(f"duplicate route name: {name!r}")
+        routes.append(Route(name, entry["model"],
+                            entry.get("base_url"), entry.get("api_key_env"), max_tokens))
+    return routes
+
+
+def load_routes(path):
+    with open(path, "r") as f:
+        return parse_routes(json.load(f))
+
+
+class Router:
+    """Pick a route per prompt and learn each route's latency"""
+
+    def __init__(self, routes=None):
+        self.routes = routes
+        self.latency = {}
+        self.skipped = {}
+        self.lock = threading.Lock()
+
+    def get_routes(self):
+        return self.routes or [Route("default", utils.MODEL, None, None, None)]
+
+    def candidates(self, tokens):
+        """Routes that fit tokens, smallest first (or the largest if none fit)"""
+        routes = self.get_routes()
+        fitting = [route for route in routes if route.max_tokens is None or tokens <= route.max_tokens]
+        if not fitting:
+            return [max(routes, key=lambda route: route.max_tokens)]
+        # Stable: routes with the same limit keep their order in the file
+        return sorted(fitting, key=lambda route: (route.max_tokens is None, route.max_tokens or 0))
+
+    def preferred(self, prompt):
+        """The route prompt fits best, ignoring latency (e.g. for batch requests)"""
+        return self.candidates(utils.estimate_tokens(prompt))[0]
+
+    def choose(self, prompt):
+        """Return the Route to send prompt to"""
+        candidates = self.candidates(utils.estimate_tokens(prompt))
+        with self.lock:
+            known = [self.latency[route.name] for route in candidates if route.name in self.latency]
+            fastest = max(min(known), MIN_SECONDS) if known else None
+            for route in candidates:
+                latency = self.latency.get(route.name)
+                if latency is None or latency <= SLOW_FACTOR * fastest:
+                    return route
+                self.skipped[route.name] = self.skipped.get(route.name, 0) + 1
+                if self.skipped[route.name] >= PROBE_EVERY:
+                    self.skipped[route.name] = 0
+                    return route
+        return candidates[-1]
+
+    def observe(self, route, seconds, failed=False):
+        """Record how long a call to route took; a failure counts as a full timeout"""
+        if failed:
+            from vibe_coding import client
+
+            seconds = max(seconds, client.READ_TIMEOUT)
+        with self.lock:
+            previous = self.latency.get(route.name)
+            self.latency[route.name] = (seconds if previous is None
+                                        else previous + EWMA_ALPHA * (seconds - previous))
+
+    def largest_context(self):
+        """The largest max_tokens of any route, or None if no route sets one"""
+        limits = [route.max_tokens for route in self.get_routes() if route.max_tokens]
+        return max(limits) if limits else None
+
+    def settings(self):
+        """Configured routes, for incremental-run fingerprints (None by default)"""
+        if not self.routes:
+            return None
+        return [[route.name, route.model, route.max_tokens] for route in self.routes]
+
+
+def get_router():
+    """Return the process-wide Router, loading ROUTES_FILE on first use"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = Router(load_routes(ROUTES_FILE) if ROUTES_FILE else None)
+    return _router
+
+
+def configure(path):
+    """Use the routes in path; latency history starts over"""
+    global ROUTES_FILE, _router
+    with _router_lock:
+        router = Router(load_routes(path))
+        ROUTES_FILE = path
+        _router = router
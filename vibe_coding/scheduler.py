@@ -0,0 +1,352 @@
+"""Dependency-graph scheduler for tool pipelines"""
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from vibe_coding import metrics, workers
+from vibe_coding.utils import TOOLS, AIText, carry_context, model_settings
+
+# Default orchestration: summarize the input, then turn the summary into todos
+DEFAULT_PIPELINE = [
+    {"tool": "summarize"},
+    {"tool": "todo", "inputs": {"text": "summary"}},
+]
+
+# With --workers above 1, CPU-bound stages only go to a worker process for
+# inputs at least this big; below it, pickling and process start-up cost
+# more than they save
+PROCESS_MIN_BYTES = int(os.getenv("AGENT_PROCESS_MIN_BYTES", 1 << 20))
+
+# Chunks buffered between a streaming stage and each of its consumers; a
+# slower consumer holds the producer back instead of buffering everything
+PIPE_QUEUE_CHUNKS = int(os.getenv("AGENT_PIPE_QUEUE", 64))
+
+_END = object()
+
+
+def load_pipeline(path):
+    """Load a pipeline spec: a JSON list of stages or {"stages": [...]}"""
+    with open(path, "r") as f:
+        spec = json.load(f)
+    return spec["stages"] if isinstance(spec, dict) else spec
+
+
+# ----------------------
+# Graph construction
+# ----------------------
+def build_graph(pipeline, sources=("text",)):
+    """Resolve stages against TOOLS and return them with their dependencies
+
+    Each stage is {"tool": name, "name": optional stage name,
+    "inputs": {tool_input: data_name}}. A tool input binds to the data
+    item of the same name unless remapped. Tool outputs are published
+    under their declared names.
+    """
+    stages = []
+    producers = {}
+    for spec in pipeline:
+        entry = TOOLS.get(spec["tool"])
+        if not entry:
+            print(f"Tool not found: {spec['tool']}")
+            continue
+
+        name = spec.get("name", spec["tool"])
+        bindings = spec.get("inputs", {})
+        stage = {
+            "name": name,
+            "tool": spec["tool"],
+            "entry": entry,
+            "inputs": [bindings.get(item, item) for item in entry["inputs"]],
+            "outputs": list(entry["outputs"]) or [name],
+        }
+        for output in stage["outputs"]:
+            if output in producers:
+                raise ValueError(f"Data '{output}' is produced by both "
+                                 f"'{producers[output]}' and '{name}'")
+            producers[output] = name
+        stages.append(stage)
+
+    for stage in stages:
+        stage["deps"] = set()
+        for item in stage["inputs"]:
+            if item in producers:
+                stage["deps"].add(producers[item])
+            elif item not in sources:
+                raise ValueError(f"Stage '{stage['name']}' needs unknown input '{item}'")
+
+    _topological(stages)
+    return stages
+
+
+def _topological(stages):
+    """Return stages with each after its dependencies; raise ValueError on a cycle"""
+    deps = {stage["name"]: stage["deps"] for stage in stages}
+    done = set()
+    order = []
+    while len(done) < len(deps):
+        ready = [name for name, needs in deps.items() if name not in done and needs <= done]
+        if not ready:
+            cycle = sorted(set(deps) - done)
+            raise ValueError(f"Pipeline has a dependency cycle between {cycle}")
+        done.update(ready)
+        order.extend(ready)
+    by_name = {stage["name"]: stage for stage in stages}
+    return [by_name[name] for name in order]
+
+
+# ----------------------
+# Execution
+# ----------------------
+def _input_size(args):
+    return sum(len(arg) for arg in args if isinstance(arg, (str, bytes)))
+
+
+def _digest(value):
+    if isinstance(value, str):
+        return hashlib.sha256(value.encode("utf-8")).digest()
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).digest()
+
+
+def stage_fingerprint(stage, args):
+    """Hash of everything a stage's result depends on
+
+    That is the tool name and version, the model settings for tools that
+    call the model, and the content of each input. A stage whose upstream
+    re-ran but produced the same output keeps its fingerprint.
+    """
+    entry = stage["entry"]
+    header = {"tool": stage["tool"], "version": entry.get("version", 1)}
+    if entry.get("uses_model"):
+        header["model"] = model_settings()
+    h = hashlib.sha256(json.dumps(header, sort_keys=True).encode("utf-8"))
+    for arg in args:
+        h.update(_digest(arg))
+    return h.hexdigest()
+
+
+def _remember(memo, stage, fingerprint, result):
+    # Stub fallbacks are not kept, so the next run retries the model
+    if getattr(result, "source", None) == "stub":
+        memo.pop(stage["name"], None)
+    else:
+        memo[stage["name"]] = {"fingerprint": fingerprint, "result": result}
+
+
+def _publish(stage, result, data):
+    if len(stage["outputs"]) == 1:
+        data[stage["outputs"][0]] = result
+    else:
+        for output in stage["outputs"]:
+            data[output] = result[output]
+
+
+def run_pipeline(pipeline, data, done=None, memo=None, on_stage=None):
+    """Run pipeline stages as soon as their inputs exist; return {stage: result}
+
+    Independent stages run concurrently: threads for I/O-bound tools and,
+    when --workers is above 1, worker processes for large inputs to
+    cpu_bound tools (partitioned across them when the tool has split_on).
+    Stages already in done ({stage: result}) are not run again; their
+    results are used as-is.
+
+    memo ({stage: {"fingerprint", "result"}}, updated in place) enables
+    incremental runs: a stage whose stage_fingerprint() matches its memo
+    entry is skipped and the remembered result reused.
+
+    on_stage(name, result) is called as each stage that actually ran
+    finishes, e.g. to checkpoint it.
+    """
+    stages = build_graph(pipeline, sources=tuple(data))
+    data = dict(data)
+    results = {}
+    pending = {stage["name"]: stage for stage in stages}
+    running = {}
+    started = {}
+    fingerprints = {}
+
+    if memo is not None:
+        for name in list(memo):
+            if name not in pending:
+                del memo[name]
+
+    # Dependencies first, so each stage's inputs are published before it is memoized
+    done = done or {}
+    for stage in _topological(stages):
+        name = stage["name"]
+        if name in done:
+            result = done[name]
+            del pending[name]
+            if memo is not None and all(item in data for item in stage["inputs"]):
+                args = [data[item] for item in stage["inputs"]]
+                _remember(memo, stage, stage_fingerprint(stage, args), result)
+            _publish(stage, result, data)
+            results[name] = result
+
+    with ThreadPoolExecutor(max_workers=max(1, len(stages))) as threads:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if not stage["deps"] <= set(results):
+                    continue
+                args = [data[item] for item in stage["inputs"]]
+                if memo is not None:
+                    fingerprints[name] = stage_fingerprint(stage, args)
+                    previous = memo.get(name)
+                    if previous and previous["fingerprint"] == fingerprints[name]:
+                        results[name] = previous["result"]
+                        _publish(stage, previous["result"], data)
+                        del pending[name]
+                        continue
+                size = _input_size(args)
+                if len(args) == 1 and workers.can_partition(stage["tool"], size):
+                    # Partitions go to the process pool; a thread waits to merge them
+                    future = threads.submit(carry_context(workers.run_text), stage["tool"], args[0])
+                elif (stage["entry"].get("cpu_bound") and size >= PROCESS_MIN_BYTES
+                      and workers.WORKERS > 1):
+                    future = workers.get_pool().submit(stage["entry"]["fn"], *args)
+                else:
+                    future = threads.submit(carry_context(stage["entry"]["fn"]), *args)
+                running[future] = stage
+                started[name] = time.perf_counter()
+                del pending[name]
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                # Stage time as the scheduler sees it, including any worker
+                # process hand-off the tool's own span cannot observe
+                metrics.record("stage", stage["name"], time.perf_counter() - started[stage["name"]])
+                result = future.result()
+                results[stage["name"]] = result
+                _publish(stage, result, data)
+                if memo is not None:
+                    _remember(memo, stage, fingerprints[stage["name"]], result)
+                if on_stage:
+                    on_stage(stage["name"], result)
+    return results
+
+
+# ----------------------
+# Pipelining
+# ----------------------
+def find_pipes(stages):
+    """Return (producer, consumers) pairs that can run overlapped
+
+    A producer is a root stage with a stream variant (@tool_stream); its
+    consumers are the stages whose only input is its output and that
+    have a consume variant (@tool_consume).
+    """
+    pipes = []
+    for producer in stages:
+        if producer["deps"] or "stream" not in producer["entry"] or len(producer["outputs"]) != 1:
+            continue
+        consumers = [stage for stage in stages
+                     if stage["inputs"] == producer["outputs"] and "consume" in stage["entry"]]
+        if consumers:
+            pipes.append((producer, consumers))
+    return pipes
+
+
+class _Pipe:
+    """Bounded queue of chunks, iterable once until the producer ends it"""
+
+    def __init__(self):
+        self.queue = queue.Queue(PIPE_QUEUE_CHUNKS)
+        self.ended = False
+
+    def __iter__(self):
+        while not self.ended:
+            chunk = self.queue.get()
+            if chunk is _END:
+                self.ended = True
+                return
+            yield chunk
+
+
+def run_pipe(producer, consumers, args, on_chunk=None):
+    """Stream producer's output into its consumers as it is generated
+
+    Each consumer runs in a thread reading the chunks from its own _Pipe,
+    so the stages overlap and the pair takes about as long as the slower
+    one. on_chunk(chunk) sees every chunk too (e.g. to print it). Returns
+    {stage name: result}: the producer's chunks joined, and the list of
+    items each consumer yielded, as their fn would have returned.
+    """
+    pipes = [_Pipe() for _ in consumers]
+    results = {}
+    errors = []
+
+    def consume(stage, pipe):
+        started = time.perf_counter()
+        try:
+            results[stage["name"]] = _collect(stage["entry"]["consume"], pipe)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            # Read on after an error or early return, so the producer never blocks
+            for _ in pipe:
+                pass
+            metrics.record("stage", stage["name"], time.perf_counter() - started)
+
+    threads = [threading.Thread(target=carry_context(consume), args=(stage, pipe), daemon=True)
+               for stage, pipe in zip(consumers, pipes)]
+    for thread in threads:
+        thread.start()
+
+    started = time.perf_counter()
+    parts = []
+    source = "model"
+    try:
+        for chunk in _iterate(producer["entry"]["stream"](*args)):
+            parts.append(chunk)
+            source = getattr(chunk, "source", source)
+            if on_chunk:
+                on_chunk(chunk)
+            for pipe in pipes:
+                pipe.queue.put(chunk)
+    finally:
+        for pipe in pipes:
+            pipe.queue.put(_END)
+        for thread in threads:
+            thread.join()
+    metrics.record("stage", producer["name"], time.perf_counter() - started)
+
+    if errors:
+        raise errors[0]
+    # Producer first, so callers folding the results see inputs before their consumers
+    return {producer["name"]: AIText("".join(parts), source),
+            **{stage["name"]: results[stage["name"]] for stage in consumers}}
+
+
+def _iterate(chunks):
+    """Iterate over an iterator or an async iterator (on a private event loop)"""
+    if not hasattr(chunks, "__aiter__"):
+        yield from chunks
+        return
+    loop = asyncio.new_event_loop()
+    try:
+        iterator = chunks.__aiter__()
+        while True:
+            try:
+                yield loop.run_until_complete(iterator.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.close()
+
+
+async def _aiter(chunks):
+    # Blocking reads are fine here: the loop belongs to one consumer thread
+    for chunk in chunks:
+        yield chunk
+
+
+def _collect(consume, chunks):
+    """Run a consume variant on chunks and return what it yielded as a list"""
+    if inspect.isasyncgenfunction(consume):
+        chunks = _aiter(chunks)
+    return list(_iterate(consume(chunks)))
@@ -0,0 +1,197 @@
+"""Long-running `agent serve` daemon and the client side of job forwarding
+
+The daemon listens on a Unix socket in the directory it was started from
+(next to agent_state.json). CLI runs in that directory forward summarize,
+todo and orchestrate jobs to it instead of starting cold: the request is
+one JSON line with the command-line arguments, and the reply is the
+command's stdout, streamed back as it is printed (partial lines
+included, so `--stream` output reaches the terminal token by token).
+
+Jobs run with the daemon's environment, so a job is only forwarded when
+the caller's AGENT_* and OPENAI_* variables match the ones the daemon
+started with (compared by digest; values never cross the socket).
+Otherwise the CLI runs it locally. The socket is readable and writable
+by its owner only.
+"""
+import codecs
+import contextvars
+import hashlib
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+
+SOCKET_FILE = ".agent.sock"
+
+# Commands the CLI may hand to a running daemon
+FORWARDED_COMMANDS = ("summarize", "todo", "orchestrate")
+
+READ_SIZE = 1 << 16
+
+# Environment variables that change how a job runs
+ENV_PREFIXES = ("AGENT_", "OPENAI_")
+
+
+def environment_digest():
+    """Digest of the AGENT_* and OPENAI_* environment variables"""
+    settings = sorted((key, value) for key, value in os.environ.items()
+                      if key.startswith(ENV_PREFIXES))
+    return hashlib.sha256(json.dumps(settings).encode("utf-8")).hexdigest()
+
+
+# ----------------------
+# Client side
+# ----------------------
+def forward(argv, out=None):
+    """Run argv on the daemon and stream its output; False if none is running"""
+    out = out or sys.stdout
+    if not os.path.exists(SOCKET_FILE):
+        return False
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(SOCKET_FILE)
+    except OSError:
+        sock.close()
+        return False
+
+    with sock:
+        request = {"argv": argv, "cwd": os.getcwd(), "env": environment_digest()}
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        with sock.makefile("rb") as reply:
+            status = json.loads(reply.readline() or b'{"ok": false}')
+            if not status.get("ok"):
+                return False
+            # Relay whatever has arrived, not whole lines, so streamed
+            # tokens show up as soon as the daemon prints them
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            while True:
+                data = reply.read1(READ_SIZE)
+                text = decoder.decode(data, final=not data)
+                if text:
+                    out.write(text)
+                    out.flush()
+                if not data:
+                    break
+    return True
+
+
+# ----------------------
+# Daemon side
+# ----------------------
+class _ThreadStdout:
+    """sys.stdout replacement that sends each job's prints to its client
+
+    The target is a context variable, so threads a job starts through
+    utils.carry_context (AI calls, fan-out and pipeline stages, hedges)
+    print to the same client.
+    """
+
+    def __init__(self, default):
+        self.default = default
+        self.target = contextvars.ContextVar("target", default=None)
+
+    def write(self, text):
+        target = self.target.get() or self.default
+        return target.write(text)
+
+    def flush(self):
+        target = self.target.get() or self.default
+        target.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.default, name)
+
+
+def _handle(conn, parser, run_command, stdout, env):
+    """Serve one forwarded job on an accepted connection
+
+    env is the daemon's environment_digest(); jobs from a caller with
+    other settings are refused so they run locally.
+    """
+    with conn, conn.makefile("rw", encoding="utf-8") as stream:
+        try:
+            request = json.loads(stream.readline())
+            args = parser.parse_args(request["argv"])
+        except (ValueError, KeyError, SystemExit):
+            stream.write(json.dumps({"ok": False}) + "\n")
+            return
+        # Relative paths, agent_state.json and settings must mean the same thing
+        if (request.get("cwd") != os.getcwd() or request.get("env") != env
+                or args.command not in FORWARDED_COMMANDS):
+            stream.write(json.dumps({"ok": False}) + "\n")
+            return
+
+        stream.write(json.dumps({"ok": True}) + "\n")
+        stream.flush()
+        token = stdout.target.set(stream)
+        try:
+            run_command(args)
+        finally:
+            stdout.target.reset(token)
+            stream.flush()
+
+
+def warm_up():
+    """Load tools, the API client and the response cache before the first job"""
+    from vibe_coding.cache import get_cache
+    from vibe_coding.client import get_client
+    from vibe_coding.utils import TOOLS
+
+    for entry in list(TOOLS.values()):
+        entry["fn"]
+    get_client()
+    get_cache()
+
+
+def _stop_on_sigterm(signum, frame):
+    raise KeyboardInterrupt
+
+
+def serve(parser, run_command, ready=None, stop=None):
+    """Accept forwarded jobs until interrupted (or until stop is set)"""
+    if os.path.exists(SOCKET_FILE):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(SOCKET_FILE)
+            print(f"A daemon is already listening on {SOCKET_FILE}")
+            return
+        except OSError:
+            os.remove(SOCKET_FILE)  # stale socket from a crashed daemon
+        finally:
+            probe.close()
+
+    env = environment_digest()
+    warm_up()
+    if threading.current_thread() is threading.main_thread():
+        # Remove the socket on `kill` as well as on Ctrl-C
+        signal.signal(signal.SIGTERM, _stop_on_sigterm)
+    stdout = _ThreadStdout(sys.stdout)
+    sys.stdout = stdout
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(SOCKET_FILE)
+    # Forwarded jobs run as this user; nobody can connect before listen()
+    os.chmod(SOCKET_FILE, 0o600)
+    listener.listen(64)
+    listener.settimeout(0.5)
+    print(f"Serving on {SOCKET_FILE} (Ctrl-C to stop)")
+    if ready:
+        ready.set()
+    try:
+        while not (stop and stop.is_set()):
+            try:
+                conn, _ = listener.accept()
+            except socket.timeout:
+                continue
+            conn.settimeout(None)
+            threading.Thread(target=_handle, args=(conn, parser, run_command, stdout, env),
+                             daemon=True).start()
+    except KeyboardInterrupt:
+        print("\nStopping daemon.")
+    finally:
+        listener.close()
+        if os.path.exists(SOCKET_FILE):
+            os.remove(SOCKET_FILE)
+        sys.stdout = stdout.default
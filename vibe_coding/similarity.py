@@ -0,0 +1,150 @@
+"""Near-duplicate text fingerprints (SimHash) with indexed lookup keys
+
+simhash() maps text to a 64-bit fingerprint in which similar texts
+differ in few bits. Feature bits are summed with NumPy when it is
+installed (a pure-Python loop otherwise, with the same result).
+
+Indexes find close fingerprints with multi-index keys: fingerprints are
+stored under BLOCKS fixed 16-bit blocks, and a lookup probes each block
+with every value within max_distance // BLOCKS bits of it. Two
+fingerprints within max_distance bits are that close on at least one
+block, and each probe only matches 1/65536 of the index (bands sized to
+the distance would be a few bits wide and match most of it).
+"""
+import hashlib
+import itertools
+import re
+import threading
+from collections import Counter, OrderedDict
+
+BITS = 64
+SHINGLE = 4
+
+# Multi-index blocks per fingerprint (BITS // BLOCKS bits each)
+BLOCKS = 4
+# Probe values per query, below SQLite's bound-parameter limit
+PROBES_PER_QUERY = 500
+
+# Fingerprints remembered by text digest
+CACHE_ENTRIES = 1 << 16
+# Features whose bits are unpacked at once (bounds the temporary arrays)
+_SIMHASH_BLOCK = 1 << 12
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+_NUMBER_RE = re.compile(r"\d+")
+_WORD_RE = re.compile(r"\w+")
+
+# Volatile tokens that differ between otherwise identical texts (log lines,
+# requests), replaced by placeholders before numbers are collapsed
+_VOLATILE = [
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b"), "<id>"),
+    (re.compile(r"\b\d{4}-\d\d-\d\d[t ]\d\d:\d\d(:\d\d(\.\d+)?)?(z|[+-]\d\d:?\d\d)?"), "<time>"),
+    (re.compile(r"\b\d{1,3}(\.\d{1,3}){3}(:\d+)?\b"), "<ip>"),
+    (re.compile(r"\b[a-z][\w-]*(\.[a-z][\w-]*)+\.(com|net|org|io|dev|internal|local|lan)\b"), "<host>"),
+    (re.compile(r"\b(?=[0-9a-f]*\d)(?=[0-9a-f]*[a-f])[0-9a-f]{8,}\b"), "<hex>"),
+]
+
+
+def normalize(text):
+    """Lowercase text and mask volatile tokens
+
+    UUIDs, timestamps, IP addresses, host names and hex ids become
+    placeholders, and remaining numbers (counts, ids, times) become 0.
+    """
+    text = text.lower()
+    for pattern, placeholder in _VOLATILE:
+        text = pattern.sub(placeholder, text)
+    return _NUMBER_RE.sub("0", text)
+
+
+def features(text, size=SHINGLE):
+    """Overlapping character shingles of normalized text
+
+    Character shingles suit one-line todos better than words: a changed
+    word only disturbs the few shingles around it.
+    """
+    text = " ".join(_WORD_RE.findall(normalize(text)))
+    return [text[i:i + size] for i in range(max(1, len(text) - size + 1))]
+
+
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text):
+    """64-bit SimHash of text's features
+
+    Results are cached under a digest of text (repeated lines are
+    common), so the cache holds at most CACHE_ENTRIES small keys however
+    long the texts are.
+    """
+    key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    with _cache_lock:
+        fingerprint = _cache.get(key)
+        if fingerprint is not None:
+            _cache.move_to_end(key)
+            return fingerprint
+    fingerprint = _simhash(Counter(features(text)))
+    with _cache_lock:
+        _cache[key] = fingerprint
+        if len(_cache) > CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return fingerprint
+
+
+def _simhash(counts):
+    """Fingerprint of {feature: count}: bit i is set where features with
+    bit i set outweigh those without"""
+    hashes = [_feature_hash(feature) for feature in counts]
+    weights = list(counts.values())
+    try:
+        import numpy as np
+    except ImportError:  # NumPy is not installed
+        totals = [0] * BITS
+        for h, weight in zip(hashes, weights):
+            for bit in range(BITS):
+                totals[bit] += weight if h >> bit & 1 else -weight
+        return sum(1 << bit for bit, total in enumerate(totals) if total > 0)
+
+    hashes = np.array(hashes, dtype="<u8")
+    weights = np.array(weights, dtype=np.int64)
+    ones = np.zeros(BITS, dtype=np.int64)
+    for start in range(0, len(hashes), _SIMHASH_BLOCK):
+        block = hashes[start:start + _SIMHASH_BLOCK]
+        # Row i holds feature i's bits, least significant first
+        bits = np.unpackbits(block.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+        ones += weights[start:start + _SIMHASH_BLOCK] @ bits.astype(np.int64)
+    return sum(1 << bit for bit in np.flatnonzero(2 * ones > weights.sum()).tolist())
+
+
+def hamming(a, b):
+    """Number of differing bits between two fingerprints"""
+    return bin(a ^ b).count("1")
+
+
+def blocks(fingerprint):
+    """The (block number, value) keys a fingerprint is stored under"""
+    width = BITS // BLOCKS
+    mask = (1 << width) - 1
+    return [(block, fingerprint >> (block * width) & mask) for block in range(BLOCKS)]
+
+
+def probes(fingerprint, max_distance):
+    """(block number, values) to look up to find every fingerprint stored
+    with blocks() that is within max_distance bits of fingerprint"""
+    width = BITS // BLOCKS
+    radius = min(max_distance // BLOCKS, width)
+    flips = [sum(1 << bit for bit in bits)
+             for r in range(radius + 1) for bits in itertools.combinations(range(width), r)]
+    return [(block, [value ^ flip for flip in flips]) for block, value in blocks(fingerprint)]
+
+
+def to_signed(fingerprint):
+    """Map a 64-bit fingerprint into SQLite's signed INTEGER range"""
+    return fingerprint - (1 << BITS) if fingerprint >= 1 << (BITS - 1) else fingerprint
+
+
+def from_signed(value):
+    return value + (1 << BITS) if value < 0 else value
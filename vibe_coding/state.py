@@ -0,0 +1,488 @@
+"""Append-only, multi-writer state log
+
+Each line of the state file is a JSON object holding the keys changed by
+one write (plus "__deleted__" for removed keys); the current state is all
+lines folded in order. Writers append a single line under an exclusive
+flock, so concurrent CLI runs never overwrite each other's keys, and the
+log is periodically compacted back to one line. A legacy agent_state.json
+(a single JSON object) is migrated in place on the first write.
+
+Large values are kept out of the log: any value whose JSON is at least
+BLOB_MIN_BYTES is stored once, gzip-compressed and named by its SHA-256,
+in agent_blobs/ next to the state file, and the log holds a small
+{"__blob__": digest} reference instead. Dicts are stored level by level,
+so adding one file's results to a per-file map writes only the new entry
+and a map of references. read() returns a LazyState that loads a blob
+the first time its key is accessed, so parsing the log at start-up stays
+cheap however much output has accumulated. A value produced piece by
+piece (e.g. a streamed todo list) is written through a BlobWriter, which
+hashes and compresses it as it arrives, and only its reference is
+appended.
+"""
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from vibe_coding import metrics
+
+DELETED = "__deleted__"
+BLOB = "__blob__"
+
+# Logs smaller than this are never compacted
+COMPACT_MIN_BYTES = int(os.getenv("AGENT_STATE_COMPACT_BYTES", 1 << 20))
+
+# Superseded records kept in the log before it is compacted to one line
+HISTORY_RECORDS = int(os.getenv("AGENT_STATE_HISTORY", 1000))
+
+# Values whose JSON is at least this long are stored as blobs
+BLOB_MIN_BYTES = int(os.getenv("AGENT_STATE_BLOB_BYTES", 4096))
+
+# Compaction deletes blobs nothing references once they are this old, so
+# a reader holding an older reference can still load it
+BLOB_GRACE_SECONDS = 3600
+
+BLOB_DIR = "agent_blobs"
+
+# Bytes read at a time while counting the log's records
+_SCAN_SIZE = 1 << 20
+
+
+class StateLog:
+    """Keyed state stored as an append-only JSON-lines log"""
+
+    def __init__(self, path):
+        self.path = path
+        self.blobs = BlobStore(os.path.join(os.path.dirname(os.path.abspath(path)), BLOB_DIR))
+
+    # ----------------------
+    # Reading
+    # ----------------------
+    def read(self):
+        """Return the folded state, ignoring any torn trailing write
+
+        Blob references are loaded on first access (see LazyState).
+        """
+        return LazyState(self._read_raw(), self.blobs)
+
+    def _read_raw(self):
+        """Return the folded state with blob references left in place"""
+        with metrics.span("state", "read") as span:
+            try:
+                with open(self.path, "r") as f:
+                    content = f.read()
+            except OSError:
+                return {}
+            span.add(bytes_in=len(content))
+            return _fold(content)
+
+    def get(self, key, default=None):
+        """Return one key from the state"""
+        return self.read().get(key, default)
+
+    # ----------------------
+    # Writing
+    # ----------------------
+    @contextmanager
+    def _locked(self, compact=True):
+        """Hold an exclusive lock on the live log file"""
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            # Compaction may have replaced the file while we waited
+            if os.fstat(fd).st_ino == os.stat(self.path).st_ino and not self._repair(fd):
+                break
+            os.close(fd)
+        try:
+            yield fd
+            if compact:
+                self._maybe_compact(fd)
+        finally:
+            os.close(fd)
+
+    def _repair(self, fd):
+        """Terminate an unfinished last line; return True if the file was replaced
+
+        A legacy single-line agent_state.json only needs its newline; a
+        pretty-printed one is rewritten as one record. Anything else is a
+        torn write, fenced off so the next record starts on a fresh line.
+        """
+        size = os.fstat(fd).st_size
+        if not size or os.pread(fd, 1, size - 1) == b"\n":
+            return False
+        content = os.pread(fd, size, 0).decode("utf-8")
+        if "\n" in content.strip():
+            try:
+                legacy = json.loads(content)
+            except ValueError:
+                legacy = None
+            if isinstance(legacy, dict):
+                self._rewrite(legacy)
+                return True
+        os.write(fd, b"\n")
+        return False
+
+    def _append(self, fd, record, encoded=False):
+        """Write one record, moving large values to blobs; return bytes written"""
+        if not encoded:
+            record = {key: self._encode(value) for key, value in _items(record)}
+        return os.write(fd, (json.dumps(record) + "\n").encode("utf-8"))
+
+    def _encode(self, value):
+        """Replace value, or the large values inside it, with blob references
+
+        Called with the write lock held, so compaction never collects a
+        blob before the record referencing it is in the log.
+        """
+        if isinstance(value, dict) and not _is_ref(value):
+            value = {key: self._encode(item) for key, item in _items(value)}
+        data = json.dumps(value)
+        if len(data) < BLOB_MIN_BYTES or _is_ref(value):
+            return value
+        ref = {BLOB: self.blobs.put(data)}
+        if isinstance(value, dict):
+            ref["tree"] = True  # its values may be references too
+        return ref
+
+    def update(self, changes, deleted=()):
+        """Atomically set some keys and delete others"""
+        record = dict(changes)
+        if deleted:
+            record[DELETED] = list(deleted)
+        if record:
+            with metrics.span("state", "update") as span, self._locked() as fd:
+                span.add(bytes_out=self._append(fd, record))
+
+    def blob_writer(self):
+        """Return a BlobWriter for building one large value piece by piece"""
+        return BlobWriter(self.blobs)
+
+    def put_written(self, key, writer):
+        """Set key to the JSON value written to writer, with one small append"""
+        digest = writer.close()
+        # A new blob is younger than BLOB_GRACE_SECONDS, so compaction
+        # cannot collect it before this record reaches the log
+        self.update({key: {BLOB: digest} if digest else json.loads(writer.text)})
+
+    def replace(self, data):
+        """Make the state equal to data, writing only the keys that changed"""
+        with metrics.span("state", "replace") as span, self._locked() as fd:
+            current = self._read_raw()
+            encoded = {k: self._encode(v) for k, v in _items(data)}
+            record = {k: v for k, v in encoded.items() if current.get(k, DELETED) != v}
+            deleted = [k for k in current if k not in data]
+            if deleted:
+                record[DELETED] = deleted
+            if record:
+                span.add(bytes_out=self._append(fd, record, encoded=True))
+
+    def transact(self, fn):
+        """Apply fn(state) -> changed keys under the write lock and store them"""
+        with metrics.span("state", "transact") as span, self._locked() as fd:
+            changes = fn(self.read())
+            if changes:
+                span.add(bytes_out=self._append(fd, changes))
+
+    # ----------------------
+    # Compaction
+    # ----------------------
+    def _maybe_compact(self, fd):
+        """Compact once the log keeps more than HISTORY_RECORDS records, or
+        is at least COMPACT_MIN_BYTES and more than half of it was appended
+        after its first record (the state as of the last compaction)
+
+        Decided from byte offsets alone, so a write never parses the log.
+        """
+        size = os.fstat(fd).st_size
+        records, first = _count_records(fd, size)
+        if records > HISTORY_RECORDS or (size >= COMPACT_MIN_BYTES and first * 2 < size):
+            self._rewrite(self._read_raw())
+
+    def compact(self):
+        """Rewrite the log as a single record"""
+        with self._locked(compact=False):
+            self._rewrite(self._read_raw())
+
+    def _rewrite(self, state):
+        """Atomically replace the log with one line holding state
+
+        Large values still inline (e.g. from older versions) move to blobs,
+        and blobs the new state no longer references are deleted.
+        """
+        tmp_file = f"{self.path}.{os.getpid()}.tmp"
+        with metrics.span("state", "compact") as span:
+            record = {key: self._encode(value) for key, value in _items(state)}
+            with open(tmp_file, "w") as f:
+                span.add(bytes_out=f.write(json.dumps(record) + "\n"))
+            os.replace(tmp_file, self.path)
+            self.blobs.collect(record)
+
+
+# ----------------------
+# Blobs
+# ----------------------
+class BlobStore:
+    """Gzip-compressed JSON values in a directory, named by content hash"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest + ".json.gz")
+
+    def put(self, data):
+        """Store a JSON string and return its digest"""
+        raw = data.encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self._path(digest)
+        if os.path.exists(path):
+            # Refresh it so collect() sees it as recently used
+            os.utime(path)
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with metrics.span("state", "blob_write") as span:
+            with open(tmp_file, "wb") as f:
+                span.add(bytes_out=f.write(gzip.compress(raw, compresslevel=6, mtime=0)))
+            os.replace(tmp_file, path)
+        return digest
+
+    def get(self, digest):
+        """Load the value stored under digest"""
+        with metrics.span("state", "blob_read") as span:
+            with open(self._path(digest), "rb") as f:
+                data = f.read()
+            span.add(bytes_in=len(data))
+            return json.loads(gzip.decompress(data))
+
+    def collect(self, state):
+        """Delete blobs not reachable from state and older than BLOB_GRACE_SECONDS"""
+        if not os.path.isdir(self.directory):
+            return
+        live = set()
+        pending = [value for _, value in _items(state)]
+        while pending:
+            value = pending.pop()
+            if _is_ref(value):
+                if value[BLOB] not in live:
+                    live.add(value[BLOB])
+                    if value.get("tree"):
+                        try:
+                            pending.extend(self.get(value[BLOB]).values())
+                        except (OSError, ValueError):
+                            continue
+            elif isinstance(value, dict):
+                pending.extend(value.values())
+
+        cutoff = time.time() - BLOB_GRACE_SECONDS
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir():
+                continue
+            for blob in os.scandir(entry.path):
+                digest = blob.name.split(".")[0]
+                try:
+                    if digest not in live and blob.stat().st_mtime < cutoff:
+                        os.remove(blob.path)
+                except OSError:
+                    continue
+
+
+class BlobWriter:
+    """Build one JSON value in the blob store from pieces of its text
+
+    Text is hashed and gzip-compressed as it is written, so the value is
+    never held in memory. A value shorter than BLOB_MIN_BYTES is kept in
+    memory instead; close() then returns None and its JSON is in .text,
+    to be stored inline like any small value.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self.pending = []
+        self.text = None
+        self.tmp_file = None
+        self.raw = None
+        self.file = None
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        self.hash.update(data)
+        self.size += len(data)
+        if self.file is not None:
+            self.file.write(data)
+            return
+        self.pending.append(data)
+        if self.size >= BLOB_MIN_BYTES:
+            os.makedirs(self.store.directory, exist_ok=True)
+            fd, self.tmp_file = tempfile.mkstemp(suffix=".tmp", dir=self.store.directory)
+            self.raw = os.fdopen(fd, "wb")
+            self.file = gzip.GzipFile(filename="", mode="wb", compresslevel=6,
+                                      fileobj=self.raw, mtime=0)
+            for data in self.pending:
+                self.file.write(data)
+            self.pending = []
+
+    def close(self):
+        """Finish the value; return its digest, or None if it is small enough to inline"""
+        if self.file is None:
+            self.text = b"".join(self.pending).decode("utf-8")
+            return None
+        with metrics.span("state", "blob_write") as span:
+            self.file.close()
+            self.raw.close()
+            span.add(bytes_out=os.path.getsize(self.tmp_file))
+        digest = self.hash.hexdigest()
+        path = self.store._path(digest)
+        if os.path.exists(path):
+            os.utime(path)
+            os.remove(self.tmp_file)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self.tmp_file, path)
+        self.file = self.tmp_file = None
+        return digest
+
+    def discard(self):
+        """Drop whatever was written (a no-op after close)"""
+        if self.file is not None:
+            self.file.close()
+            self.raw.close()
+            self.file = None
+        if self.tmp_file is not None:
+            os.remove(self.tmp_file)
+            self.tmp_file = None
+        self.pending = []
+
+
+class LazyState(dict):
+    """State dict that loads blob-backed values the first time they are read
+
+    Nested dicts come back as LazyState too. copy() keeps references
+    unloaded, so merging into a large map (copy, then update) and writing
+    it back does not load every entry.
+    """
+
+    def __init__(self, raw, blobs):
+        super().__init__(raw)
+        self.blobs = blobs
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if _is_ref(value):
+            value = self.blobs.get(value[BLOB])
+        elif type(value) is not dict:
+            return value
+        value = LazyState(value, self.blobs) if isinstance(value, dict) else value
+        dict.__setitem__(self, key, value)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        return dict.pop(self, key, *default)
+
+    def __iter__(self):
+        # Makes dict(state) and {**state} go through __getitem__
+        return dict.__iter__(self)
+
+    def items(self):
+        return [(key, self[key]) for key in dict.keys(self)]
+
+    def values(self):
+        return [self[key] for key in dict.keys(self)]
+
+    def copy(self):
+        return LazyState(dict.items(self), self.blobs)
+
+    def resolved(self):
+        """A plain dict with every value loaded"""
+        return {key: value.resolved() if isinstance(value, LazyState) else value
+                for key, value in self.items()}
+
+    def __eq__(self, other):
+        if isinstance(other, LazyState):
+            other = other.resolved()
+        return self.resolved() == other if isinstance(other, dict) else NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.resolved())
+
+    def __reduce__(self):
+        return (dict, (self.resolved(),))
+
+
+def _is_ref(value):
+    return type(value) is dict and BLOB in value
+
+
+def _items(mapping):
+    """Items of a mapping, leaving a LazyState's references unloaded"""
+    return dict.items(mapping) if isinstance(mapping, LazyState) else mapping.items()
+
+
+def _count_records(fd, size):
+    """Return (records, bytes in the first record) of the log, reading it in blocks"""
+    records = 0
+    first = None
+    offset = 0
+    while offset < size:
+        block = os.pread(fd, min(_SCAN_SIZE, size - offset), offset)
+        if not block:
+            break
+        if first is None:
+            end = block.find(b"\n")
+            if end >= 0:
+                first = offset + end + 1
+        records += block.count(b"\n")
+        offset += len(block)
+    return records, size if first is None else first
+
+
+def _fold(content):
+    """Merge the JSON-lines records in content into one dict"""
+    state = {}
+    first = True
+    for line in content.split("\n"):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            legacy = _load_legacy(content) if first else None
+            if legacy is not None:
+                return legacy
+            # Torn write from a crashed process
+            first = False
+            continue
+        first = False
+        if not isinstance(record, dict):
+            continue
+        for key in record.pop(DELETED, []):
+            state.pop(key, None)
+        state.update(record)
+    return state
+
+
+def _load_legacy(content):
+    """Parse a pretty-printed pre-log state file, or return None"""
+    try:
+        legacy = json.loads(content)
+    except ValueError:
+        return None
+    return legacy if isinstance(legacy, dict) else None
@@ -0,0 +1,23 @@
+"""Shared fixtures for the tests"""
+from types import SimpleNamespace
+import openai
+
+
+def completion(text, prompt_tokens=None, completion_tokens=None):
+    """A chat completion response as the OpenAI client returns it
+
+    usage is only reported when token counts are given.
+    """
+    usage = None
+    if prompt_tokens is not None:
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+                           usage=usage)
+
+
+class FakeRateLimitError(openai.RateLimitError):
+    """RateLimitError that can be built without an HTTP response"""
+
+    def __init__(self, headers=None):
+        Exception.__init__(self, "429 Too Many Requests")
+        self.response = SimpleNamespace(headers=headers or {})
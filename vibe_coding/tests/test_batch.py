@@ -0,0 +1,236 @@
+"""Tests for batch.py (the `agent batch` command)"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from vibe_coding import batch
+from vibe_coding.batch import BatchRun, LocalBatchBackend, OpenAIBatchBackend
+from vibe_coding.routing import Router, parse_routes
+from vibe_coding.utils import AIText, ai_call, get_state
+
+
+def fake_summary(prompt):
+    return AIText("Summary of " + prompt.split(".")[0], "model")
+
+
+class TestBatch(unittest.TestCase):
+    """Tests for bulk submission, results and resuming"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.patchers = [
+            patch('vibe_coding.utils.STATE_FILE', os.path.join(self.temp_dir, "agent_state.json")),
+            patch('vibe_coding.cache.CACHE_FILE', os.path.join(self.temp_dir, "agent_cache.db")),
+            patch('vibe_coding.batch.BATCH_DIR', os.path.join(self.temp_dir, "batches")),
+            patch('vibe_coding.batch.time.sleep'),
+            patch('builtins.print'),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        self.input_file = os.path.join(self.temp_dir, "jobs.jsonl")
+        self.output_file = os.path.join(self.temp_dir, "results.jsonl")
+        self.write_input([
+            {"id": 1, "tool": "summarize", "input": "First doc. More."},
+            {"id": "b", "tool": "summarize", "input": "Second doc. More."},
+            {"id": 3, "tool": "todo", "input": "Task one. Task two."},
+            {"id": 4, "tool": "missing", "input": "x"},
+        ])
+
+    def tearDown(self):
+        """Clean up after tests"""
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def write_input(self, records, extra=""):
+        with open(self.input_file, "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.write(extra)
+
+    def results(self):
+        with open(self.output_file) as f:
+            return {json.dumps(r["id"]): r for r in map(json.loads, f)}
+
+    @patch('vibe_coding.utils.ai_call', side_effect=fake_summary)
+    def test_local_backend_end_to_end(self, mock_ai):
+        """Test batched and local records all land in the output keyed by id"""
+        BatchRun(self.input_file, self.output_file, backend="local", batch_size=1).run()
+
+        results = self.results()
+        self.assertEqual(results["1"]["output"], "Summary of First doc")
+        self.assertEqual(results['"b"']["output"], "Summary of Second doc")
+        self.assertEqual(results["3"]["output"], ["- Task one", "- Task two"])
+        self.assertIn("Tool not found", results["4"]["error"])
+        # Two single-request batches, each with an input and an output file
+        self.assertEqual(len(os.listdir(os.path.join(self.temp_dir, "batches"))), 4)
+        self.assertEqual(get_state("batch_jobs"), {})
+
+    @patch('vibe_coding.utils.ai_call', side_effect=fake_summary)
+    def test_bad_lines_are_skipped(self, mock_ai):
+        """Test malformed and duplicate records do not stop the run"""
+        self.write_input([{"id": 1, "tool": "todo", "input": "A."},
+                          {"id": 1, "tool": "todo", "input": "B."}], extra="not json\n")
+        BatchRun(self.input_file, self.output_file, backend="local").run()
+
+        self.assertEqual(self.results(), {"1": {"id": 1, "output": ["- A"]}})
+
+    def test_failed_records_are_retried_on_resume(self):
+        """Test a re-run only repeats records that errored"""
+        def flaky(prompt):
+            if prompt.startswith("Second"):
+                raise RuntimeError("server error")
+            return fake_summary(prompt)
+
+        with patch('vibe_coding.utils.ai_call', side_effect=flaky):
+            BatchRun(self.input_file, self.output_file, backend="local").run()
+        self.assertEqual(self.results()['"b"']["error"], "server error")
+
+        with patch('vibe_coding.utils.ai_call', side_effect=fake_summary) as mock_ai:
+            BatchRun(self.input_file, self.output_file, backend="local").run()
+
+        mock_ai.assert_called_once_with("Second doc. More.")
+        self.assertEqual(self.results()['"b"']["output"], "Summary of Second doc")
+        self.assertEqual(self.results()["1"]["output"], "Summary of First doc")
+
+    @patch('vibe_coding.utils.ai_call', side_effect=fake_summary)
+    def test_bad_input_only_fails_its_record(self, mock_ai):
+        """Test an input the tool cannot take is an error for that record alone"""
+        self.write_input([{"id": 1, "tool": "summarize", "input": "First doc. More."},
+                          {"id": 2, "tool": "summarize", "input": 123}])
+        BatchRun(self.input_file, self.output_file, backend="local").run()
+
+        results = self.results()
+        self.assertEqual(results["1"]["output"], "Summary of First doc")
+        self.assertIn("bad input", results["2"]["error"])
+
+    def test_malformed_output_line_is_an_error(self):
+        """Test a result line without choices fails its record, not the run"""
+        backend = MagicMock()
+        backend.name = "openai"
+        backend.submit.return_value = "batch_1"
+        backend.poll.return_value = ("completed", [
+            {"custom_id": "0", "error": None, "response": {"status_code": 200, "body": {}}},
+            ["not", "an", "object"],
+        ])
+        with patch('vibe_coding.batch.get_backend', return_value=backend):
+            BatchRun(self.input_file, self.output_file).run()
+
+        results = self.results()
+        self.assertEqual(results["1"]["error"], "malformed batch result")
+        self.assertIn("without a result", results['"b"']["error"])
+
+    def test_stub_answers_are_retried(self):
+        """Test answers from the stub fallback are kept but run again next time"""
+        with patch('vibe_coding.client.get_client', return_value=None), \
+                patch('vibe_coding.cache.ENABLED', False), \
+                patch('vibe_coding.tools.summarize.LOCAL_FALLBACK', False):
+            BatchRun(self.input_file, self.output_file, backend="local").run()
+        stubbed = self.results()["1"]
+        self.assertEqual((stubbed["output"], stubbed["source"]), ("First doc.", "stub"))
+        self.assertNotIn("source", self.results()["3"])
+
+        with patch('vibe_coding.utils.ai_call', side_effect=fake_summary) as mock_ai:
+            BatchRun(self.input_file, self.output_file, backend="local").run()
+        self.assertEqual(sorted(c.args[0] for c in mock_ai.call_args_list),
+                         ["First doc. More.", "Second doc. More."])
+        self.assertEqual(self.results()["1"], {"id": 1, "output": "Summary of First doc"})
+
+    @patch('vibe_coding.utils.ai_call', side_effect=fake_summary)
+    def test_submitted_batch_is_collected_after_restart(self, mock_ai):
+        """Test an interrupted run resumes polling instead of resubmitting"""
+        local = LocalBatchBackend()
+        broken = MagicMock(name="backend")
+        broken.name = "local"
+        broken.submit.side_effect = local.submit
+        broken.poll.side_effect = OSError("network down")
+
+        with patch('vibe_coding.batch.get_backend', return_value=broken):
+            BatchRun(self.input_file, self.output_file).run()
+        jobs = get_state("batch_jobs")[os.path.abspath(self.output_file)]
+        self.assertEqual(jobs[0]["ids"], [1, "b"])
+        self.assertEqual(broken.poll.call_count, batch.MAX_POLL_ERRORS)
+
+        with patch('vibe_coding.batch.get_backend', return_value=local), \
+                patch.object(local, 'submit') as mock_submit:
+            BatchRun(self.input_file, self.output_file).run()
+
+        mock_submit.assert_not_called()
+        self.assertEqual(self.results()["1"]["output"], "Summary of First doc")
+        self.assertEqual(get_state("batch_jobs"), {})
+
+    def test_openai_backend_flow(self):
+        """Test requests are uploaded in Batch API format and outputs parsed"""
+        uploaded = []
+        client = MagicMock()
+        client.files.create.side_effect = lambda file, purpose: (
+            uploaded.append(file.read()), SimpleNamespace(id="file-in"))[1]
+        client.batches.create.return_value = SimpleNamespace(id="batch_1")
+        client.batches.retrieve.side_effect = [
+            SimpleNamespace(status="in_progress"),
+            SimpleNamespace(status="completed", output_file_id="file-out", error_file_id="file-err"),
+        ]
+        ok = {"custom_id": "0", "error": None, "response": {"status_code": 200, "body": {
+            "choices": [{"message": {"content": "Model summary."}}]}}}
+        failed = {"custom_id": "1", "error": None, "response": {"status_code": 500, "body": {
+            "error": {"message": "upstream failure"}}}}
+        client.files.content.side_effect = lambda file_id: SimpleNamespace(
+            text=json.dumps(ok if file_id == "file-out" else failed) + "\n")
+
+        with patch('vibe_coding.batch.get_backend', return_value=OpenAIBatchBackend(client)), \
+                patch('vibe_coding.utils.ai_call', side_effect=fake_summary):
+            BatchRun(self.input_file, self.output_file).run()
+
+        requests = [json.loads(line) for line in uploaded[0].decode().splitlines()]
+        self.assertEqual(requests[0]["url"], "/v1/chat/completions")
+        self.assertEqual(requests[1]["body"]["messages"][-1]["content"], "Second doc. More.")
+        client.batches.create.assert_called_once_with(
+            input_file_id="file-in", endpoint="/v1/chat/completions", completion_window="24h")
+
+        results = self.results()
+        self.assertEqual(results["1"]["output"], "Model summary.")
+        self.assertEqual(results['"b"']["error"], "upstream failure")
+
+        # The batched answer is now in the response cache for interactive runs
+        with patch('vibe_coding.client.get_client', return_value=None):
+            self.assertEqual(ai_call("First doc. More."), "Model summary.")
+
+    def test_routed_model_is_requested_and_cached(self):
+        """Test batch requests and cache entries use the model ai_call would route to"""
+        self.write_input([{"id": 1, "tool": "summarize", "input": "First doc. More."}])
+        router = Router(parse_routes([{"name": "large", "model": "big-model"},
+                                      {"name": "small", "model": "small-model",
+                                       "max_tokens": 100}]))
+        uploaded = []
+        client = MagicMock()
+        client.files.create.side_effect = lambda file, purpose: (
+            uploaded.append(file.read()), SimpleNamespace(id="file-in"))[1]
+        client.batches.create.return_value = SimpleNamespace(id="batch_1")
+        client.batches.retrieve.return_value = SimpleNamespace(
+            status="completed", output_file_id="file-out", error_file_id=None)
+        ok = {"custom_id": "0", "error": None, "response": {"status_code": 200, "body": {
+            "choices": [{"message": {"content": "Model summary."}}]}}}
+        client.files.content.return_value = SimpleNamespace(text=json.dumps(ok) + "\n")
+
+        with patch('vibe_coding.routing._router', router), \
+                patch('vibe_coding.batch.get_backend', return_value=OpenAIBatchBackend(client)):
+            BatchRun(self.input_file, self.output_file).run()
+            self.assertEqual(json.loads(uploaded[0])["body"]["model"], "small-model")
+
+            # ai_call routes the prompt to the same model and finds the answer
+            with patch('vibe_coding.client.get_client', return_value=None):
+                self.assertEqual(ai_call("First doc. More.").source, "cache")
+
+            # And a re-run answers the record from the cache without a new batch
+            os.remove(self.output_file)
+            BatchRun(self.input_file, self.output_file).run()
+        client.batches.create.assert_called_once()
+        self.assertEqual(self.results()["1"]["output"], "Model summary.")
+
+
+if __name__ == "__main__":
+    unittest.main()
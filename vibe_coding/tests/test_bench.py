@@ -0,0 +1,92 @@
+"""Tests for bench.py"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from vibe_coding import bench
+
+
+def report(*results):
+    return {"revision": "abc", "results": [
+        {"name": name, "size": size, "seconds": seconds} for name, size, seconds in results]}
+
+
+class TestCorpus(unittest.TestCase):
+    """Tests for the seeded synthetic corpora"""
+
+    def test_corpus_is_exact_size_and_seeded(self):
+        """Test corpora have the requested size and depend only on the seed"""
+        for size in (0, 1, 1000, (1 << 20) + 7):
+            self.assertEqual(len(bench.make_corpus(size)), size)
+        self.assertEqual(bench.make_corpus(5000, seed=1), bench.make_corpus(5000, seed=1))
+        self.assertNotEqual(bench.make_corpus(5000, seed=1), bench.make_corpus(5000, seed=2))
+
+    def test_parse_size(self):
+        """Test human-readable size arguments"""
+        self.assertEqual(bench.parse_size("4096"), 4096)
+        self.assertEqual(bench.parse_size("32K"), 32 << 10)
+        self.assertEqual(bench.parse_size("1gb"), 1 << 30)
+
+
+class TestCompare(unittest.TestCase):
+    """Tests for regression detection between two runs"""
+
+    def test_flags_only_slowdowns_beyond_threshold(self):
+        """Test small changes, speed-ups and new benchmarks are not regressions"""
+        old = report(("a", 1024, 0.100), ("b", 1024, 0.100), ("c", 0, 0.100))
+        new = report(("a", 1024, 0.150), ("b", 1024, 0.110), ("c", 0, 0.050), ("d", 0, 9.0))
+
+        self.assertEqual(bench.compare(old, new, threshold=0.2), [("a", 1024, 0.100, 0.150)])
+
+    def test_ignores_noise_on_tiny_timings(self):
+        """Test microsecond-level differences never count as regressions"""
+        old = report(("a", 0, 0.00001))
+        new = report(("a", 0, 0.00005))
+        self.assertEqual(bench.compare(old, new), [])
+
+
+class TestRun(unittest.TestCase):
+    """Tests for running the suite end to end at small sizes"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.output = os.path.join(self.temp_dir, "bench_output.txt")
+
+    def tearDown(self):
+        """Clean up after tests"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_run_writes_comparable_report(self):
+        """Test a run writes JSON that compares cleanly against itself"""
+        argv = ["run", "--max-size", "32K", "--repeat", "1", "--output", self.output,
+                "--only", "todo", "--only", "state", "--only", "orchestrator"]
+        with patch('builtins.print'):
+            self.assertEqual(bench.main(argv), 0)
+
+        with open(self.output) as f:
+            result = json.load(f)
+        names = {r["name"] for r in result["results"]}
+        self.assertIn("todo.generate_todos", names)
+        self.assertIn("state.load_state", names)
+        self.assertIn("orchestrator.per_run", names)
+
+        with patch('builtins.print'):
+            self.assertEqual(bench.main(["compare", self.output, self.output]), 0)
+
+    def test_compare_exit_status_on_regression(self):
+        """Test `compare` exits non-zero when something got slower"""
+        paths = []
+        for name, seconds in (("old.json", 0.1), ("new.json", 0.5)):
+            paths.append(os.path.join(self.temp_dir, name))
+            with open(paths[-1], "w") as f:
+                json.dump(report(("todo.generate_todos", 1024, seconds)), f)
+
+        with patch('builtins.print'):
+            self.assertEqual(bench.main(["compare", *paths]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
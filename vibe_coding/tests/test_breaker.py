@@ -0,0 +1,264 @@
+"""Tests for breaker.py (deadlines, hedged requests and circuit breakers)"""
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+import openai
+from vibe_coding import breaker
+from vibe_coding.breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN, get_breaker, hedged
+from vibe_coding.cli import main
+from vibe_coding.ratelimit import RateLimiter
+from vibe_coding.tests.helpers import completion
+from vibe_coding.utils import ai_call, _create_completion
+
+
+class FakeTimeoutError(openai.APITimeoutError):
+    """APITimeoutError that can be built without an HTTP request"""
+
+    def __init__(self):
+        Exception.__init__(self, "Request timed out.")
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Tests for breaker states and the hedging percentile"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.now = 1000.0
+        self.patchers = [
+            patch('vibe_coding.breaker.time.monotonic', side_effect=lambda: self.now),
+            patch('vibe_coding.breaker.BREAKER_FAILURES', 3),
+            patch('vibe_coding.breaker.BREAKER_COOLDOWN', 30.0),
+            patch('builtins.print'),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        self.breaker = CircuitBreaker()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+
+    def fail(self, times):
+        for _ in range(times):
+            self.breaker.record(False)
+
+    def test_opens_after_consecutive_failures(self):
+        """Test only failures in a row open the breaker"""
+        self.fail(2)
+        self.breaker.record(True, 1.0)
+        self.fail(2)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.fail(1)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_one_probe_after_cooldown(self):
+        """Test a single probe is let through; success closes the breaker"""
+        self.fail(3)
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record(True, 1.0)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        """Test a failed probe keeps the breaker open for another cooldown"""
+        self.fail(3)
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.fail(1)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.now += 29
+        self.assertFalse(self.breaker.allow())
+        self.now += 1
+        self.assertTrue(self.breaker.allow())
+
+    def test_lost_probe_is_replaced(self):
+        """Test a probe that never reports back does not keep the breaker shut"""
+        self.fail(3)
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+
+    def test_hedge_delay_is_a_floored_percentile(self):
+        """Test no hedging until enough samples, then the percentile (at least the floor)"""
+        for i in range(breaker.HEDGE_MIN_SAMPLES - 1):
+            self.breaker.record(True, 1.0 + i)
+        self.assertIsNone(self.breaker.hedge_delay())
+        self.breaker.record(True, 100.0)
+        with patch('vibe_coding.breaker.HEDGE_PERCENTILE', 50):
+            self.assertEqual(self.breaker.hedge_delay(), 11.0)
+        self.assertEqual(self.breaker.hedge_delay(), 100.0)
+        with patch('vibe_coding.breaker.HEDGE_PERCENTILE', 0):
+            self.assertIsNone(self.breaker.hedge_delay())
+
+        fast = CircuitBreaker()
+        for _ in range(breaker.HEDGE_MIN_SAMPLES):
+            fast.record(True, 0.001)
+        self.assertEqual(fast.hedge_delay(), breaker.HEDGE_MIN_SECONDS)
+
+    def test_hedge_delay_is_per_prompt_size(self):
+        """Test large prompts are only compared with latencies of large prompts"""
+        for _ in range(breaker.HEDGE_MIN_SAMPLES):
+            self.breaker.record(True, 1.0, tokens=100)
+        self.assertEqual(self.breaker.hedge_delay(200), 1.0)
+        self.assertIsNone(self.breaker.hedge_delay(20000))
+
+        for _ in range(breaker.HEDGE_MIN_SAMPLES):
+            self.breaker.record(True, 30.0, tokens=20000)
+        self.assertEqual(self.breaker.hedge_delay(25000), 30.0)
+        self.assertEqual(self.breaker.hedge_delay(100), 1.0)
+
+
+class TestHedging(unittest.TestCase):
+    """Tests for sending a duplicate of a slow request"""
+
+    def test_slow_request_is_duplicated(self):
+        """Test the duplicate's answer is used while the first is still stuck"""
+        release = threading.Event()
+        answers = iter(["slow", "fast"])
+        lock = threading.Lock()
+
+        def send():
+            with lock:
+                answer = next(answers)
+            if answer == "slow":
+                release.wait(5)
+            return answer
+
+        try:
+            self.assertEqual(hedged(send, 0.01), ("fast", True))
+        finally:
+            release.set()
+
+    def test_fast_request_is_not_duplicated(self):
+        """Test an answer within the hedge delay sends nothing more"""
+        send = MagicMock(return_value="answer")
+        self.assertEqual(hedged(send, 5), ("answer", False))
+        send.assert_called_once_with()
+
+    def test_failures(self):
+        """Test a quick failure is not duplicated and failed attempts give None"""
+        send = MagicMock(return_value=None)
+        self.assertEqual(hedged(send, 5), (None, False))
+        send.assert_called_once_with()
+
+        release = threading.Event()
+
+        def slow_failure():
+            release.wait(0.05)
+            raise RuntimeError("boom")
+
+        self.assertEqual(hedged(slow_failure, 0.01), (None, True))
+
+
+class TestGuardedCalls(unittest.TestCase):
+    """Tests for deadlines, hedging and the breaker in ai_call"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.patchers = [
+            patch('vibe_coding.cache.ENABLED', False),
+            patch('vibe_coding.utils.time.sleep'),
+            patch('vibe_coding.ratelimit._limiter', RateLimiter(rpm=10000, tpm=10 ** 7)),
+            patch('vibe_coding.breaker._breakers', {}),
+            patch('vibe_coding.breaker.BREAKER_FAILURES', 2),
+            patch('builtins.print'),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        self.chat = MagicMock()
+        self.client_patcher = patch('vibe_coding.client.get_client',
+                                    return_value=SimpleNamespace(chat=self.chat))
+        self.client_patcher.start()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        self.client_patcher.stop()
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+
+    def test_requests_carry_the_time_left(self):
+        """Test each attempt is sent with the remaining deadline as its timeout"""
+        self.chat.completions.create.side_effect = [FakeTimeoutError(), completion("Done.")]
+        with patch('vibe_coding.breaker.DEADLINE', 20.0):
+            self.assertEqual(ai_call("Some text."), "Done.")
+        timeouts = [c.kwargs["timeout"] for c in self.chat.completions.create.call_args_list]
+        self.assertTrue(0 < timeouts[1] <= timeouts[0] <= 20.0)
+
+    def test_no_retry_past_the_deadline(self):
+        """Test a retry whose backoff would end after the deadline is not attempted"""
+        self.chat.completions.create.side_effect = FakeTimeoutError()
+        with patch('vibe_coding.ratelimit.backoff_delay', return_value=30.0):
+            result = _create_completion(SimpleNamespace(chat=self.chat), "Some text.",
+                                        deadline=10.0)
+        self.assertIsNone(result)
+        self.assertEqual(self.chat.completions.create.call_count, 1)
+
+    def test_open_breaker_skips_the_api(self):
+        """Test repeated failures send later calls straight to the stub"""
+        self.chat.completions.create.side_effect = RuntimeError("server down")
+        ai_call("First. x")
+        ai_call("Second. x")
+        self.assertEqual(get_breaker("default").state, OPEN)
+
+        result = ai_call("Third. x")
+        self.assertEqual((result, result.source), ("Third.", "stub"))
+        self.assertEqual(self.chat.completions.create.call_count, 2)
+
+        # The probe after the cooldown succeeds and closes the breaker
+        self.chat.completions.create.side_effect = None
+        self.chat.completions.create.return_value = completion("Back.")
+        with patch('vibe_coding.breaker.BREAKER_COOLDOWN', 0):
+            self.assertEqual(ai_call("Fourth. x").source, "model")
+        self.assertEqual(get_breaker("default").state, CLOSED)
+
+    def test_slow_call_is_hedged(self):
+        """Test ai_call answers from the duplicate when the first request is slow"""
+        release = threading.Event()
+        responses = iter([None, completion("Fast.")])
+
+        def create(**kwargs):
+            response = next(responses)
+            if response is None:
+                release.wait(5)
+                return completion("Slow.")
+            return response
+
+        self.chat.completions.create.side_effect = create
+        for _ in range(breaker.HEDGE_MIN_SAMPLES):
+            get_breaker("default").record(True, 0.01)
+        try:
+            result = ai_call("Some text.")
+        finally:
+            release.set()
+        self.assertEqual(result, "Fast.")
+        self.assertEqual(self.chat.completions.create.call_count, 2)
+
+    def test_cli_deadline_flag(self):
+        """Test --deadline sets the per-call deadline and rejects non-positive values"""
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        path = os.path.join(temp_dir, "notes.txt")
+        with open(path, "w") as f:
+            f.write("Fix the build.")
+        with patch('vibe_coding.breaker.DEADLINE', 60.0), \
+                patch('vibe_coding.utils.STATE_FILE', os.path.join(temp_dir, "agent_state.json")):
+            main(["--deadline", "5", "todo", path])
+            self.assertEqual(breaker.DEADLINE, 5.0)
+
+        with patch('sys.stderr'), self.assertRaises(SystemExit):
+            main(["--deadline", "0", "todo", path])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,317 @@
+"""Tests for cache.py and its use in ai_call"""
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from vibe_coding.cache import ResponseCache, Signature, cache_key, signature
+from vibe_coding.similarity import BLOCKS, hamming
+from vibe_coding.tests.helpers import completion
+from vibe_coding.utils import ai_call, MODEL, SYSTEM_PROMPT
+
+LOG = (
+    "2024-05-01T12:00:03Z web-3.prod.example.com GET /api/orders request {id} took {ms}ms. "
+    "Connection pool exhausted on db-primary, retrying in 5s. "
+    "Worker {worker} restarted after the health check failed twice."
+)
+
+
+class TestResponseCache(unittest.TestCase):
+    """Tests for the on-disk response cache"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.temp_dir, "agent_cache.db")
+
+    def tearDown(self):
+        """Clean up after tests"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_cache_key_covers_all_parts(self):
+        """Test that model, system message and prompt all affect the key"""
+        base = cache_key("m", "s", "p")
+        self.assertEqual(base, cache_key("m", "s", "p"))
+        self.assertNotEqual(base, cache_key("m2", "s", "p"))
+        self.assertNotEqual(base, cache_key("m", "s2", "p"))
+        self.assertNotEqual(base, cache_key("m", "s", "p2"))
+        self.assertNotEqual(cache_key("ab", "c", ""), cache_key("a", "bc", ""))
+
+    def test_put_and_get(self):
+        """Test a stored response is returned and counted as a hit"""
+        store = ResponseCache(self.cache_file)
+        self.assertIsNone(store.get("k"))
+        store.put("k", "value")
+        self.assertEqual(store.get("k"), "value")
+
+        stats = store.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["entries"], 1)
+
+    def test_persists_across_instances(self):
+        """Test entries are visible to a second cache on the same file"""
+        ResponseCache(self.cache_file).put("k", "value")
+        self.assertEqual(ResponseCache(self.cache_file).get("k"), "value")
+
+    def test_ttl_expiry(self):
+        """Test entries older than the TTL are treated as misses"""
+        store = ResponseCache(self.cache_file, ttl=10)
+        with patch("vibe_coding.cache.time.time", return_value=1000.0):
+            store.put("k", "value")
+        with patch("vibe_coding.cache.time.time", return_value=1005.0):
+            self.assertEqual(store.get("k"), "value")
+        with patch("vibe_coding.cache.time.time", return_value=1011.0):
+            self.assertIsNone(store.get("k"))
+        self.assertEqual(store.stats()["entries"], 0)
+
+    def test_lru_eviction(self):
+        """Test least-recently-used entries are evicted over the size budget"""
+        store = ResponseCache(self.cache_file, max_bytes=20)
+        with patch("vibe_coding.cache.time.time", return_value=1.0):
+            store.put("a", "x" * 8)
+        with patch("vibe_coding.cache.time.time", return_value=2.0):
+            store.put("b", "x" * 8)
+        with patch("vibe_coding.cache.time.time", return_value=3.0):
+            store.get("a")
+        with patch("vibe_coding.cache.time.time", return_value=4.0):
+            store.put("c", "x" * 8)
+
+        self.assertIsNone(store.get("b"))
+        self.assertEqual(store.get("a"), "x" * 8)
+        self.assertEqual(store.get("c"), "x" * 8)
+        self.assertEqual(store.stats()["bytes"], 16)
+        self.assertEqual(store.stats()["evictions"], 1)
+
+    def test_eviction_reads_oldest_entries_in_batches(self):
+        """Test one large put evicts the oldest entries across several reads"""
+        store = ResponseCache(self.cache_file, max_bytes=100)
+        for i in range(10):
+            with patch("vibe_coding.cache.time.time", return_value=float(i)):
+                store.put(f"k{i}", "x" * 10)
+        with patch("vibe_coding.cache._EVICT_BATCH", 2), \
+                patch("vibe_coding.cache.time.time", return_value=10.0):
+            store.put("big", "y" * 45)
+
+        self.assertEqual([store.get(f"k{i}") is None for i in range(10)], [True] * 5 + [False] * 5)
+        self.assertEqual(store.stats()["bytes"], 95)
+        self.assertEqual(store.stats()["evictions"], 5)
+
+    def test_clear(self):
+        """Test clear removes entries and resets counters"""
+        store = ResponseCache(self.cache_file)
+        store.put("k", "value")
+        store.get("k")
+        store.clear()
+
+        self.assertIsNone(store.get("k"))
+        self.assertEqual(store.stats()["hits"], 0)
+
+
+class TestAiCallCache(unittest.TestCase):
+    """Tests for the cache lookup in ai_call"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.temp_dir, "agent_cache.db")
+        self.cache_file_patcher = patch("vibe_coding.cache.CACHE_FILE", self.cache_file)
+        self.cache_file_patcher.start()
+        self.env_patcher = patch.dict(os.environ, {"OPENAI_API_KEY": ""})
+        self.env_patcher.start()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        self.env_patcher.stop()
+        self.cache_file_patcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_ai_call_returns_cached_response(self):
+        """Test a cached response is returned without calling the API"""
+        key = cache_key(MODEL, SYSTEM_PROMPT, "Some prompt. More.")
+        ResponseCache(self.cache_file).put(key, "Cached summary.")
+
+        self.assertEqual(ai_call("Some prompt. More."), "Cached summary.")
+
+    def test_ai_call_stub_is_not_cached(self):
+        """Test stub fallbacks are not written to the cache"""
+        self.assertEqual(ai_call("Some prompt. More."), "Some prompt.")
+        self.assertEqual(ResponseCache(self.cache_file).stats()["entries"], 0)
+
+    def test_ai_call_bypasses_disabled_cache(self):
+        """Test ai_call ignores the cache when it is disabled"""
+        key = cache_key(MODEL, SYSTEM_PROMPT, "Some prompt. More.")
+        ResponseCache(self.cache_file).put(key, "Cached summary.")
+
+        with patch("vibe_coding.cache.ENABLED", False):
+            self.assertEqual(ai_call("Some prompt. More."), "Some prompt.")
+
+
+class TestSimilarCache(unittest.TestCase):
+    """Tests for near-duplicate prompt lookups"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.temp_dir, "agent_cache.db")
+
+    def tearDown(self):
+        """Clean up after tests"""
+        shutil.rmtree(self.temp_dir)
+
+    def log(self, request_id, ms=12, worker=7, extra=""):
+        return LOG.format(id=request_id, ms=ms, worker=worker) + extra
+
+    def store(self, store, prompt, value):
+        found = store.lookup(MODEL, SYSTEM_PROMPT, prompt)
+        store.put(found.key, value, found.sig)
+
+    def test_volatile_tokens_match_exactly(self):
+        """Test prompts differing only in ids, times and hosts share a response"""
+        store = ResponseCache(self.cache_file, similar_threshold=0.9)
+        self.store(store, self.log("3f2a9c1b-1111-2222-3333-444455556666"), "Pool exhausted.")
+
+        other = self.log("9d8e7f6a-aaaa-bbbb-cccc-ddddeeeeffff", ms=950, worker=12)
+        found = store.lookup(MODEL, SYSTEM_PROMPT, other)
+        self.assertEqual(found.value, "Pool exhausted.")
+        self.assertEqual(found.similarity, 1.0)
+
+    def test_threshold_and_length_guard(self):
+        """Test small edits hit, while different or much longer prompts miss"""
+        store = ResponseCache(self.cache_file, similar_threshold=0.85)
+        self.store(store, self.log("a"), "Pool exhausted.")
+
+        near = store.lookup(MODEL, SYSTEM_PROMPT, self.log("a", extra=" Alerts were sent."))
+        self.assertEqual(near.value, "Pool exhausted.")
+        self.assertLess(near.similarity, 1.0)
+        self.assertGreaterEqual(near.similarity, 0.85)
+
+        unrelated = "Quarterly planning notes. Hiring two engineers for the storage team."
+        self.assertIsNone(store.lookup(MODEL, SYSTEM_PROMPT, unrelated).value)
+        longer = self.log("a") + " " + " ".join(f"Line {w} of an appended report." for w in "abcdefgh")
+        self.assertIsNone(store.lookup(MODEL, SYSTEM_PROMPT, longer).value)
+
+    def test_other_model_or_system_message_misses(self):
+        """Test near duplicates are only answered for the same model and system message"""
+        store = ResponseCache(self.cache_file, similar_threshold=0.9)
+        self.store(store, self.log("a"), "Pool exhausted.")
+        self.assertEqual(store.lookup(MODEL, SYSTEM_PROMPT, self.log("b")).value,
+                         "Pool exhausted.")
+        self.assertIsNone(store.lookup("other-model", SYSTEM_PROMPT, self.log("b")).value)
+        self.assertIsNone(store.lookup(MODEL, "Answer in French.", self.log("b")).value)
+
+    def test_lookups_stay_selective_as_the_cache_grows(self):
+        """Test a near-duplicate lookup compares against few stored prompts"""
+        rng = random.Random(0)
+        store = ResponseCache(self.cache_file, similar_threshold=0.6)
+        self.assertEqual(store.max_distance, 12)  # floored at MIN_SIMILAR_THRESHOLD
+        conn = store._connect()
+        for i in range(2000):
+            sig = Signature(f"n{i}", "scope", rng.getrandbits(64), 100)
+            store._put_signature(conn, f"k{i}", sig)
+        probe = Signature("new", "scope", rng.getrandbits(64), 100)
+        with patch('vibe_coding.cache.hamming', wraps=hamming) as compare:
+            store._closest(conn, probe)
+        self.assertLess(compare.call_count, 200)
+
+    def test_banded_signatures_are_rekeyed(self):
+        """Test scoped signatures stored under bands are found again after an upgrade"""
+        store = ResponseCache(self.cache_file, similar_threshold=0.9)
+        self.store(store, self.log("a"), "Pool exhausted.")
+        conn = store._connect()
+        conn.execute("DELETE FROM signature_bands")
+        conn.execute("INSERT INTO signature_bands VALUES ('scope', 0, 0, 'stale')")
+        conn.execute("PRAGMA user_version = 1")
+
+        store = ResponseCache(self.cache_file, similar_threshold=0.9)
+        self.assertEqual(store.lookup(MODEL, SYSTEM_PROMPT, self.log("b")).value,
+                         "Pool exhausted.")
+        conn = store._connect()
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM signature_bands").fetchone()[0],
+                         BLOCKS)
+        self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], 2)
+
+    def test_unscoped_signatures_are_dropped(self):
+        """Test a cache from before scoping keeps exact entries but not old signatures"""
+        conn = sqlite3.connect(self.cache_file)
+        conn.executescript(
+            "CREATE TABLE signatures (key TEXT PRIMARY KEY, normalized TEXT NOT NULL, "
+            "fingerprint INTEGER NOT NULL, length INTEGER NOT NULL);"
+            "CREATE TABLE signature_bands (band INTEGER NOT NULL, value INTEGER NOT NULL, "
+            "key TEXT NOT NULL);"
+            "CREATE INDEX signature_bands_lookup ON signature_bands (band, value);"
+            "INSERT INTO signatures VALUES ('k', 'n', 1, 10);")
+        conn.close()
+
+        store = ResponseCache(self.cache_file, similar_threshold=0.9)
+        self.store(store, self.log("a"), "Pool exhausted.")
+        self.assertEqual(store.lookup(MODEL, SYSTEM_PROMPT, self.log("b")).value,
+                         "Pool exhausted.")
+        self.assertEqual(store._connect().execute(
+            "SELECT COUNT(*) FROM signatures").fetchone()[0], 1)
+
+    def test_disabled_by_default(self):
+        """Test a zero threshold only answers exact prompts"""
+        store = ResponseCache(self.cache_file, similar_threshold=0)
+        self.store(store, self.log("a"), "Pool exhausted.")
+        found = store.lookup(MODEL, SYSTEM_PROMPT, self.log("b"))
+        self.assertIsNone(found.value)
+        self.assertIsNone(found.sig)
+
+    def test_eviction_removes_signatures(self):
+        """Test evicted entries can no longer be found as near duplicates"""
+        store = ResponseCache(self.cache_file, max_bytes=20, similar_threshold=0.9)
+        with patch("vibe_coding.cache.time.time", return_value=1.0):
+            self.store(store, self.log("a"), "x" * 15)
+        with patch("vibe_coding.cache.time.time", return_value=2.0):
+            self.store(store, "Other prompt entirely.", "y" * 15)
+
+        self.assertIsNone(store.lookup(MODEL, SYSTEM_PROMPT, self.log("b")).value)
+        conn = store._connect()
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0], 1)
+        self.assertEqual(conn.execute(
+            "SELECT COUNT(DISTINCT key) FROM signature_bands").fetchone()[0], 1)
+
+    def test_stats_report_hit_rate_and_similarity(self):
+        """Test counters cover both tiers"""
+        store = ResponseCache(self.cache_file, similar_threshold=0.85)
+        self.store(store, self.log(1), "Pool exhausted.")       # miss, stored
+        store.lookup(MODEL, SYSTEM_PROMPT, self.log(1))         # exact hit
+        store.lookup(MODEL, SYSTEM_PROMPT, self.log(2))         # similar hit, identical
+        store.lookup(MODEL, SYSTEM_PROMPT, "Unrelated prompt.")  # miss in both tiers
+
+        stats = store.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 3))
+        self.assertEqual((stats["similar_hits"], stats["similar_misses"]), (1, 2))
+        self.assertEqual(stats["hit_rate"], 0.5)
+        self.assertEqual(stats["mean_similarity"], 1.0)
+
+    def test_ai_call_reuses_near_duplicate_responses(self):
+        """Test ai_call answers a near-duplicate prompt without the API"""
+        chat = MagicMock()
+        chat.completions.create.return_value = completion("Pool exhausted.")
+        with patch("vibe_coding.cache.CACHE_FILE", self.cache_file), \
+                patch("vibe_coding.cache.SIMILAR_THRESHOLD", 0.9), \
+                patch("vibe_coding.ratelimit._limiter", MagicMock()), \
+                patch("vibe_coding.breaker._breakers", {}), \
+                patch("vibe_coding.client.get_client", return_value=SimpleNamespace(chat=chat)):
+            first = ai_call(self.log("a"))
+            second = ai_call(self.log("b", ms=40))
+
+        self.assertEqual(first.source, "model")
+        self.assertEqual(second, "Pool exhausted.")
+        self.assertEqual(second.source, "cache")
+        self.assertEqual(chat.completions.create.call_count, 1)
+
+    def test_signature_normalizes_volatile_tokens(self):
+        """Test signatures ignore ids, addresses and numbers"""
+        a = signature(MODEL, SYSTEM_PROMPT, "Request 4f1c9e2d7a from 10.0.0.1 failed at 12:01")
+        b = signature(MODEL, SYSTEM_PROMPT, "request 0b3e8d1f99 from 10.0.7.20 failed at 03:17")
+        self.assertEqual(a, b)
+
+
+if __name__ == "__main__":
+    unittest.main()
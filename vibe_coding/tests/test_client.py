@@ -0,0 +1,75 @@
+"""Tests for client.py"""
+import os
+import unittest
+from unittest.mock import patch, MagicMock
+from vibe_coding import client
+
+
+class TestSharedClient(unittest.TestCase):
+    """Tests for the process-wide OpenAI client"""
+
+    def setUp(self):
+        """Start every test without a cached client"""
+        self.build_patcher = patch('vibe_coding.client._build_client',
+                                   side_effect=lambda api_key, base_url=None: MagicMock(
+                                       api_key=api_key, base_url=base_url))
+        self.mock_build = self.build_patcher.start()
+        self.env_patcher = patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"})
+        self.env_patcher.start()
+        client._client = None
+        client._profile_clients.clear()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        client._client = None
+        client._profile_clients.clear()
+        self.env_patcher.stop()
+        self.build_patcher.stop()
+
+    def test_client_is_created_once(self):
+        """Test repeated calls reuse one client"""
+        first = client.get_client()
+        self.assertIs(client.get_client(), first)
+        self.mock_build.assert_called_once_with("test-key")
+
+    def test_no_client_without_api_key(self):
+        """Test get_client returns None when no key is configured"""
+        with patch.dict(os.environ, {"OPENAI_API_KEY": ""}):
+            self.assertIsNone(client.get_client())
+
+    def test_configure_rebuilds_client(self):
+        """Test new settings close the old client and build a new one"""
+        first = client.get_client()
+        with patch('vibe_coding.client.BASE_URL', None):
+            client.configure_client(base_url="http://localhost:8080/v1")
+            self.assertEqual(client.BASE_URL, "http://localhost:8080/v1")
+            second = client.get_client()
+
+        first.close.assert_called_once()
+        self.assertIsNot(second, first)
+
+    def test_client_rebuilt_after_fork(self):
+        """Test a child process does not reuse the parent's connections"""
+        first = client.get_client()
+        with patch('vibe_coding.client.os.getpid', return_value=-1):
+            second = client.get_client()
+
+        self.assertIsNot(second, first)
+        first.close.assert_not_called()
+
+    def test_route_endpoints_get_their_own_clients(self):
+        """Test a base_url/api_key_env pair has one client, separate from the default"""
+        with patch.dict(os.environ, {"LARGE_API_KEY": "large-key"}):
+            routed = client.get_client("http://large.example/v1", "LARGE_API_KEY")
+            self.assertIs(client.get_client("http://large.example/v1", "LARGE_API_KEY"), routed)
+        self.assertEqual((routed.api_key, routed.base_url), ("large-key", "http://large.example/v1"))
+        self.assertIsNot(client.get_client(), routed)
+        self.assertIsNone(client.get_client(None, "MISSING_API_KEY"))
+
+        with patch('vibe_coding.client.READ_TIMEOUT', None):
+            client.configure_client(read_timeout=30.0)
+        routed.close.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
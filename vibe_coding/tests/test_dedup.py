@@ -0,0 +1,192 @@
+"""Tests for similarity.py and tools/dedup.py (`agent todo --dedup`)"""
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from collections import OrderedDict
+from unittest.mock import patch
+from vibe_coding import similarity
+from vibe_coding.cli import main
+from vibe_coding.tools.dedup import TodoIndex, dedup_todos
+from vibe_coding.utils import TOOLS, get_state
+
+
+class TestSimilarity(unittest.TestCase):
+    """Tests for SimHash fingerprints and band keys"""
+
+    def test_volatile_numbers_are_normalized(self):
+        """Test ids and counts do not change the fingerprint"""
+        self.assertEqual(similarity.simhash("- Worker 47 failed to reach db-4"),
+                         similarity.simhash("- worker 3 failed to reach DB-19"))
+
+    def test_similar_texts_are_close(self):
+        """Test a one-word edit stays well below unrelated distances"""
+        a = similarity.simhash("Investigate why the nightly build fails on the arm runners")
+        b = similarity.simhash("Investigate why the nightly build fails on the arm runner")
+        c = similarity.simhash("Update the release notes for the next version")
+        self.assertLessEqual(similarity.hamming(a, b), 7)
+        self.assertGreater(similarity.hamming(a, c), 7)
+
+    def test_numpy_and_python_fingerprints_agree(self):
+        """Test the vectorized SimHash matches the pure-Python fallback"""
+        rng = random.Random(0)
+        words = ["".join(rng.choice("abcdefgh") for _ in range(rng.randint(2, 8)))
+                 for _ in range(3000)]
+        texts = ["", "x", "Fix the flaky login test", " ".join(words)]
+        with patch('vibe_coding.similarity._cache', OrderedDict()):
+            vectorized = [similarity.simhash(text) for text in texts]
+        with patch('vibe_coding.similarity._cache', OrderedDict()), \
+                patch.dict('sys.modules', {'numpy': None}):
+            self.assertEqual([similarity.simhash(text) for text in texts], vectorized)
+
+    def test_cache_is_bounded_and_keyed_by_digest(self):
+        """Test long texts are remembered under short keys, oldest dropped first"""
+        texts = [letter * 100000 for letter in "abc"]
+        with patch('vibe_coding.similarity._cache', OrderedDict()) as cache, \
+                patch('vibe_coding.similarity.CACHE_ENTRIES', 2), \
+                patch('vibe_coding.similarity._simhash',
+                      wraps=similarity._simhash) as compute:
+            for text in texts + texts[-1:]:
+                similarity.simhash(text)
+            self.assertEqual(compute.call_count, 3)
+            self.assertEqual(len(cache), 2)
+            self.assertTrue(all(len(key) == 16 for key in cache))
+            similarity.simhash(texts[0])
+            self.assertEqual(compute.call_count, 4)
+
+    def test_probes_reach_every_fingerprint_within_distance(self):
+        """Test some probed block value equals a stored block of any close fingerprint"""
+        rng = random.Random(1)
+        for distance in (0, 3, 7, 11):
+            for _ in range(100):
+                a = rng.getrandbits(similarity.BITS)
+                b = a
+                for bit in rng.sample(range(similarity.BITS), distance):
+                    b ^= 1 << bit
+                stored = set(similarity.blocks(b))
+                self.assertTrue(any((block, value) in stored
+                                    for block, values in similarity.probes(a, distance)
+                                    for value in values))
+
+    def test_signed_round_trip(self):
+        """Test fingerprints survive SQLite's signed INTEGER range"""
+        for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+            signed = similarity.to_signed(value)
+            self.assertGreaterEqual(signed, -(1 << 63))
+            self.assertLess(signed, 1 << 63)
+            self.assertEqual(similarity.from_signed(signed), value)
+
+
+class TestDedup(unittest.TestCase):
+    """Tests for the persistent todo index and the dedup tool"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.index_file = os.path.join(self.temp_dir, "index.db")
+        self.patchers = [
+            patch('vibe_coding.tools.dedup.INDEX_FILE', self.index_file),
+            patch('vibe_coding.utils.STATE_FILE', os.path.join(self.temp_dir, "agent_state.json")),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_near_duplicates_collapse_with_counts(self):
+        """Test repeats and near-repeats become one line with a count"""
+        todos = [
+            "- Retry job 17 after the timeout",
+            "- Update the release notes for the next version",
+            "- Retry job 902 after the timeout",
+            "- Investigate why the nightly build fails on the arm runners",
+            "- Investigate why the nightly build fails on the arm runner",
+            "- Retry job 17 after the timeout",
+        ]
+        self.assertEqual(dedup_todos(todos), [
+            "- Retry job 17 after the timeout (x3)",
+            "- Update the release notes for the next version",
+            "- Investigate why the nightly build fails on the arm runners (x2)",
+        ])
+
+    def test_index_persists_across_runs(self):
+        """Test later runs match earlier todos and keep their wording"""
+        TodoIndex().add_many(["- Rotate the api keys for service 1"])
+        clusters = TodoIndex().add_many(["- rotate the API keys for service 2",
+                                         "- Write the quarterly planning document"])
+
+        self.assertEqual(clusters[0]["text"], "- Rotate the api keys for service 1")
+        self.assertTrue(clusters[0]["seen_before"])
+        self.assertEqual(clusters[0]["total"], 2)
+        self.assertFalse(clusters[1]["seen_before"])
+        self.assertEqual(TodoIndex().stats(), {"distinct": 2, "occurrences": 3})
+
+    def test_distance_zero_only_merges_exact_fingerprints(self):
+        """Test the distance threshold is respected"""
+        index = TodoIndex(max_distance=0)
+        clusters = index.add_many([
+            "- Investigate why the nightly build fails on the arm runners",
+            "- Investigate why the nightly build fails on the arm runner",
+        ])
+        self.assertEqual(len(clusters), 2)
+
+    def test_index_scales_linearly(self):
+        """Test each new todo is compared with a handful of stored ones, not n/32"""
+        rng = random.Random(2)
+        fingerprints = {}
+
+        def fake_simhash(key):
+            # Uniform fingerprints: the case where 8-bit bands matched 1/32 of the index
+            return fingerprints.setdefault(key, rng.getrandbits(similarity.BITS))
+
+        todos = [f"- Distinct todo {i:x}" for i in range(4000)]
+        with patch('vibe_coding.tools.dedup.simhash', side_effect=fake_simhash), \
+                patch('vibe_coding.tools.dedup.normalize', side_effect=lambda text: text), \
+                patch('vibe_coding.tools.dedup.hamming', wraps=similarity.hamming) as compare:
+            clusters = TodoIndex().add_many(todos)
+
+        self.assertEqual(len(clusters), len(todos))
+        # About n^2 / 1928 comparisons in all; 8-bit bands needed about n^2 / 64
+        self.assertLess(compare.call_count, 3 * len(todos))
+
+    def test_old_band_keys_are_rekeyed(self):
+        """Test an index written with 8-bit bands is converted on open"""
+        TodoIndex().add_many(["- Rotate the api keys for service 1"])
+        conn = sqlite3.connect(self.index_file)
+        conn.execute("DELETE FROM bands")
+        conn.execute("INSERT INTO bands (band, value, todo_id) VALUES (0, 7, 1)")
+        conn.execute("PRAGMA user_version = 0")
+        conn.commit()
+        conn.close()
+
+        clusters = TodoIndex().add_many(["- rotate the API keys for service 2"])
+        self.assertTrue(clusters[0]["seen_before"])
+
+    def test_tool_is_registered(self):
+        """Test dedup is available from the tool registry"""
+        self.assertEqual(TOOLS["dedup"]["inputs"], ["todos"])
+        self.assertEqual(TOOLS["dedup"]["fn"](["- A task", "- a task"]), ["- A task (x2)"])
+
+    def test_todo_command_dedup(self):
+        """Test `agent todo --dedup` reports counts and saves collapsed todos"""
+        input_file = os.path.join(self.temp_dir, "log.txt")
+        with open(input_file, "w") as f:
+            f.write("Worker 1 lost its lease. Worker 2 lost its lease. Disk is full. " * 50)
+
+        with patch('builtins.print') as mock_print:
+            main(["todo", "--dedup", input_file])
+
+        printed = [call.args[0] for call in mock_print.call_args_list if call.args]
+        self.assertIn("150 todos, 2 unique, 0 seen in earlier runs", printed)
+        self.assertEqual(get_state("last_todo"),
+                         ["- Worker 1 lost its lease (x100)", "- Disk is full (x50)"])
+
+
+if __name__ == "__main__":
+    unittest.main()
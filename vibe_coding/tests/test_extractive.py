@@ -0,0 +1,121 @@
+"""Tests for extractive.py and the local summarize backend"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from vibe_coding import extractive
+from vibe_coding.cli import main
+from vibe_coding.tools.summarize import summarize_prompt, summarize_text, summarize_text_stream
+from vibe_coding.utils import AIText, load_state
+
+REPORT = (
+    "The quarterly release slipped by two weeks because the storage migration took longer "
+    "than planned. Storage migration work blocked the release. Lunch was pizza on Friday. "
+    "The release is now planned for March after the storage migration finishes."
+)
+
+
+class TestExtractive(unittest.TestCase):
+    """Tests for TF-IDF/TextRank sentence extraction"""
+
+    def test_picks_central_sentences_in_order(self):
+        """Test the off-topic sentence is dropped and order is kept"""
+        self.assertEqual(extractive.summarize(REPORT, sentences=2),
+                         "Storage migration work blocked the release. The release is now "
+                         "planned for March after the storage migration finishes.")
+        self.assertNotIn("pizza", extractive.summarize(REPORT))
+
+    def test_short_and_empty_inputs(self):
+        """Test inputs with fewer sentences than asked, or no terms, come back whole"""
+        self.assertEqual(extractive.summarize("Some text. More text."), "Some text. More text.")
+        self.assertEqual(extractive.summarize(""), "")
+        self.assertEqual(extractive.summarize("  123 ... !!  "), "123 ... !!")
+
+    def test_repeated_lines_are_chosen_once(self):
+        """Test near-identical log lines do not fill the summary"""
+        log = "\n".join(
+            [f"worker {i} lost connection to database primary" for i in range(50)]
+            + ["disk usage on database primary reached the alert threshold",
+               "database primary failover started by the operator"])
+        lines = extractive.summarize(log, sentences=3).split(" worker ")
+        self.assertEqual(len(lines), 1)
+        self.assertIn("database primary", extractive.summarize(log))
+
+    def test_blocks_match_single_pass(self):
+        """Test splitting into blocks does not change the ranking"""
+        text = " ".join([REPORT] * 40)
+        whole = extractive.summarize(text)
+        with patch('vibe_coding.extractive.BLOCK_BYTES', 500):
+            blocked = extractive.summarize(text)
+        self.assertEqual(blocked, whole)
+
+    def test_word_hashes_ignore_case_and_position(self):
+        """Test the same word hashes equally wherever it appears"""
+        spans, rows, terms, counts = extractive._sentence_terms(b"Storage is full. STORAGE storage.")
+        self.assertEqual(len(spans), 2)
+        self.assertEqual(len(set(terms.tolist())), 2)  # "storage" and "full"
+        self.assertEqual(counts[rows == 1].tolist(), [2])
+
+
+class TestLocalBackend(unittest.TestCase):
+    """Tests for selecting the local engine and the outage fallback"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.patchers = [
+            patch('vibe_coding.utils.STATE_FILE', os.path.join(self.temp_dir, "agent_state.json")),
+            patch('vibe_coding.cache.ENABLED', False),
+            patch('vibe_coding.client.get_client', return_value=None),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    @patch('vibe_coding.utils.SUMMARIZER', "local")
+    @patch('vibe_coding.utils.ai_call')
+    def test_local_backend_skips_the_model(self, mock_ai):
+        """Test the local backend never calls ai_call and is not batched"""
+        summary = summarize_text(REPORT)
+        mock_ai.assert_not_called()
+        self.assertEqual(summary.source, "local")
+        self.assertIsNone(summarize_prompt(REPORT))
+        self.assertEqual(list(summarize_text_stream(REPORT)), [summary])
+
+    def test_stub_is_replaced_by_local_summary(self):
+        """Test an unavailable model falls back to a labelled extractive summary"""
+        summary = summarize_text(REPORT)
+        self.assertEqual(summary, extractive.summarize(REPORT))
+        self.assertEqual(summary.source, "stub")
+
+        chunks = list(summarize_text_stream(REPORT))
+        self.assertEqual(chunks, [summary])
+        self.assertEqual(chunks[0].source, "stub")
+
+    @patch('vibe_coding.utils.ai_call', return_value=AIText("Model summary.", "model"))
+    def test_model_results_are_kept(self, mock_ai):
+        """Test the fallback leaves real model output alone"""
+        self.assertEqual(summarize_text(REPORT), "Model summary.")
+
+    def test_cli_summarizer_flag(self):
+        """Test `agent --summarizer local summarize` saves a local summary"""
+        input_file = os.path.join(self.temp_dir, "report.txt")
+        with open(input_file, "w") as f:
+            f.write(REPORT)
+
+        with patch('builtins.print'), patch('vibe_coding.utils.SUMMARIZER', "model"):
+            main(["--summarizer", "local", "summarize", input_file])
+
+        state = load_state()
+        self.assertEqual(state["last_summary"], extractive.summarize(REPORT))
+        self.assertEqual(state["last_summary_source"], "local")
+
+
+if __name__ == "__main__":
+    unittest.main()
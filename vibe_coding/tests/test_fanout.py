@@ -0,0 +1,189 @@
+"""Tests for fanout.py, ai_call_async and multi-file CLI commands"""
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from vibe_coding import utils
+from vibe_coding.cli import summarize, todo
+from vibe_coding.fanout import expand_inputs, run_many, StateBatch
+from vibe_coding.orchestrator import orchestrator
+from vibe_coding.utils import ai_call_async, load_state
+
+
+class TestExpandInputs(unittest.TestCase):
+    """Tests for expand_inputs"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.temp_dir, "sub"))
+        for name in ["a.log", "b.txt", os.path.join("sub", "c.log")]:
+            with open(os.path.join(self.temp_dir, name), "w") as f:
+                f.write("Task.")
+
+    def tearDown(self):
+        """Clean up after tests"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_directory_is_walked(self):
+        """Test directories expand to every file beneath them"""
+        paths = expand_inputs([self.temp_dir])
+        self.assertEqual(len(paths), 3)
+
+    def test_glob_and_dedup(self):
+        """Test globs expand and repeated paths appear once"""
+        pattern = os.path.join(self.temp_dir, "**", "*.log")
+        paths = expand_inputs([pattern, os.path.join(self.temp_dir, "a.log")])
+        self.assertEqual(sorted(os.path.basename(p) for p in paths), ["a.log", "c.log"])
+
+    def test_missing_path_is_kept(self):
+        """Test a missing plain path is passed through for error reporting"""
+        self.assertEqual(expand_inputs("/nonexistent/file.txt"), ["/nonexistent/file.txt"])
+
+
+class TestRunMany(unittest.TestCase):
+    """Tests for concurrent fan-out"""
+
+    def tearDown(self):
+        """Restore the default concurrency limit"""
+        utils.set_concurrency(8)
+
+    def test_results_and_errors_are_reported(self):
+        """Test every path reports either a result or an error"""
+        def job(path):
+            if path == "bad":
+                raise ValueError("boom")
+            return path.upper()
+
+        results = {}
+        run_many(["a", "bad", "c"], job, lambda p, r, e: results.__setitem__(p, (r, e)))
+
+        self.assertEqual(results["a"], ("A", None))
+        self.assertEqual(results["c"], ("C", None))
+        self.assertIsInstance(results["bad"][1], ValueError)
+
+    def test_concurrency_limit_is_respected(self):
+        """Test no more than the configured number of jobs run at once"""
+        utils.set_concurrency(3)
+        lock = threading.Lock()
+        active = [0, 0]
+
+        def job(path):
+            with lock:
+                active[0] += 1
+                active[1] = max(active[1], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+
+        run_many([str(i) for i in range(9)], job, lambda *a: None)
+        self.assertEqual(active[1], 3)
+
+    def test_explicit_limit_overrides_ai_concurrency(self):
+        """Test local jobs given a limit are not capped by the AI concurrency limit"""
+        utils.set_concurrency(2)
+        lock = threading.Lock()
+        active = [0, 0]
+
+        def job(path):
+            with lock:
+                active[0] += 1
+                active[1] = max(active[1], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+
+        run_many([str(i) for i in range(12)], job, lambda *a: None, limit=6)
+        self.assertEqual(active[1], 6)
+
+    @patch('vibe_coding.utils.ai_call')
+    def test_ai_call_async(self, mock_ai):
+        """Test ai_call_async runs ai_call concurrently and returns results"""
+        mock_ai.side_effect = lambda prompt: prompt + "!"
+
+        async def main():
+            return await asyncio.gather(*(ai_call_async(str(i)) for i in range(5)))
+
+        self.assertEqual(asyncio.run(main()), ["0!", "1!", "2!", "3!", "4!"])
+
+
+class TestMultiFileCommands(unittest.TestCase):
+    """Tests for CLI commands over several inputs"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.temp_dir, "agent_state.json")
+        self.state_file_patcher = patch('vibe_coding.utils.STATE_FILE', self.state_file)
+        self.state_file_patcher.start()
+
+        self.inputs = []
+        for i in range(3):
+            path = os.path.join(self.temp_dir, f"log{i}.txt")
+            with open(path, "w") as f:
+                f.write(f"Task {i}. Other {i}.")
+            self.inputs.append(path)
+
+    def tearDown(self):
+        """Clean up after tests"""
+        self.state_file_patcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    @patch('vibe_coding.utils.ai_call')
+    def test_summarize_many(self, mock_ai):
+        """Test summarize fans out and stores one summary per file"""
+        mock_ai.side_effect = lambda text: text.split(".")[0]
+
+        with patch('builtins.print'):
+            summarize(SimpleNamespace(input=self.inputs))
+
+        summaries = load_state()["summaries"]
+        self.assertEqual(summaries[self.inputs[1]], "Task 1")
+        self.assertIn(load_state()["last_summary"], summaries.values())
+
+    def test_todo_many_with_batched_flush(self):
+        """Test todo results reach state even with a small flush size"""
+        with patch('vibe_coding.fanout.STATE_FLUSH_EVERY', 2), patch('builtins.print'):
+            todo(SimpleNamespace(input=[os.path.join(self.temp_dir, "*.txt")]))
+
+        todos = load_state()["todos"]
+        self.assertEqual(len(todos), 3)
+        self.assertEqual(todos[self.inputs[2]], ["- Task 2", "- Other 2"])
+
+    def test_todo_many_fans_out_to_worker_count(self):
+        """Test todo over many files keeps one file in flight per worker"""
+        with patch('vibe_coding.workers.WORKERS', 3), \
+                patch('vibe_coding.cli.run_many') as mock_run_many, patch('builtins.print'):
+            todo(SimpleNamespace(input=self.inputs))
+        self.assertEqual(mock_run_many.call_args.kwargs["limit"], 3)
+
+    @patch('vibe_coding.utils.ai_call')
+    def test_orchestrate_many(self, mock_ai):
+        """Test orchestrate over a directory records each file"""
+        mock_ai.return_value = "Summary. Done."
+
+        with patch('builtins.print'):
+            orchestrator(SimpleNamespace(input=[self.temp_dir]))
+
+        runs = load_state()["orchestrations"]
+        self.assertEqual(len(runs), 3)
+        self.assertEqual(runs[self.inputs[0]]["todo"], ["- Summary", "- Done"])
+
+    def test_state_batch_flushes_every_n(self):
+        """Test StateBatch writes once per flush_every results"""
+        batch = StateBatch("items", flush_every=2)
+        with patch('vibe_coding.fanout.transact_state') as mock_save:
+            for i in range(5):
+                batch.add(str(i), i)
+            self.assertEqual(mock_save.call_count, 2)
+            batch.flush()
+            self.assertEqual(mock_save.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
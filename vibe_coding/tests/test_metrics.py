@@ -0,0 +1,139 @@
+"""Tests for metrics.py and the instrumented ai_call, tools and state I/O"""
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from vibe_coding import metrics
+from vibe_coding.cli import main
+from vibe_coding.ratelimit import RateLimiter
+from vibe_coding.utils import TOOLS, ai_call, load_state, save_state
+from vibe_coding.tests.helpers import FakeRateLimitError, completion
+
+
+class TestMetrics(unittest.TestCase):
+    """Tests for spans, totals and output formats"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.patchers = [
+            patch('vibe_coding.utils.STATE_FILE', os.path.join(self.temp_dir, "agent_state.json")),
+            patch('vibe_coding.cache.ENABLED', False),
+            patch('vibe_coding.utils.time.sleep'),
+            patch('vibe_coding.ratelimit._limiter', RateLimiter(rpm=10000, tpm=10 ** 7)),
+            patch('vibe_coding.breaker._breakers', {}),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        metrics.reset()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        metrics.configure(enabled=False)
+        metrics.reset()
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_disabled_records_nothing(self):
+        """Test spans are shared no-ops while metrics are off"""
+        self.assertIs(metrics.span("tool", "todo"), metrics.NULL_SPAN)
+        TOOLS["todo"]["fn"]("First task.")
+        save_state({"key": "value"})
+        self.assertEqual(metrics.snapshot(), {})
+
+    def test_ai_call_tokens_retries_and_stubs(self):
+        """Test ai_call records usage tokens, retries and stub fallbacks"""
+        metrics.configure()
+        chat = MagicMock()
+        chat.completions.create.side_effect = [
+            FakeRateLimitError({"retry-after": "0"}),
+            completion("Summary.", 12, 3),
+        ]
+        with patch('vibe_coding.client.get_client', return_value=SimpleNamespace(chat=chat)):
+            ai_call("Some text. More.")
+        with patch('vibe_coding.client.get_client', return_value=None):
+            ai_call("Other text. More.")
+
+        totals = metrics.snapshot()[("ai_call", "gpt-3.5-turbo")]
+        self.assertEqual(totals["calls"], 2)
+        self.assertEqual(totals["prompt_tokens"], 12)
+        self.assertEqual(totals["completion_tokens"], 3)
+        self.assertEqual(totals["retries"], 1)
+        self.assertEqual(totals["stubs"], 1)
+        self.assertEqual(totals["bytes_in"], len("Some text. More.") + len("Other text. More."))
+
+    def test_tools_and_state_are_timed(self):
+        """Test @tool calls and state I/O record sizes"""
+        metrics.configure()
+        TOOLS["todo"]["fn"]("First task. Second task.")
+        save_state({"key": "value"})
+        load_state()
+
+        totals = metrics.snapshot()
+        self.assertEqual(totals[("tool", "todo")]["bytes_in"], 24)
+        self.assertEqual(totals[("tool", "todo")]["bytes_out"], len("- First task- Second task"))
+        self.assertGreater(totals[("state", "replace")]["bytes_out"], 0)
+        self.assertGreater(totals[("state", "read")]["bytes_in"], 0)
+
+    def test_streaming_todo_command_is_timed(self):
+        """Test the single-file todo command records the tool and the file read"""
+        input_file = os.path.join(self.temp_dir, "notes.txt")
+        with open(input_file, "w") as f:
+            f.write("First task. Second task.")
+        metrics.configure()
+
+        with patch('builtins.print'):
+            main(["todo", input_file])
+
+        totals = metrics.snapshot()
+        self.assertEqual(totals[("io", "read_input")]["bytes_in"], 24)
+        self.assertEqual(totals[("tool", "todo")]["bytes_in"], 24)
+        self.assertEqual(totals[("tool", "todo")]["bytes_out"], len("- First task- Second task"))
+
+    def test_instrumented_tool_pickles_by_name(self):
+        """Test wrapped tools can still be sent to worker processes"""
+        fn = TOOLS["todo"]["fn"]
+        self.assertIs(pickle.loads(pickle.dumps(fn)), fn)
+
+    def test_errors_are_counted(self):
+        """Test a span that raises is recorded with an error"""
+        metrics.configure()
+        with self.assertRaises(ValueError):
+            with metrics.span("tool", "broken"):
+                raise ValueError("boom")
+        self.assertEqual(metrics.snapshot()[("tool", "broken")]["errors"], 1)
+
+    def test_cli_profile_trace_and_prometheus(self):
+        """Test --profile, --trace and --metrics-file from the command line"""
+        input_file = os.path.join(self.temp_dir, "notes.txt")
+        trace_file = os.path.join(self.temp_dir, "trace.jsonl")
+        prom_file = os.path.join(self.temp_dir, "agent.prom")
+        with open(input_file, "w") as f:
+            f.write("First task. Second task.")
+
+        with patch('builtins.print') as mock_print, \
+                patch('vibe_coding.client.get_client', return_value=None):
+            main(["--profile", "--trace", trace_file, "--metrics-file", prom_file,
+                  "orchestrate", input_file])
+
+        printed = "\n".join(str(call.args[0]) for call in mock_print.call_args_list if call.args)
+        self.assertIn("tool:summarize", printed)
+        self.assertIn("stage:todo", printed)
+
+        with open(trace_file) as f:
+            events = [json.loads(line) for line in f]
+        self.assertIn(("command", "orchestrate"), [(e["kind"], e["name"]) for e in events])
+
+        with open(prom_file) as f:
+            prom = f.read()
+        self.assertIn("# TYPE agent_seconds_total counter", prom)
+        self.assertIn('agent_stubs_total{kind="ai_call",name="gpt-3.5-turbo"} 1', prom)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,11 +2,14 @@
 import unittest
 import json
 import os
+import shutil
 import tempfile
 from unittest.mock import patch, MagicMock
 from types import SimpleNamespace
 from vibe_coding.orchestrator import orchestrator
-from vibe_coding.utils import save_state, load_state, TOOLS
+from vibe_coding.scheduler import DEFAULT_PIPELINE
+from vibe_coding.utils import save_state, load_state, get_state, TOOLS
+from vibe_coding.workqueue import QUEUE_KEY, WorkQueue
 
 
 class TestOrchestrator(unittest.TestCase):
@@ -233,6 +236,156 @@ class TestOrchestratorStateManagement(unittest.TestCase):
         state2 = load_state()
         self.assertEqual(state2["summarize"], "Summary 2.")
 
+    @patch('vibe_coding.utils.ai_call')
+    def test_incremental_run_skips_unchanged_file(self, mock_ai):
+        """Test --incremental reuses results until the input file changes"""
+        mock_ai.return_value = "Summary 1."
+        args = SimpleNamespace(input=self.input_file, incremental=True)
+
+        with patch('builtins.print'):
+            orchestrator(args)
+            orchestrator(args)
+        self.assertEqual(mock_ai.call_count, 1)
+        self.assertEqual(load_state()["summarize"], "Summary 1.")
+
+        with open(self.input_file, "w") as f:
+            f.write("Task 3.")
+        mock_ai.return_value = "Summary 2."
+        with patch('builtins.print'):
+            orchestrator(args)
+        self.assertEqual(mock_ai.call_count, 2)
+        self.assertEqual(load_state()["summarize"], "Summary 2.")
+
+
+class TestManifestOrchestration(unittest.TestCase):
+    """Tests for resumable `orchestrate --manifest` runs"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.state_patcher = patch('vibe_coding.utils.STATE_FILE',
+                                   os.path.join(self.temp_dir, "agent_state.json"))
+        self.state_patcher.start()
+        self.paths = []
+        for name in ("a", "b", "c"):
+            path = os.path.join(self.temp_dir, f"{name}.txt")
+            with open(path, "w") as f:
+                f.write(f"Task {name}. Other {name}.")
+            self.paths.append(path)
+        self.manifest = os.path.join(self.temp_dir, "inputs.txt")
+        with open(self.manifest, "w") as f:
+            f.write("# nightly inputs\na.txt\n\nb.txt\nc.txt\n")
+        self.args = SimpleNamespace(input=[], manifest=self.manifest)
+
+    def tearDown(self):
+        """Clean up after tests"""
+        self.state_patcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def queue_keys(self):
+        return [key for key in load_state() if key.startswith(QUEUE_KEY)]
+
+    @patch('vibe_coding.utils.ai_call', side_effect=lambda prompt: prompt.split(".")[0] + "!")
+    def test_runs_every_input_and_reports_progress(self, mock_ai):
+        """Test a finished run saves results, prints progress and clears its queue"""
+        with patch('builtins.print') as mock_print:
+            orchestrator(self.args)
+
+        results = get_state("orchestrations")
+        self.assertEqual(sorted(results), self.paths)
+        self.assertEqual(results[self.paths[1]]["todo"], ["- Task b!"])
+        lines = [call.args[0] for call in mock_print.call_args_list if call.args]
+        self.assertTrue(any(line.startswith("[3/3] ") and "ETA 0:00" in line for line in lines))
+        self.assertEqual(self.queue_keys(), [])
+
+    @patch('vibe_coding.utils.ai_call', side_effect=lambda prompt: prompt.split(".")[0] + "!")
+    def test_failed_item_resumes_from_checkpoint(self, mock_ai):
+        """Test a rerun retries only the failed file, from its last finished stage"""
+        todo = TOOLS["todo"]["fn"]
+
+        def flaky_todo(text):
+            if "b" in text:
+                raise RuntimeError("disk full")
+            return todo(text)
+
+        with patch.dict(TOOLS["todo"], {"fn": flaky_todo}), patch('builtins.print'):
+            orchestrator(self.args)
+        self.assertEqual(mock_ai.call_count, 3)
+        self.assertNotEqual(self.queue_keys(), [])
+
+        with patch('builtins.print') as mock_print:
+            orchestrator(self.args)
+        # b's summary was checkpointed, so only its todo stage ran again
+        self.assertEqual(mock_ai.call_count, 3)
+        mock_print.assert_any_call("Resuming: 2 done, 1 to go")
+        self.assertEqual(get_state("orchestrations")[self.paths[1]]["todo"], ["- Task b!"])
+        self.assertEqual(self.queue_keys(), [])
+
+    @patch('vibe_coding.utils.ai_call', side_effect=lambda prompt: prompt.split(".")[0] + "!")
+    def test_crashed_run_restarts_running_items(self, mock_ai):
+        """Test items left running by a crash restart from their checkpoint"""
+        queue = WorkQueue(self.manifest, DEFAULT_PIPELINE)
+        queue.open(self.paths)
+        queue.start(self.paths[0])
+        queue.checkpoint(self.paths[0], "summarize", "Saved summary.")
+
+        with patch('builtins.print') as mock_print:
+            orchestrator(self.args)
+        mock_print.assert_any_call(
+            "Resuming: 0 done, 3 to go (1 restart from their last checkpoint)")
+        self.assertEqual(mock_ai.call_count, 2)
+        self.assertEqual(get_state("orchestrations")[self.paths[0]]["todo"], ["- Saved summary"])
+
+    def test_queue_writes_do_not_read_state(self):
+        """Test status changes and checkpoints are appends that never load the log"""
+        queue = WorkQueue(self.manifest, DEFAULT_PIPELINE)
+        queue.open(self.paths)
+        big = "x" * 10000  # stored as a blob
+        with patch('vibe_coding.state.StateLog._read_raw') as read_raw, \
+                patch('vibe_coding.state.BlobStore.get') as get:
+            queue.start(self.paths[0])
+            queue.checkpoint(self.paths[0], "summarize", big)
+            queue.checkpoint(self.paths[0], "todo", ["- Task"])
+            queue.fail(self.paths[0], "boom")
+        read_raw.assert_not_called()
+        get.assert_not_called()
+
+        # A resumed item is written back without loading its checkpointed blobs
+        again = WorkQueue(self.manifest, DEFAULT_PIPELINE)
+        again.open(self.paths)
+        with patch('vibe_coding.state.BlobStore.get') as get:
+            again.start(self.paths[0])
+        get.assert_not_called()
+
+        reloaded = WorkQueue(self.manifest, DEFAULT_PIPELINE)
+        reloaded.open(self.paths)
+        self.assertEqual(reloaded.checkpoints(self.paths[0]),
+                         {"summarize": big, "todo": ["- Task"]})
+        self.assertEqual(reloaded.items[self.paths[0]]["status"], "running")
+
+    @patch('vibe_coding.utils.ai_call', return_value="Summary.")
+    def test_restart_and_interrupt(self, mock_ai):
+        """Test Ctrl-C keeps progress for the next run and --restart discards it"""
+        with patch('vibe_coding.orchestrator.run_many', side_effect=KeyboardInterrupt), \
+                patch('builtins.print') as mock_print:
+            orchestrator(self.args)
+        mock_print.assert_any_call("\nInterrupted with 0 of 3 files done; "
+                                   "run the same command again to resume.")
+        self.assertNotEqual(self.queue_keys(), [])
+
+        queue = WorkQueue(self.manifest, DEFAULT_PIPELINE)
+        queue.open(self.paths)
+        queue.finish(self.paths[0], 1.0)
+        again = WorkQueue(self.manifest, DEFAULT_PIPELINE)
+        self.assertTrue(again.open(self.paths))
+        self.assertEqual(again.remaining(), self.paths[1:])
+
+        fresh = WorkQueue(self.manifest, DEFAULT_PIPELINE)
+        self.assertFalse(fresh.open(self.paths, restart=True))
+        self.assertEqual(fresh.remaining(), self.paths)
+        changed = WorkQueue(self.manifest, [{"tool": "todo"}])
+        self.assertFalse(changed.open(self.paths))
+
 
 if __name__ == "__main__":
     unittest.main()
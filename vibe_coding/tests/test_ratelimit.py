@@ -0,0 +1,112 @@
+"""Tests for ratelimit.py and retries in ai_call"""
+import pickle
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from vibe_coding import ratelimit
+from vibe_coding.ratelimit import TokenBucket, RateLimiter, backoff_delay, retry_after_seconds
+from vibe_coding.tests.helpers import FakeRateLimitError, completion
+from vibe_coding.utils import ai_call, AIText
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Tests for TokenBucket and RateLimiter"""
+
+    @patch('vibe_coding.ratelimit.time.monotonic', return_value=100.0)
+    def test_bucket_waits_when_empty(self, mock_time):
+        """Test reservations beyond capacity return the refill wait"""
+        bucket = TokenBucket(60)  # one token per second
+        self.assertEqual(bucket.reserve(60), 0.0)
+        self.assertAlmostEqual(bucket.reserve(1), 1.0)
+        self.assertAlmostEqual(bucket.reserve(1), 2.0)
+
+    def test_bucket_refills_over_time(self):
+        """Test tokens come back at the configured rate"""
+        with patch('vibe_coding.ratelimit.time.monotonic', return_value=100.0):
+            bucket = TokenBucket(60)
+            bucket.reserve(60)
+        with patch('vibe_coding.ratelimit.time.monotonic', return_value=110.0):
+            self.assertEqual(bucket.reserve(10), 0.0)
+
+    @patch('vibe_coding.ratelimit.time.monotonic', return_value=100.0)
+    def test_limiter_uses_slowest_limit_and_pause(self, mock_time):
+        """Test the limiter waits for whichever limit is tighter"""
+        limiter = RateLimiter(rpm=600, tpm=60)
+        self.assertEqual(limiter.reserve(60), 0.0)
+        self.assertAlmostEqual(limiter.reserve(30), 30.0)
+
+        limiter.pause(100)
+        self.assertGreaterEqual(limiter.reserve(0), 100.0)
+
+
+class TestBackoff(unittest.TestCase):
+    """Tests for backoff and Retry-After parsing"""
+
+    def test_retry_after_headers(self):
+        """Test Retry-After in seconds and milliseconds"""
+        self.assertEqual(retry_after_seconds(FakeRateLimitError({"retry-after": "3"})), 3.0)
+        self.assertEqual(retry_after_seconds(FakeRateLimitError({"retry-after-ms": "250"})), 0.25)
+        self.assertIsNone(retry_after_seconds(FakeRateLimitError()))
+
+    def test_backoff_honors_retry_after(self):
+        """Test backoff never undercuts the server's requested delay"""
+        for attempt in range(5):
+            self.assertGreaterEqual(backoff_delay(attempt, retry_after=2.0), 2.0)
+            self.assertLessEqual(backoff_delay(attempt), ratelimit.BACKOFF_BASE * 2 ** attempt)
+
+
+class TestAiCallRetries(unittest.TestCase):
+    """Tests for retries and result labels in ai_call"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.patchers = [
+            patch('vibe_coding.cache.ENABLED', False),
+            patch('vibe_coding.utils.time.sleep'),
+            patch('vibe_coding.ratelimit._limiter', RateLimiter(rpm=10000, tpm=10 ** 7)),
+            patch('vibe_coding.breaker._breakers', {}),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+
+    def test_retries_rate_limit_then_succeeds(self):
+        """Test a 429 is retried and the model result is labelled"""
+        chat = MagicMock()
+        chat.completions.create.side_effect = [
+            FakeRateLimitError({"retry-after": "0"}),
+            completion("Model summary."),
+        ]
+        with patch('vibe_coding.client.get_client', return_value=SimpleNamespace(chat=chat)):
+            result = ai_call("Some text. More.")
+
+        self.assertEqual(result, "Model summary.")
+        self.assertEqual(result.source, "model")
+        self.assertEqual(chat.completions.create.call_count, 2)
+
+    def test_gives_up_after_max_retries(self):
+        """Test persistent rate limiting ends in a labelled stub"""
+        chat = MagicMock()
+        chat.completions.create.side_effect = FakeRateLimitError()
+        with patch('vibe_coding.client.get_client', return_value=SimpleNamespace(chat=chat)), \
+                patch('builtins.print'), \
+                patch('vibe_coding.ratelimit.MAX_RETRIES', 2):
+            result = ai_call("Some text. More.")
+
+        self.assertEqual(result, "Some text.")
+        self.assertEqual(result.source, "stub")
+        self.assertEqual(chat.completions.create.call_count, 3)
+
+    def test_label_survives_pickling(self):
+        """Test AIText keeps its label across process boundaries"""
+        text = pickle.loads(pickle.dumps(AIText("Summary.", "stub")))
+        self.assertEqual(text, "Summary.")
+        self.assertEqual(text.source, "stub")
+
+
+if __name__ == "__main__":
+    unittest.main()
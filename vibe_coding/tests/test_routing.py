@@ -0,0 +1,175 @@
+"""Tests for routing.py (`--routes FILE`)"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from vibe_coding import routing, utils
+from vibe_coding.cli import main
+from vibe_coding.ratelimit import RateLimiter
+from vibe_coding.routing import Route, Router, parse_routes
+from vibe_coding.tests.helpers import completion
+from vibe_coding.tools.summarize import _too_big, summarize_prompt
+
+ROUTES = [
+    {"name": "large", "model": "big-model", "max_tokens": 1000,
+     "base_url": "http://large.example/v1", "api_key_env": "LARGE_API_KEY"},
+    {"name": "small", "model": "small-model", "max_tokens": 100},
+]
+
+
+class TestRouter(unittest.TestCase):
+    """Tests for choosing routes by prompt size and latency"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.router = Router(parse_routes(ROUTES))
+
+    def test_parse_routes_rejects_bad_files(self):
+        """Test empty lists, routes without a model, bad limits and repeated names are errors"""
+        self.assertEqual([route.name for route in parse_routes({"routes": ROUTES})],
+                         ["large", "small"])
+        for spec in ([], {"routes": None}, [{"name": "x"}], [{"model": "m", "max_tokens": 0}],
+                     [{"model": "m", "max_tokens": "big"}],
+                     [{"name": "a", "model": "m1"}, {"name": "a", "model": "m2"}],
+                     [{"model": "m"}, {"model": "m", "max_tokens": 10}]):
+            with self.assertRaises(ValueError):
+                parse_routes(spec)
+
+    def test_smallest_fitting_route_is_chosen(self):
+        """Test short prompts go to the small route and long ones to the large"""
+        self.assertEqual(self.router.choose("x" * 40).name, "small")
+        self.assertEqual(self.router.choose("x" * 2000).name, "large")
+        # Nothing fits: the largest route is still the best try
+        self.assertEqual(self.router.choose("x" * 40000).name, "large")
+        self.assertEqual(self.router.largest_context(), 1000)
+
+    def test_default_route_uses_model(self):
+        """Test without routes there is one unlimited route for utils.MODEL"""
+        router = Router()
+        route = router.choose("x" * 10 ** 6)
+        self.assertEqual((route.model, route.base_url, route.api_key_env),
+                         (utils.MODEL, None, None))
+        self.assertIsNone(router.largest_context())
+        self.assertIsNone(router.settings())
+
+    def test_slow_route_is_avoided_and_probed(self):
+        """Test a slow small route loses traffic but is retried every PROBE_EVERY calls"""
+        small, large = self.router.get_routes()[1], self.router.get_routes()[0]
+        self.router.observe(small, 5.0)
+        self.router.observe(large, 1.0)
+
+        chosen = [self.router.choose("short").name for _ in range(routing.PROBE_EVERY)]
+        self.assertEqual(chosen.count("small"), 1)
+        self.assertEqual(chosen[-1], "small")
+
+        # Once it recovers it gets all the traffic back
+        for _ in range(30):
+            self.router.observe(small, 0.5)
+        self.assertEqual(self.router.choose("short").name, "small")
+
+    def test_failure_counts_as_timeout(self):
+        """Test a failed call is recorded as at least the read timeout"""
+        small = self.router.get_routes()[1]
+        with patch('vibe_coding.client.READ_TIMEOUT', 60.0):
+            self.router.observe(small, 0.1, failed=True)
+        self.assertEqual(self.router.latency["small"], 60.0)
+
+    def test_equal_limits_keep_file_order(self):
+        """Test routes with the same max_tokens are tried in file order"""
+        router = Router([Route("a", "m1", None, None, None), Route("b", "m2", None, None, None)])
+        self.assertEqual([route.name for route in router.candidates(10)], ["a", "b"])
+
+
+class TestRoutedCalls(unittest.TestCase):
+    """Tests for ai_call, summarize and the CLI with routes configured"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.routes_file = os.path.join(self.temp_dir, "routes.json")
+        with open(self.routes_file, "w") as f:
+            json.dump(ROUTES, f)
+        self.patchers = [
+            patch('vibe_coding.cache.ENABLED', False),
+            patch('vibe_coding.utils.time.sleep'),
+            patch('vibe_coding.ratelimit._limiter', RateLimiter(rpm=10000, tpm=10 ** 7)),
+            patch('vibe_coding.routing._router', Router(parse_routes(ROUTES))),
+            patch('vibe_coding.breaker._breakers', {}),
+            patch('vibe_coding.routing.ROUTES_FILE', None),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_ai_call_uses_route_model_and_endpoint(self):
+        """Test the chosen route's model, base_url and key reach the API call"""
+        chat = MagicMock()
+        chat.completions.create.return_value = completion("Done.")
+        with patch('vibe_coding.client.get_client',
+                   return_value=SimpleNamespace(chat=chat)) as get_client:
+            utils.ai_call("Short prompt.")
+            utils.ai_call("x" * 2000)
+
+        self.assertEqual([c.kwargs["model"] for c in chat.completions.create.call_args_list],
+                         ["small-model", "big-model"])
+        self.assertEqual([c.args for c in get_client.call_args_list],
+                         [(None, None), ("http://large.example/v1", "LARGE_API_KEY")])
+        self.assertEqual(set(routing.get_router().latency), {"small", "large"})
+
+    def test_summarize_sends_whole_input_to_a_large_route(self):
+        """Test inputs within the largest route's context skip chunking"""
+        with patch('vibe_coding.tools.summarize.CHUNK_TOKENS', 100):
+            self.assertFalse(_too_big("x" * 2000))
+            self.assertTrue(_too_big("x" * 8000))
+            # Batch jobs send the same inputs as one prompt
+            self.assertEqual(summarize_prompt("x" * 2000), "x" * 2000)
+            self.assertIsNone(summarize_prompt("x" * 8000))
+
+    def test_model_settings_include_routes(self):
+        """Test configured routes change incremental-run fingerprints"""
+        self.assertEqual(utils.model_settings()["routes"],
+                         [["large", "big-model", 1000], ["small", "small-model", 100]])
+
+    def test_cli_routes_flag(self):
+        """Test --routes loads a valid file and rejects a bad one"""
+        with patch('vibe_coding.routing.configure') as configure, \
+                patch('vibe_coding.utils.STATE_FILE', os.path.join(self.temp_dir, "agent_state.json")), \
+                patch('builtins.print'):
+            main(["--routes", self.routes_file, "--no-daemon", "todo", self.routes_file])
+        configure.assert_called_once_with(self.routes_file)
+
+        with open(self.routes_file, "w") as f:
+            f.write("[]")
+        with patch('sys.stderr'), self.assertRaises(SystemExit):
+            main(["--routes", self.routes_file, "todo", self.routes_file])
+
+    def test_bad_routes_variable_fails_at_startup(self):
+        """Test a bad AGENT_ROUTES file stops the command before any model call"""
+        with open(self.routes_file, "w") as f:
+            json.dump(ROUTES + ROUTES[:1], f)
+        with patch('vibe_coding.routing.ROUTES_FILE', self.routes_file), \
+                patch('vibe_coding.routing._router', None), \
+                patch('vibe_coding.utils.ai_call') as ai_call, \
+                self.assertRaises(SystemExit) as raised:
+            main(["--no-daemon", "summarize", self.routes_file])
+        self.assertIn("duplicate route name: 'large'", str(raised.exception.code))
+        ai_call.assert_not_called()
+
+        missing = os.path.join(self.temp_dir, "missing.json")
+        with patch('vibe_coding.routing.ROUTES_FILE', missing), \
+                patch('vibe_coding.routing._router', None), \
+                self.assertRaises(SystemExit) as raised:
+            main(["--no-daemon", "summarize", self.routes_file])
+        self.assertIn("AGENT_ROUTES", str(raised.exception.code))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,262 @@
+"""Tests for scheduler.py"""
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+from vibe_coding import workers
+from vibe_coding.scheduler import (DEFAULT_PIPELINE, build_graph, find_pipes, load_pipeline,
+                                   run_pipe, run_pipeline)
+from vibe_coding.tools.todo import generate_todos
+from vibe_coding.utils import TOOLS, AIText
+
+
+def slow_upper(text):
+    time.sleep(0.2)
+    return text.upper()
+
+
+def slow_length(text):
+    time.sleep(0.2)
+    return len(text)
+
+
+def join_parts(upper, length):
+    return f"{upper}:{length}"
+
+
+class TestScheduler(unittest.TestCase):
+    """Tests for building and running tool graphs"""
+
+    def setUp(self):
+        """Register temporary tools"""
+        self.extra_tools = {
+            "upper": {"fn": slow_upper, "inputs": ["text"], "outputs": ["upper"]},
+            "length": {"fn": slow_length, "inputs": ["text"], "outputs": ["length"]},
+            "join": {"fn": join_parts, "inputs": ["upper", "length"], "outputs": ["joined"]},
+        }
+        TOOLS.update(self.extra_tools)
+
+    def tearDown(self):
+        """Remove temporary tools"""
+        for name in self.extra_tools:
+            TOOLS.pop(name, None)
+
+    def test_default_pipeline_chains_summary_into_todo(self):
+        """Test the default graph feeds the summary into todo"""
+        stages = {stage["name"]: stage for stage in build_graph(DEFAULT_PIPELINE)}
+
+        self.assertEqual(stages["summarize"]["deps"], set())
+        self.assertEqual(stages["todo"]["deps"], {"summarize"})
+        self.assertEqual(stages["todo"]["inputs"], ["summary"])
+
+    def test_independent_stages_run_concurrently(self):
+        """Test wall time follows the critical path, not the sum of stages"""
+        pipeline = [{"tool": "upper"}, {"tool": "length"}, {"tool": "join"}]
+
+        start = time.monotonic()
+        results = run_pipeline(pipeline, {"text": "abc"})
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(results["join"], "ABC:3")
+        self.assertLess(elapsed, 0.35)
+
+    def test_cycle_is_rejected(self):
+        """Test a dependency cycle raises ValueError"""
+        pipeline = [
+            {"tool": "upper", "inputs": {"text": "length"}},
+            {"tool": "length", "inputs": {"text": "upper"}},
+        ]
+        with self.assertRaises(ValueError):
+            build_graph(pipeline)
+
+    def test_unknown_input_is_rejected(self):
+        """Test binding to data nothing produces raises ValueError"""
+        with self.assertRaises(ValueError):
+            build_graph([{"tool": "upper", "inputs": {"text": "missing"}}])
+
+    def test_cpu_bound_stage_runs_in_process(self):
+        """Test cpu_bound tools give the same result in a worker process"""
+        with patch('vibe_coding.scheduler.PROCESS_MIN_BYTES', 0), \
+                patch('vibe_coding.workers.WORKERS', 2), \
+                patch('vibe_coding.workers.get_pool', wraps=workers.get_pool) as get_pool:
+            results = run_pipeline([{"tool": "todo"}], {"text": "One. Two."})
+
+        get_pool.assert_called_once_with()
+        self.assertEqual(results["todo"], generate_todos("One. Two."))
+
+    def test_one_worker_keeps_stages_in_process(self):
+        """Test with --workers 1 cpu_bound stages never start a worker process"""
+        with patch('vibe_coding.scheduler.PROCESS_MIN_BYTES', 0), \
+                patch('vibe_coding.workers.WORKERS', 1), \
+                patch('vibe_coding.workers.get_pool') as get_pool:
+            results = run_pipeline([{"tool": "todo"}], {"text": "One. Two."})
+
+        get_pool.assert_not_called()
+        self.assertEqual(results["todo"], generate_todos("One. Two."))
+
+    def test_load_pipeline_from_file(self):
+        """Test pipeline specs load from JSON files"""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, "pipeline.json")
+            with open(path, "w") as f:
+                json.dump({"stages": [{"tool": "upper"}]}, f)
+            self.assertEqual(load_pipeline(path), [{"tool": "upper"}])
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+def slow_words(text):
+    """Producer: yield a word every 0.05s"""
+    for word in text.split():
+        time.sleep(0.05)
+        yield word + " "
+
+
+def slow_shout(chunks):
+    """Consumer: take 0.05s per chunk"""
+    for chunk in chunks:
+        time.sleep(0.05)
+        yield chunk.strip().upper()
+
+
+async def async_words(text):
+    for word in text.split():
+        yield word + " "
+
+
+async def async_lengths(chunks):
+    async for chunk in chunks:
+        yield len(chunk.strip())
+
+
+def failing_consumer(chunks):
+    next(iter(chunks))
+    raise RuntimeError("consumer failed")
+    yield
+
+
+class TestPipelining(unittest.TestCase):
+    """Tests for overlapping streaming stages with their consumers"""
+
+    def setUp(self):
+        """Register temporary streaming tools"""
+        self.extra_tools = {
+            "words": {"fn": lambda text: "".join(slow_words(text)), "stream": slow_words,
+                      "inputs": ["text"], "outputs": ["words"]},
+            "shout": {"fn": lambda words: list(slow_shout([words])), "consume": slow_shout,
+                      "inputs": ["words"], "outputs": ["shouts"]},
+        }
+        TOOLS.update(self.extra_tools)
+
+    def tearDown(self):
+        """Remove temporary tools"""
+        for name in self.extra_tools:
+            TOOLS.pop(name, None)
+
+    def pipe(self, pipeline, text="a b c d e f", **kwargs):
+        producer, consumers = find_pipes(build_graph(pipeline))[0]
+        return run_pipe(producer, consumers, [text], **kwargs)
+
+    def test_default_pipeline_pipes_summary_into_todo(self):
+        """Test summarize streams into todo's consume variant"""
+        (producer, consumers), = find_pipes(build_graph(DEFAULT_PIPELINE))
+        self.assertEqual(producer["name"], "summarize")
+        self.assertEqual([stage["name"] for stage in consumers], ["todo"])
+
+    def test_stages_overlap(self):
+        """Test a two-stage pipe takes about as long as one stage, not both"""
+        start = time.monotonic()
+        results = self.pipe([{"tool": "words"}, {"tool": "shout"}])
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(results["words"], "a b c d e f ")
+        self.assertEqual(results["shout"], ["A", "B", "C", "D", "E", "F"])
+        self.assertLess(elapsed, 0.55)  # each stage alone takes 0.3s
+
+    def test_bounded_queue_and_on_chunk(self):
+        """Test a one-chunk queue still delivers everything, in order"""
+        seen = []
+        with patch('vibe_coding.scheduler.PIPE_QUEUE_CHUNKS', 1):
+            results = self.pipe([{"tool": "words"}, {"tool": "shout"}], on_chunk=seen.append)
+        self.assertEqual(seen, ["a ", "b ", "c ", "d ", "e ", "f "])
+        self.assertEqual(results["shout"], ["A", "B", "C", "D", "E", "F"])
+
+    def test_async_producer_and_consumer(self):
+        """Test async iterators work on both ends of a pipe"""
+        TOOLS["words"]["stream"] = async_words
+        TOOLS["shout"]["consume"] = async_lengths
+        results = self.pipe([{"tool": "words"}, {"tool": "shout"}], text="one three five")
+        self.assertEqual(results["words"], "one three five ")
+        self.assertEqual(results["shout"], [3, 5, 4])
+
+    def test_consumer_error_does_not_block_producer(self):
+        """Test a failing consumer is reported after the producer finishes"""
+        TOOLS["shout"]["consume"] = failing_consumer
+        with patch('vibe_coding.scheduler.PIPE_QUEUE_CHUNKS', 1):
+            with self.assertRaises(RuntimeError):
+                self.pipe([{"tool": "words"}, {"tool": "shout"}])
+
+
+class TestIncremental(unittest.TestCase):
+    """Tests for skipping unchanged stages with a memo"""
+
+    def setUp(self):
+        """Register a two-stage pipeline of mock tools"""
+        self.first = MagicMock(side_effect=lambda text: text.split(".")[0])
+        self.second = MagicMock(side_effect=lambda head: head.upper())
+        TOOLS["first"] = {"fn": self.first, "inputs": ["text"], "outputs": ["head"]}
+        TOOLS["second"] = {"fn": self.second, "inputs": ["head"], "outputs": ["shout"]}
+        self.pipeline = [{"tool": "first"}, {"tool": "second"}]
+
+    def tearDown(self):
+        """Remove temporary tools"""
+        TOOLS.pop("first", None)
+        TOOLS.pop("second", None)
+
+    def test_unchanged_input_skips_every_stage(self):
+        """Test a repeat run reuses remembered results without calling tools"""
+        memo = {}
+        first = run_pipeline(self.pipeline, {"text": "Head. Tail."}, memo=memo)
+        again = run_pipeline(self.pipeline, {"text": "Head. Tail."}, memo=memo)
+
+        self.assertEqual(again, first)
+        self.assertEqual(self.first.call_count, 1)
+        self.assertEqual(self.second.call_count, 1)
+
+    def test_downstream_reruns_only_when_upstream_output_changes(self):
+        """Test a changed input re-runs a stage, but not its unaffected consumer"""
+        memo = {}
+        run_pipeline(self.pipeline, {"text": "Head. Tail."}, memo=memo)
+        run_pipeline(self.pipeline, {"text": "Head. New tail."}, memo=memo)
+        self.assertEqual((self.first.call_count, self.second.call_count), (2, 1))
+
+        results = run_pipeline(self.pipeline, {"text": "New head. Tail."}, memo=memo)
+        self.assertEqual((self.first.call_count, self.second.call_count), (3, 2))
+        self.assertEqual(results["second"], "NEW HEAD")
+
+    def test_tool_version_invalidates(self):
+        """Test bumping a tool's version re-runs it"""
+        memo = {}
+        run_pipeline(self.pipeline, {"text": "Head."}, memo=memo)
+        TOOLS["second"]["version"] = 2
+        run_pipeline(self.pipeline, {"text": "Head."}, memo=memo)
+
+        self.assertEqual((self.first.call_count, self.second.call_count), (1, 2))
+
+    def test_stub_results_are_not_remembered(self):
+        """Test stub fallbacks are retried on the next run"""
+        self.first.side_effect = lambda text: AIText("Head", "stub")
+        memo = {}
+        run_pipeline(self.pipeline, {"text": "Head."}, memo=memo)
+        run_pipeline(self.pipeline, {"text": "Head."}, memo=memo)
+
+        self.assertNotIn("first", memo)
+        self.assertEqual((self.first.call_count, self.second.call_count), (2, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
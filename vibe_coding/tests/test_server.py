@@ -0,0 +1,105 @@
+"""Tests for server.py (the `agent serve` daemon)"""
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from vibe_coding import server
+from vibe_coding.ratelimit import RateLimiter
+from vibe_coding.cli import build_parser, run_command
+from vibe_coding.utils import load_state
+
+
+class TestServer(unittest.TestCase):
+    """Tests for forwarding jobs to a running daemon"""
+
+    def setUp(self):
+        """Start a daemon on a temporary socket"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.patchers = [
+            patch('vibe_coding.server.SOCKET_FILE', os.path.join(self.temp_dir, "agent.sock")),
+            patch('vibe_coding.utils.STATE_FILE', os.path.join(self.temp_dir, "agent_state.json")),
+            patch('vibe_coding.server.warm_up'),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+        self.input_file = os.path.join(self.temp_dir, "notes.txt")
+        with open(self.input_file, "w") as f:
+            f.write("First task. Second task.")
+
+        self.ready = threading.Event()
+        self.stop = threading.Event()
+        self.thread = threading.Thread(
+            target=server.serve, args=(build_parser(), run_command, self.ready, self.stop))
+        with patch('builtins.print'):
+            self.thread.start()
+            self.ready.wait(5)
+
+    def tearDown(self):
+        """Stop the daemon and clean up"""
+        self.stop.set()
+        self.thread.join(5)
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_forward_streams_output_and_updates_state(self):
+        """Test a forwarded todo job prints its output and saves state"""
+        out = io.StringIO()
+        self.assertTrue(server.forward(["todo", self.input_file], out))
+
+        self.assertIn("- First task\n- Second task", out.getvalue())
+        self.assertEqual(load_state()["last_todo"], ["- First task", "- Second task"])
+
+    def test_worker_thread_prints_reach_the_client(self):
+        """Test notices printed by a job's AI worker threads go to its client"""
+        other_file = os.path.join(self.temp_dir, "other.txt")
+        with open(other_file, "w") as f:
+            f.write("Third task. Fourth task.")
+        chat = MagicMock()
+        chat.completions.create.side_effect = ValueError("boom")
+
+        out = io.StringIO()
+        with patch('vibe_coding.client.get_client', return_value=SimpleNamespace(chat=chat)), \
+                patch('vibe_coding.cache.ENABLED', False), \
+                patch('vibe_coding.ratelimit._limiter', RateLimiter(rpm=10000, tpm=10 ** 7)), \
+                patch('vibe_coding.breaker._breakers', {}), \
+                patch.object(server.sys.stdout, 'default', io.StringIO()) as daemon_out:
+            self.assertTrue(server.forward(["summarize", self.input_file, other_file], out))
+
+        self.assertEqual(out.getvalue().count("OpenAI call failed (boom) — using stub."), 2)
+        self.assertNotIn("OpenAI call failed", daemon_out.getvalue())
+
+    def test_forward_refuses_other_directory(self):
+        """Test jobs from another working directory run locally instead"""
+        with patch('vibe_coding.server.os.getcwd', side_effect=["/elsewhere", os.getcwd()]):
+            self.assertFalse(server.forward(["todo", self.input_file], io.StringIO()))
+
+    def test_forward_refuses_other_environment(self):
+        """Test a caller whose AGENT_*/OPENAI_* settings differ runs locally"""
+        with patch.dict(os.environ, {"AGENT_SUMMARIZER": "local"}):
+            self.assertFalse(server.forward(["todo", self.input_file], io.StringIO()))
+        with patch.dict(os.environ, {"UNRELATED_SETTING": "1"}):
+            self.assertTrue(server.forward(["todo", self.input_file], io.StringIO()))
+
+    def test_socket_is_private(self):
+        """Test only the owner can connect to the daemon"""
+        self.assertEqual(os.stat(server.SOCKET_FILE).st_mode & 0o777, 0o600)
+
+    def test_forward_refuses_serve(self):
+        """Test only summarize, todo and orchestrate are forwarded"""
+        self.assertFalse(server.forward(["cache", "stats"], io.StringIO()))
+
+    def test_no_daemon(self):
+        """Test forward reports False when nothing is listening"""
+        self.stop.set()
+        self.thread.join(5)
+        self.assertFalse(server.forward(["todo", self.input_file], io.StringIO()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+"""Start-up time regression tests for the CLI"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from vibe_coding.tools import MANIFEST
+from vibe_coding.utils import TOOLS
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Generous ceiling for `import vibe_coding.cli`; importing openai alone
+# takes several times longer than this
+IMPORT_BUDGET_SECONDS = 0.3
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import vibe_coding.cli
+elapsed = time.perf_counter() - start
+sys.argv = ["agent"] + sys.argv[1:]
+if len(sys.argv) > 1:
+    vibe_coding.cli.main()
+loaded = [m for m in sys.modules if m == "openai" or m.startswith("vibe_coding.tools.")]
+print(json.dumps({"elapsed": elapsed, "loaded": loaded}), file=sys.stderr)
+"""
+
+
+def run_probe(*argv, cwd=None):
+    """Import the CLI (and optionally run a command) in a fresh interpreter"""
+    env = dict(os.environ, PYTHONPATH=PACKAGE_ROOT, OPENAI_API_KEY="")
+    proc = subprocess.run([sys.executable, "-c", PROBE, *argv], cwd=cwd, env=env,
+                          capture_output=True, text=True, check=True)
+    return json.loads(proc.stderr.strip().splitlines()[-1])
+
+
+class TestStartup(unittest.TestCase):
+    """Tests that CLI start-up stays cheap"""
+
+    def test_import_is_lazy_and_fast(self):
+        """Test importing the CLI loads neither openai nor any tool module"""
+        result = min((run_probe() for _ in range(3)), key=lambda r: r["elapsed"])
+
+        self.assertEqual(result["loaded"], [])
+        self.assertLess(result["elapsed"], IMPORT_BUDGET_SECONDS)
+
+    def test_todo_command_never_imports_openai(self):
+        """Test `agent todo` only imports the todo tool"""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(temp_dir, "notes.txt"), "w") as f:
+                f.write("First task. Second task.")
+            result = run_probe("todo", "notes.txt", cwd=temp_dir)
+        finally:
+            shutil.rmtree(temp_dir)
+
+        self.assertEqual(result["loaded"], ["vibe_coding.tools.todo"])
+
+    def test_manifest_matches_registration(self):
+        """Test manifest metadata agrees with each tool's @tool decorator"""
+        for name, meta in MANIFEST.items():
+            TOOLS[name]["fn"]  # imports the module, replacing the lazy entry
+            entry = TOOLS[name]
+            for field in ("description", "inputs", "outputs", "cpu_bound", "version", "uses_model",
+                          "split_on"):
+                self.assertEqual(entry[field], meta[field], f"{name}.{field}")
+            self.assertEqual("stream" in entry, meta["streaming"], f"{name}.streaming")
+            self.assertEqual("consume" in entry, meta["consumes"], f"{name}.consumes")
+            self.assertEqual("prompt" in entry, meta["batchable"], f"{name}.batchable")
+
+
+if __name__ == "__main__":
+    unittest.main()
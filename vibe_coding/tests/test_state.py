@@ -0,0 +1,224 @@
+"""Tests for state.py and the state helpers in utils.py"""
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from vibe_coding.fanout import StateBatch
+from vibe_coding.state import BlobStore, StateLog, _fold
+from vibe_coding.utils import (load_state, save_state, get_state, put_state, update_state,
+                               stream_to_state)
+
+
+def _write_keys(path, worker, count):
+    store = StateLog(path)
+    for i in range(count):
+        store.update({f"w{worker}_{i}": i})
+
+
+class TestStateLog(unittest.TestCase):
+    """Tests for the append-only state log"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.temp_dir, "agent_state.json")
+        self.state_file_patcher = patch('vibe_coding.utils.STATE_FILE', self.state_file)
+        self.state_file_patcher.start()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        self.state_file_patcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def _lines(self):
+        with open(self.state_file) as f:
+            return f.read().splitlines()
+
+    def test_put_appends_only_changed_key(self):
+        """Test a keyed write appends one small record"""
+        save_state({"big": "x" * 1000, "n": 1})
+        put_state("n", 2)
+
+        self.assertEqual(json.loads(self._lines()[-1]), {"n": 2})
+        self.assertEqual(get_state("n"), 2)
+        self.assertEqual(get_state("big"), "x" * 1000)
+
+    def test_save_state_deletes_missing_keys(self):
+        """Test save_state keeps its replace-everything semantics"""
+        save_state({"a": 1, "b": 2})
+        save_state({"a": 1})
+
+        self.assertEqual(load_state(), {"a": 1})
+        self.assertEqual(len(self._lines()), 2)
+
+    def test_update_state_deletes(self):
+        """Test keys can be set and deleted in one write"""
+        save_state({"a": 1, "b": 2})
+        update_state({"c": 3}, deleted=["a"])
+
+        self.assertEqual(load_state(), {"b": 2, "c": 3})
+
+    def test_migrates_legacy_json(self):
+        """Test the old single-object state file is read and extended"""
+        with open(self.state_file, "w") as f:
+            json.dump({"last_summary": "Old."}, f)
+
+        put_state("last_todo", ["- New"])
+
+        self.assertEqual(load_state(), {"last_summary": "Old.", "last_todo": ["- New"]})
+
+    def test_migrates_pretty_printed_json(self):
+        """Test a multi-line legacy state file is rewritten as one record"""
+        with open(self.state_file, "w") as f:
+            json.dump({"a": {"b": [1, 2]}}, f, indent=2)
+
+        self.assertEqual(load_state(), {"a": {"b": [1, 2]}})
+        put_state("c", 3)
+
+        self.assertEqual(len(self._lines()), 2)
+        self.assertEqual(load_state(), {"a": {"b": [1, 2]}, "c": 3})
+
+    def test_torn_write_is_ignored(self):
+        """Test a partial trailing record from a crash is skipped"""
+        put_state("a", 1)
+        with open(self.state_file, "a") as f:
+            f.write('{"b": "unfinis')
+
+        self.assertEqual(load_state(), {"a": 1})
+        put_state("c", 3)
+        self.assertEqual(load_state(), {"a": 1, "c": 3})
+
+    def test_compaction(self):
+        """Test the log is rewritten once it is mostly overwritten values"""
+        with patch('vibe_coding.state.COMPACT_MIN_BYTES', 2000):
+            for i in range(200):
+                put_state("counter", i)
+
+        self.assertLess(len(self._lines()), 200)
+        self.assertEqual(get_state("counter"), 199)
+
+    def test_compaction_check_does_not_parse_the_log(self):
+        """Test writes to a log over COMPACT_MIN_BYTES do not fold it to decide"""
+        put_state("notes", "x" * 150)
+        with patch('vibe_coding.state.COMPACT_MIN_BYTES', 100), \
+                patch('vibe_coding.state._fold', wraps=_fold) as fold:
+            for i in range(5):
+                put_state("counter", i)
+            fold.assert_not_called()
+            # Once most of the log came after the first record, it is compacted
+            for i in range(20):
+                put_state("counter", i)
+            fold.assert_called()
+        self.assertLess(len(self._lines()), 25)
+        self.assertEqual(load_state(), {"notes": "x" * 150, "counter": 19})
+
+    def test_concurrent_writers(self):
+        """Test writers in several processes never lose each other's keys"""
+        ctx = multiprocessing.get_context("fork")
+        workers = [ctx.Process(target=_write_keys, args=(self.state_file, w, 50))
+                   for w in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(len(load_state()), 200)
+
+
+class TestStateBlobs(unittest.TestCase):
+    """Tests for large values stored as compressed content-addressed blobs"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.temp_dir, "agent_state.json")
+        self.blob_dir = os.path.join(self.temp_dir, "agent_blobs")
+        self.patchers = [
+            patch('vibe_coding.utils.STATE_FILE', self.state_file),
+            patch('vibe_coding.state.BLOB_MIN_BYTES', 200),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def blobs(self):
+        return sorted(name for _, _, names in os.walk(self.blob_dir) for name in names)
+
+    def test_large_values_are_stored_once_by_reference(self):
+        """Test the log holds small references and equal values share a blob"""
+        todos = [f"- Task {i}" for i in range(100)]
+        update_state({"last_todo": todos, "todo_copy": todos, "small": "kept inline"})
+
+        with open(self.state_file) as f:
+            record = json.loads(f.read())
+        self.assertEqual(record["small"], "kept inline")
+        self.assertEqual(list(record["last_todo"]), ["__blob__"])
+        self.assertLess(len(json.dumps(record)), 300)
+        self.assertEqual(len(self.blobs()), 1)
+        self.assertEqual(get_state("last_todo"), todos)
+        self.assertEqual(load_state(), {"last_todo": todos, "todo_copy": todos,
+                                        "small": "kept inline"})
+
+    def test_values_load_only_when_accessed(self):
+        """Test reading state parses the log without opening blobs"""
+        update_state({"summary": "word " * 100, "n": 1})
+        with patch.object(BlobStore, 'get', wraps=BlobStore(self.blob_dir).get) as get:
+            state = load_state()
+            self.assertEqual(state["n"], 1)
+            get.assert_not_called()
+            self.assertEqual(state["summary"], "word " * 100)
+            self.assertEqual(get.call_count, 1)
+
+    def test_per_file_maps_store_entries_separately(self):
+        """Test adding one file's results neither rewrites nor loads the others"""
+        batch = StateBatch("todos", flush_every=1)
+        for i in range(3):
+            batch.add(f"file{i}.txt", [f"- Task {i}.{j}" for j in range(40)])
+        self.assertEqual(len(self.blobs()), 3 + 1)  # one per entry, plus the map
+
+        with patch.object(BlobStore, 'get', wraps=BlobStore(self.blob_dir).get) as get:
+            batch.add("file3.txt", ["- New"])
+        self.assertEqual(get.call_count, 1)  # the map of references only
+        self.assertEqual(get_state("todos")["file1.txt"][0], "- Task 1.0")
+        self.assertEqual(sorted(get_state("todos")), [f"file{i}.txt" for i in range(4)])
+
+    def test_history_is_compacted_and_unused_blobs_collected(self):
+        """Test the log keeps at most HISTORY_RECORDS records and old blobs go"""
+        with patch('vibe_coding.state.HISTORY_RECORDS', 10), \
+                patch('vibe_coding.state.BLOB_GRACE_SECONDS', 0):
+            for i in range(30):
+                put_state("summary", f"Summary number {i}. " * 20)
+
+        with open(self.state_file) as f:
+            self.assertLessEqual(len(f.read().splitlines()), 11)
+        self.assertLessEqual(len(self.blobs()), 10)
+        self.assertEqual(get_state("summary"), "Summary number 29. " * 20)
+
+    def test_streamed_values_go_straight_to_blobs(self):
+        """Test stream_to_state writes a large list as a blob and appends only its reference"""
+        items = list(stream_to_state("last_todo", (f"- Task {i}" for i in range(1000))))
+
+        with open(self.state_file) as f:
+            self.assertEqual(f.read(), json.dumps({"last_todo": {"__blob__": self.blobs()[0].split(".")[0]}}) + "\n")
+        self.assertEqual(get_state("last_todo"), items)
+        self.assertEqual([name for name in os.listdir(self.blob_dir) if name.endswith(".tmp")], [])
+
+        # A blob holding the same list is shared, and small lists stay inline
+        list(stream_to_state("copy", iter(items)))
+        list(stream_to_state("short", iter(["- One"])))
+        self.assertEqual(len(self.blobs()), 1)
+        self.assertEqual(load_state()["short"], ["- One"])
+        with open(self.state_file) as f:
+            self.assertIn('{"short": ["- One"]}', f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
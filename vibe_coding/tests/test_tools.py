@@ -1,9 +1,16 @@
 """Tests for tools: summarize.py and todo.py"""
+import contextlib
+import os
+import shutil
+import tempfile
+import tracemalloc
 import unittest
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock
-from vibe_coding.tools.summarize import summarize_text
-from vibe_coding.tools.todo import generate_todos
-from vibe_coding.utils import TOOLS
+from vibe_coding.tools.summarize import summarize_text, summarize_text_stream, split_chunks
+from vibe_coding.tools.todo import generate_todos, iter_todos, iter_todos_file
+from vibe_coding.utils import TOOLS, AIText, ai_call_stream, load_state, save_state, stream_to_state
+from vibe_coding.cli import summarize, todo
 
 
 class TestSummarizeTool(unittest.TestCase):
@@ -61,6 +68,53 @@ class TestSummarizeTool(unittest.TestCase):
         self.assertEqual(tool["outputs"], ["summary"])
 
 
+class TestChunkedSummarize(unittest.TestCase):
+    """Tests for map-reduce summarization of large inputs"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.paragraphs = [f"Server {i} failed. Restarted service {i}." for i in range(20)]
+        self.test_text = "\n\n".join(self.paragraphs)
+
+    def test_split_chunks_respects_budget(self):
+        """Test chunks stay under the token budget and keep all sentences"""
+        chunks = split_chunks(self.test_text, max_tokens=30)
+
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) // 4 + 1 <= 30 for chunk in chunks))
+        joined = " ".join(chunks)
+        for paragraph in self.paragraphs:
+            self.assertIn(paragraph.split(". ")[1], joined)
+
+    def test_split_chunks_stable_under_append(self):
+        """Test appending text only changes the last chunk"""
+        before = split_chunks(self.test_text, max_tokens=30)
+        after = split_chunks(self.test_text + " Another line.", max_tokens=30)
+
+        self.assertEqual(before[:-1], after[:len(before) - 1])
+
+    @patch('vibe_coding.tools.summarize.CHUNK_TOKENS', 30)
+    @patch('vibe_coding.utils.ai_call')
+    def test_chunked_summary_reduces_to_one(self, mock_ai):
+        """Test chunk summaries are reduced to a single result"""
+        mock_ai.side_effect = lambda text: text.split(".")[0] + "."
+
+        result = summarize_text(self.test_text)
+
+        chunk_count = len(split_chunks(self.test_text, max_tokens=30))
+        self.assertGreater(mock_ai.call_count, chunk_count)
+        self.assertEqual(result, "Server 0 failed.")
+
+    @patch('vibe_coding.utils.ai_call')
+    def test_chunked_can_be_disabled(self, mock_ai):
+        """Test chunked=False always sends a single request"""
+        mock_ai.return_value = "Summary."
+
+        summarize_text(self.test_text * 50, chunked=False)
+
+        mock_ai.assert_called_once()
+
+
 class TestTodoTool(unittest.TestCase):
     """Tests for the todo tool"""
 
@@ -130,6 +184,231 @@ class TestTodoTool(unittest.TestCase):
         self.assertEqual(tool["outputs"], ["todos"])
 
 
+class TestStreamingTodos(unittest.TestCase):
+    """Tests for the constant-memory todo path"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.temp_dir, "agent_state.json")
+        self.state_file_patcher = patch('vibe_coding.utils.STATE_FILE', self.state_file)
+        self.state_file_patcher.start()
+        self.input_file = os.path.join(self.temp_dir, "input.txt")
+
+    def tearDown(self):
+        """Clean up after tests"""
+        self.state_file_patcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_iter_todos_matches_generate_todos(self):
+        """Test every chunking of the text yields the same todos"""
+        text = "  Task one  . Task two. . Task three"
+        expected = generate_todos(text)
+        for size in range(1, len(text) + 1):
+            chunks = [text[i:i + size] for i in range(0, len(text), size)]
+            self.assertEqual(list(iter_todos(chunks)), expected)
+
+    def test_iter_todos_file_small_buffer(self):
+        """Test sentence boundaries falling between buffers"""
+        with open(self.input_file, "w") as f:
+            f.write("First task. Second task. Third task.")
+
+        result = list(iter_todos_file(self.input_file, buffer_size=4))
+
+        self.assertEqual(result, ["- First task", "- Second task", "- Third task"])
+
+    def test_iter_todos_file_constant_memory(self):
+        """Test peak memory does not grow with input size"""
+        with open(self.input_file, "w") as f:
+            for i in range(200000):
+                f.write(f"Task number {i}. ")
+
+        tracemalloc.start()
+        count = sum(1 for _ in iter_todos_file(self.input_file, buffer_size=1 << 14))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        self.assertEqual(count, 200000)
+        self.assertLess(peak, 512 * 1024)
+
+    def test_todo_command_streams_to_state(self):
+        """Test the todo command writes todos to state and keeps other keys"""
+        save_state({"previous_key": "previous_value"})
+        with open(self.input_file, "w") as f:
+            f.write("First task. Second task.")
+
+        with patch('builtins.print') as mock_print:
+            todo(SimpleNamespace(input=[self.input_file]))
+
+        state = load_state()
+        self.assertEqual(state["last_todo"], ["- First task", "- Second task"])
+        self.assertEqual(state["previous_key"], "previous_value")
+        mock_print.assert_any_call("- Second task")
+
+    def test_todo_command_memory_is_flat(self):
+        """Test `todo` peak memory stays far below its output, also on a second run"""
+        with open(self.input_file, "w") as f:
+            for i in range(100000):
+                f.write(f"Task number {i}. ")
+
+        peaks = []
+        for _ in range(2):
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), \
+                    patch('vibe_coding.tools.todo.BUFFER_SIZE', 1 << 14):
+                tracemalloc.start()
+                todo(SimpleNamespace(input=[self.input_file]))
+                peaks.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+
+        self.assertEqual(len(load_state()["last_todo"]), 100000)
+        # The todo list alone is about 2 MB of JSON
+        self.assertLess(max(peaks), 1 << 20)
+
+    def test_todo_command_does_not_read_earlier_state(self):
+        """Test a repeated `todo` run appends one record without loading the previous list"""
+        with open(self.input_file, "w") as f:
+            f.write("First task. Second task.")
+        with patch('builtins.print'):
+            todo(SimpleNamespace(input=[self.input_file]))
+            with patch('vibe_coding.state.StateLog._read_raw') as read_raw, \
+                    patch('vibe_coding.state.BlobStore.get') as get:
+                todo(SimpleNamespace(input=[self.input_file]))
+
+        read_raw.assert_not_called()
+        get.assert_not_called()
+        with open(self.state_file) as f:
+            self.assertEqual(len(f.read().splitlines()), 2)
+        self.assertEqual(load_state()["last_todo"], ["- First task", "- Second task"])
+
+    def test_concurrent_streams_keep_both_lists(self):
+        """Test two interleaved stream_to_state calls in one process both land in state"""
+        first = stream_to_state("todo_a", iter(["- A1", "- A2"]))
+        second = stream_to_state("todo_b", iter(["- B1", "- B2"]))
+        self.assertEqual(next(first), "- A1")
+        self.assertEqual(list(second), ["- B1", "- B2"])
+        self.assertEqual(list(first), ["- A2"])
+
+        state = load_state()
+        self.assertEqual(state["todo_a"], ["- A1", "- A2"])
+        self.assertEqual(state["todo_b"], ["- B1", "- B2"])
+        self.assertEqual(os.listdir(self.temp_dir), ["agent_state.json"])
+
+
+def stream_events(*deltas):
+    return [SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=d))])
+            for d in deltas]
+
+
+class TestStreamingSummaries(unittest.TestCase):
+    """Tests for token streaming from the model to stdout"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.patchers = [
+            patch('vibe_coding.utils.STATE_FILE', os.path.join(self.temp_dir, "agent_state.json")),
+            patch('vibe_coding.cache.CACHE_FILE', os.path.join(self.temp_dir, "agent_cache.db")),
+            patch('vibe_coding.ratelimit._limiter', MagicMock()),
+            patch('vibe_coding.breaker._breakers', {}),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        self.chat = MagicMock()
+        self.chat.completions.create.return_value = stream_events("Short", " summary", ".", None)
+        self.client_patcher = patch('vibe_coding.client.get_client',
+                                    return_value=SimpleNamespace(chat=self.chat))
+        self.client_patcher.start()
+        self.input_file = os.path.join(self.temp_dir, "input.txt")
+        with open(self.input_file, "w") as f:
+            f.write("Some text. More text.")
+
+    def tearDown(self):
+        """Clean up after tests"""
+        self.client_patcher.stop()
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_ai_call_stream_yields_and_caches(self):
+        """Test deltas are yielded as they arrive and the whole text is cached"""
+        chunks = list(ai_call_stream("Some text. More text."))
+        self.assertEqual(chunks, ["Short", " summary", "."])
+        self.assertTrue(self.chat.completions.create.call_args.kwargs["stream"])
+
+        cached = list(ai_call_stream("Some text. More text."))
+        self.assertEqual(cached, ["Short summary."])
+        self.assertEqual(cached[0].source, "cache")
+        self.assertEqual(self.chat.completions.create.call_count, 1)
+
+    @patch('vibe_coding.tools.summarize.LOCAL_FALLBACK', False)
+    def test_stream_falls_back_to_stub(self):
+        """Test a missing client streams the stub in one chunk"""
+        with patch('vibe_coding.client.get_client', return_value=None):
+            chunks = list(summarize_text_stream("Some text. More text."))
+        self.assertEqual(chunks, ["Some text."])
+        self.assertEqual(chunks[0].source, "stub")
+
+    @patch('vibe_coding.tools.summarize.CHUNK_TOKENS', 30)
+    @patch('vibe_coding.utils.ai_call')
+    def test_chunked_stream_streams_final_reduce(self, mock_ai):
+        """Test chunked inputs stream only the final summary"""
+        mock_ai.side_effect = lambda prompt: AIText("Partial summary.", "model")
+        text = " ".join(f"Sentence number {i}." for i in range(60))
+
+        chunks = list(summarize_text_stream(text, chunked=True))
+
+        self.assertTrue(mock_ai.called)
+        self.assertEqual("".join(chunks), "Short summary.")
+
+    def test_summarize_command_streams(self):
+        """Test summarize --stream prints chunks and saves the full summary"""
+        with patch('sys.stdout') as mock_stdout:
+            summarize(SimpleNamespace(input=[self.input_file], stream=True))
+
+        written = [call.args[0] for call in mock_stdout.write.call_args_list]
+        self.assertEqual(written[:3], ["Short", " summary", "."])
+        self.assertEqual(load_state()["last_summary"], "Short summary.")
+        self.assertEqual(load_state()["last_summary_source"], "model")
+
+    def test_orchestrate_streams_summary_then_runs_todo(self):
+        """Test orchestrate --stream feeds the streamed summary to later stages"""
+        from vibe_coding.orchestrator import orchestrator
+
+        with patch('sys.stdout'):
+            orchestrator(SimpleNamespace(input=[self.input_file], stream=True))
+
+        state = load_state()
+        self.assertEqual(state["summarize"], "Short summary.")
+        self.assertEqual(state["todo"], ["- Short summary"])
+
+    def test_orchestrate_pipelined_matches_sequential(self):
+        """Test orchestrate --pipelined --stream gives the same results"""
+        from vibe_coding.orchestrator import orchestrator
+
+        with patch('sys.stdout') as mock_stdout:
+            orchestrator(SimpleNamespace(input=[self.input_file], stream=True, pipelined=True))
+
+        written = [call.args[0] for call in mock_stdout.write.call_args_list]
+        start = written.index("Short")
+        self.assertEqual(written[start:start + 3], ["Short", " summary", "."])
+        state = load_state()
+        self.assertEqual(state["summarize"], "Short summary.")
+        self.assertEqual(state["todo"], ["- Short summary"])
+
+    def test_orchestrate_pipelined_incremental_memoizes_every_stage(self):
+        """Test orchestrate --pipelined --incremental remembers the consumers too"""
+        from vibe_coding.orchestrator import orchestrator, load_memo
+
+        args = SimpleNamespace(input=[self.input_file], pipelined=True, incremental=True)
+        with patch('sys.stdout'):
+            orchestrator(args)
+        self.assertEqual(sorted(load_memo(self.input_file)), ["summarize", "todo"])
+
+        with patch('sys.stdout'):
+            orchestrator(args)
+        self.assertEqual(self.chat.completions.create.call_count, 1)
+
+
 class TestToolsIntegration(unittest.TestCase):
     """Integration tests for tools"""
 
@@ -0,0 +1,192 @@
+"""Tests for watch.py (`agent watch`)"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from vibe_coding import watch
+from vibe_coding.cli import main
+from vibe_coding.utils import get_state
+from vibe_coding.watch import Inotify, Tail, Watcher
+
+
+class TestTail(unittest.TestCase):
+    """Tests for following one file by offset and inode"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.state_patcher = patch('vibe_coding.utils.STATE_FILE',
+                                   os.path.join(self.temp_dir, "agent_state.json"))
+        self.state_patcher.start()
+        self.path = os.path.join(self.temp_dir, "app.log")
+        self.seen = []
+
+    def tearDown(self):
+        """Clean up after tests"""
+        self.state_patcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def append(self, text, path=None):
+        with open(path or self.path, "a") as f:
+            f.write(text)
+
+    def process(self, path, text):
+        self.seen.append(text)
+
+    def poll(self, tail=None):
+        tail = tail or Tail(self.path, get_state(watch.OFFSETS_KEY, {}).get(self.path))
+        tail.poll(self.process)
+        return tail
+
+    def test_only_appended_bytes_are_read(self):
+        """Test each poll sees only new text, across restarts"""
+        self.append("First task. Second task.\n")
+        tail = self.poll()
+        self.append("Third task.\n")
+        self.poll(tail)
+        self.append("Fourth task.\n")
+        self.poll()  # a new run, starting from the saved offset
+
+        self.assertEqual(self.seen, ["First task. Second task.\n", "Third task.\n",
+                                     "Fourth task.\n"])
+        record = get_state(watch.OFFSETS_KEY)[self.path]
+        self.assertEqual(record["offset"], os.path.getsize(self.path))
+        self.assertEqual(record["inode"], os.stat(self.path).st_ino)
+
+    def test_unfinished_sentence_waits(self):
+        """Test a partial last sentence is processed once it is complete"""
+        self.append("Done task. Half writ")
+        tail = self.poll()
+        self.poll(tail)
+        self.append("ten task.")
+        self.poll(tail)
+        self.assertEqual(self.seen, ["Done task.", " Half written task."])
+
+    def test_large_backlog_is_read_in_pieces(self):
+        """Test a backlog bigger than READ_SIZE is split on boundaries"""
+        self.append("".join(f"Task {i}.\n" for i in range(100)))
+        with patch('vibe_coding.watch.READ_SIZE', 64):
+            self.poll()
+        self.assertGreater(len(self.seen), 10)
+        self.assertTrue(all(piece.endswith("\n") for piece in self.seen))
+        self.assertEqual("".join(self.seen), "".join(f"Task {i}.\n" for i in range(100)))
+
+    def test_truncation_restarts_from_zero(self):
+        """Test a file truncated in place is read again from the start"""
+        self.append("Old task one. Old task two.\n")
+        tail = self.poll()
+        with open(self.path, "w") as f:
+            f.write("New task.\n")
+        with patch('builtins.print'):
+            self.poll(tail)
+        self.assertEqual(self.seen[-1], "New task.\n")
+
+    def test_rotation_drains_old_file_then_follows_new(self):
+        """Test a rename-and-recreate rotation loses nothing"""
+        self.append("Before rotation.\n")
+        tail = self.poll()
+        self.append("Last old line without end")
+        os.rename(self.path, self.path + ".1")
+        self.append("First new line.\n")
+
+        with patch('builtins.print'):
+            self.poll(tail)
+        self.assertEqual(self.seen, ["Before rotation.\n", "Last old line without end",
+                                     "First new line.\n"])
+
+    def test_rotation_between_runs_finds_old_file_by_inode(self):
+        """Test a rotation while not watching drains the renamed file"""
+        self.append("Before rotation.\n")
+        self.poll()
+        self.append("Written after the last run.\n")
+        os.rename(self.path, self.path + ".1")
+        self.append("New file.\n")
+
+        with patch('builtins.print'):
+            self.poll()
+        self.assertEqual(self.seen, ["Before rotation.\n", "Written after the last run.\n",
+                                     "New file.\n"])
+
+
+class TestWatcher(unittest.TestCase):
+    """Tests for the watch loop and command"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.state_patcher = patch('vibe_coding.utils.STATE_FILE',
+                                   os.path.join(self.temp_dir, "agent_state.json"))
+        self.state_patcher.start()
+        self.logs = os.path.join(self.temp_dir, "logs")
+        os.mkdir(self.logs)
+
+    def tearDown(self):
+        """Clean up after tests"""
+        self.state_patcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, name, text):
+        with open(os.path.join(self.logs, name), "a") as f:
+            f.write(text)
+
+    def test_watch_once_runs_tools_on_new_content(self):
+        """Test `agent watch --once` runs todo on each file's appended text"""
+        self.write("a.log", "Fix the build. Update docs.\n")
+        with patch('builtins.print'):
+            main(["watch", "--once", self.logs])
+        self.write("a.log", "Rotate keys.\n")
+        self.write("b.log", "Review PR.\n")
+        with patch('builtins.print') as mock_print:
+            main(["watch", "--once", self.logs])
+
+        results = get_state(watch.RESULTS_KEY)
+        self.assertEqual(results[os.path.join(self.logs, "a.log")], {"todo": ["- Rotate keys"]})
+        self.assertEqual(results[os.path.join(self.logs, "b.log")], {"todo": ["- Review PR"]})
+        mock_print.assert_any_call("- Rotate keys")
+
+    def test_unknown_tool_is_reported(self):
+        """Test a bad --tool is reported before watching"""
+        with patch('builtins.print') as mock_print:
+            main(["watch", "--once", "--tool", "missing", self.logs])
+        mock_print.assert_any_call("Tool not found: missing")
+
+    def test_polling_fallback_and_interrupt(self):
+        """Test the loop polls without inotify and stops cleanly on Ctrl-C"""
+        self.write("a.log", "First.\n")
+        watcher = Watcher([self.logs], interval=0)
+        sleeps = []
+
+        def fake_sleep(seconds):
+            sleeps.append(seconds)
+            if len(sleeps) == 1:
+                self.write("a.log", "Second.\n")
+            else:
+                raise KeyboardInterrupt
+
+        with patch('vibe_coding.watch.Inotify.create', return_value=None), \
+                patch('vibe_coding.watch.time.sleep', side_effect=fake_sleep), \
+                patch('builtins.print'):
+            with self.assertRaises(KeyboardInterrupt):
+                watcher.run()
+
+        self.assertEqual(get_state(watch.RESULTS_KEY)[os.path.join(self.logs, "a.log")],
+                         {"todo": ["- Second"]})
+
+    @unittest.skipUnless(Inotify.create(), "inotify is not available")
+    def test_inotify_wakes_on_append(self):
+        """Test an append to a watched directory ends the wait early"""
+        self.write("a.log", "First.\n")
+        notifier = Inotify.create()
+        try:
+            notifier.add(self.logs)
+            self.assertFalse(notifier.wait(0))
+            self.write("a.log", "Second.\n")
+            self.assertTrue(notifier.wait(5))
+            self.assertFalse(notifier.wait(0))
+        finally:
+            notifier.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
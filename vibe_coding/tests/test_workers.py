@@ -0,0 +1,130 @@
+"""Tests for workers.py (`--workers N`)"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from vibe_coding import workers
+from vibe_coding.cli import main
+from vibe_coding.scheduler import run_pipeline
+from vibe_coding.tools.todo import generate_todos
+from vibe_coding.utils import load_state
+
+TEXT = "".join(f"Task number {i} needs doing. Ümlaut item {i}.\r\n" for i in range(200))
+
+
+class TestPartitioning(unittest.TestCase):
+    """Tests for cutting files into byte ranges on safe boundaries"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "notes.txt")
+        with open(self.path, "wb") as f:
+            f.write(TEXT.encode("utf-8"))
+
+    def tearDown(self):
+        """Clean up after tests"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_ranges_cover_file_and_end_after_split_on(self):
+        """Test ranges are contiguous and each one ends just after a period"""
+        ranges = workers.partition_file(self.path, ".", 8)
+        size = os.path.getsize(self.path)
+        self.assertEqual(len(ranges), 8)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], size)
+        with open(self.path, "rb") as f:
+            data = f.read()
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(data[end - 1:end], b".")
+
+    def test_boundary_search_crosses_windows(self):
+        """Test a split_on beyond the first read window is still found"""
+        with patch('vibe_coding.workers._SEARCH_SIZE', 4):
+            ranges = workers.partition_file(self.path, ".", 8)
+        self.assertEqual(ranges, workers.partition_file(self.path, ".", 8))
+
+    def test_too_many_parts_or_no_boundary(self):
+        """Test small files give fewer ranges and text without split_on gives one"""
+        with open(self.path, "w") as f:
+            f.write("One. Two. Three without end")
+        self.assertEqual(workers.partition_file(self.path, ".", 100),
+                         [(0, 4), (4, 9), (9, 27)])
+        self.assertEqual(workers.partition_file(self.path, "!", 4), [(0, 27)])
+
+
+class TestWorkers(unittest.TestCase):
+    """Tests for running partitioned tools in worker processes"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "notes.txt")
+        with open(self.path, "wb") as f:
+            f.write(TEXT.encode("utf-8"))
+        self.patchers = [
+            patch('vibe_coding.utils.STATE_FILE', os.path.join(self.temp_dir, "agent_state.json")),
+            patch('vibe_coding.workers.PARTITION_MIN_BYTES', 0),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        self.workers = workers.WORKERS
+        workers.configure(2)
+
+    def tearDown(self):
+        """Clean up after tests"""
+        workers.configure(self.workers)
+        for patcher in reversed(self.patchers):
+            patcher.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def expected(self):
+        with open(self.path, "r") as f:
+            return generate_todos(f.read())
+
+    def test_partitioned_result_matches_single_process(self):
+        """Test merged partitions equal running the tool on the whole file"""
+        self.assertTrue(workers.can_partition("todo", os.path.getsize(self.path)))
+        self.assertEqual(workers.run_file("todo", self.path), self.expected())
+        self.assertEqual(workers.run_text("todo", TEXT.replace("\r\n", "\n")), self.expected())
+
+    def test_only_split_on_tools_are_partitioned(self):
+        """Test tools without split_on, small inputs and one worker are left whole"""
+        self.assertFalse(workers.can_partition("summarize", 1 << 30))
+        with patch('vibe_coding.workers.PARTITION_MIN_BYTES', 1 << 20):
+            self.assertFalse(workers.can_partition("todo", 1000))
+        workers.configure(1)
+        self.assertFalse(workers.can_partition("todo", 1 << 30))
+
+    def test_pool_has_exactly_workers_processes(self):
+        """Test the pool is sized to --workers, not to the number of cores"""
+        for count in (1, 3):
+            workers.configure(count)
+            self.assertEqual(workers.get_pool()._max_workers, count)
+
+    def test_scheduler_partitions_large_stage_input(self):
+        """Test a pipeline stage on large text goes through run_text"""
+        text = TEXT.replace("\r\n", "\n")
+        with patch('vibe_coding.workers.run_text', wraps=workers.run_text) as run_text:
+            results = run_pipeline([{"tool": "todo"}], {"text": text})
+        run_text.assert_called_once_with("todo", text)
+        self.assertEqual(results["todo"], generate_todos(text))
+
+    def test_cli_workers_flag(self):
+        """Test `agent --workers 2 todo` saves the same todos, for one file and many"""
+        other = os.path.join(self.temp_dir, "other.txt")
+        shutil.copy(self.path, other)
+
+        with patch('builtins.print'):
+            main(["--workers", "2", "todo", self.path])
+        self.assertEqual(load_state()["last_todo"], self.expected())
+
+        with patch('builtins.print'):
+            main(["--workers", "2", "todo", self.path, other])
+        self.assertEqual(load_state()["todos"][other], self.expected())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,61 @@
 """Tools module for vibe coding agent"""
-from .summarize import summarize_text
-from .todo import generate_todos
+import importlib
 
-__all__ = ["summarize_text", "generate_todos"]
+# Tool metadata, readable without importing the tool modules. Each module
+# registers the same metadata through @tool when it is first imported.
+MANIFEST = {
+    "summarize": {
+        "module": "vibe_coding.tools.summarize",
+        "description": "Summarize input text into a short summary",
+        "inputs": ["text"],
+        "outputs": ["summary"],
+        "cpu_bound": False,
+        "version": 1,
+        "uses_model": True,
+        "split_on": None,
+        "streaming": True,
+        "consumes": False,
+        "batchable": True,
+    },
+    "todo": {
+        "module": "vibe_coding.tools.todo",
+        "description": "Generate a todo list from text",
+        "inputs": ["text"],
+        "outputs": ["todos"],
+        "cpu_bound": True,
+        "version": 1,
+        "uses_model": False,
+        "split_on": ".",
+        "streaming": False,
+        "consumes": True,
+        "batchable": False,
+    },
+    "dedup": {
+        "module": "vibe_coding.tools.dedup",
+        "description": "Collapse near-duplicate todos, with occurrence counts",
+        "inputs": ["todos"],
+        "outputs": ["unique_todos"],
+        "cpu_bound": False,
+        "version": 1,
+        "uses_model": False,
+        "split_on": None,
+        "streaming": False,
+        "consumes": False,
+        "batchable": False,
+    },
+}
+
+_EXPORTS = {
+    "summarize_text": "vibe_coding.tools.summarize",
+    "generate_todos": "vibe_coding.tools.todo",
+    "dedup_todos": "vibe_coding.tools.dedup",
+}
+
+__all__ = ["summarize_text", "generate_todos", "dedup_todos"]
+
+
+def __getattr__(name):
+    """Import tool functions on first access"""
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,175 @@
+import os
+import sqlite3
+import time
+from vibe_coding.similarity import (PROBES_PER_QUERY, blocks, from_signed, hamming, normalize,
+                                    probes, simhash, to_signed)
+from vibe_coding.utils import tool
+
+INDEX_FILE = "agent_todo_index.db"
+
+# Todos whose fingerprints differ in at most this many of 64 bits are
+# treated as the same todo
+MAX_DISTANCE = int(os.getenv("AGENT_DEDUP_DISTANCE", 7))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS todos (
+    id INTEGER PRIMARY KEY,
+    normalized TEXT NOT NULL,
+    fingerprint INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS todos_normalized ON todos (normalized);
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    todo_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bands_lookup ON bands (band, value);
+"""
+
+# PRAGMA user_version of an index whose bands rows are multi-index blocks
+# (see vibe_coding.similarity); older indexes are re-keyed on open
+_INDEX_VERSION = 1
+
+
+@tool(
+    name="dedup",
+    description="Collapse near-duplicate todos, with occurrence counts",
+    inputs=["todos"],
+    outputs=["unique_todos"]
+)
+def dedup_todos(todos):
+    """Collapse near-duplicate todos into one line each, counting repeats
+
+    Todos are matched against this run and against the persistent index
+    of earlier runs, so a known todo keeps its original wording.
+    """
+    return [format_cluster(cluster) for cluster in TodoIndex().add_many(todos)]
+
+
+def format_cluster(cluster):
+    """One output line: the todo, plus its count when it repeated"""
+    if cluster["count"] > 1:
+        return f"{cluster['text']} (x{cluster['count']})"
+    return cluster["text"]
+
+
+# ----------------------
+# Persistent similarity index
+# ----------------------
+class TodoIndex:
+    """SQLite-backed SimHash index of every todo seen so far
+
+    Lookups use multi-index fingerprint keys (see vibe_coding.similarity):
+    each new todo costs BLOCKS indexed queries and is compared only with
+    the few todos sharing a probed 16-bit block, so adding n todos stays
+    close to linear. Exact repeats skip fingerprinting entirely.
+    """
+
+    def __init__(self, path=None, max_distance=None):
+        self.path = path or INDEX_FILE
+        self.max_distance = MAX_DISTANCE if max_distance is None else max_distance
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        if self.path != ":memory:":
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        if conn.execute("PRAGMA user_version").fetchone()[0] < _INDEX_VERSION:
+            self._rekey(conn)
+        return conn
+
+    def _rekey(self, conn):
+        """Replace an older index's band keys with multi-index blocks"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have re-keyed it while we waited
+            if conn.execute("PRAGMA user_version").fetchone()[0] < _INDEX_VERSION:
+                conn.execute("DELETE FROM bands")
+                rows = conn.execute("SELECT id, fingerprint FROM todos").fetchall()
+                conn.executemany("INSERT INTO bands (band, value, todo_id) VALUES (?, ?, ?)",
+                                 [(block, value, todo_id) for todo_id, fingerprint in rows
+                                  for block, value in blocks(from_signed(fingerprint))])
+                conn.execute(f"PRAGMA user_version = {_INDEX_VERSION}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def add_many(self, todos):
+        """Add todos; return their clusters in order of first appearance
+
+        Each cluster is {"text", "count" (this call), "total" (all runs),
+        "seen_before" (matched a todo from an earlier run)}.
+        """
+        clusters = {}      # todo id -> cluster
+        by_normalized = {}  # exact repeats within this call
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for todo in todos:
+                key = normalize(todo)
+                todo_id = by_normalized.get(key)
+                if todo_id is None:
+                    todo_id, text, total = self._match(conn, key, todo)
+                    by_normalized[key] = todo_id
+                    if todo_id not in clusters:
+                        clusters[todo_id] = {"text": text, "count": 0, "total": total,
+                                             "seen_before": total > 0}
+                clusters[todo_id]["count"] += 1
+
+            now = time.time()
+            for todo_id, cluster in clusters.items():
+                conn.execute("UPDATE todos SET count = count + ?, last_seen = ? WHERE id = ?",
+                             (cluster["count"], now, todo_id))
+                cluster["total"] += cluster["count"]
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return list(clusters.values())
+
+    def _match(self, conn, key, todo):
+        """Return (id, text, count) of the stored todo matching todo, adding it if new"""
+        row = conn.execute("SELECT id, text, count FROM todos WHERE normalized = ? LIMIT 1",
+                           (key,)).fetchone()
+        if row:
+            return row
+
+        fingerprint = simhash(key)
+        for block, values in probes(fingerprint, self.max_distance):
+            for i in range(0, len(values), PROBES_PER_QUERY):
+                chunk = values[i:i + PROBES_PER_QUERY]
+                for todo_id, other, text, count in conn.execute(
+                        "SELECT t.id, t.fingerprint, t.text, t.count FROM bands b "
+                        "JOIN todos t ON t.id = b.todo_id "
+                        f"WHERE b.band = ? AND b.value IN ({', '.join('?' * len(chunk))})",
+                        (block, *chunk)):
+                    if hamming(fingerprint, from_signed(other)) <= self.max_distance:
+                        return todo_id, text, count
+
+        now = time.time()
+        todo_id = conn.execute(
+            "INSERT INTO todos (normalized, fingerprint, text, count, first_seen, last_seen) "
+            "VALUES (?, ?, ?, 0, ?, ?)",
+            (key, to_signed(fingerprint), todo, now, now),
+        ).lastrowid
+        conn.executemany("INSERT INTO bands (band, value, todo_id) VALUES (?, ?, ?)",
+                         [(block, value, todo_id) for block, value in blocks(fingerprint)])
+        return todo_id, todo, 0
+
+    def stats(self):
+        """Return the number of distinct todos and total occurrences indexed"""
+        conn = self._connect()
+        try:
+            distinct, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(count), 0) FROM todos").fetchone()
+        finally:
+            conn.close()
+        return {"distinct": distinct, "occurrences": total}
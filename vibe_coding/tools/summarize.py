@@ -1,12 +1,192 @@
-from vibe_coding.utils import tool, ai_call
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from vibe_coding import utils
+from vibe_coding.utils import tool, tool_prompt, tool_stream, estimate_tokens, AIText
+
+# Token budget per chunk; larger inputs are summarized map-reduce style
+CHUNK_TOKENS = int(os.getenv("AGENT_CHUNK_TOKENS", 2000))
+# Replace stub summaries with local extractive ones when the model is unavailable
+LOCAL_FALLBACK = os.getenv("AGENT_LOCAL_FALLBACK", "1") != "0"
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
 
 
 @tool(
     name="summarize",
     description="Summarize input text into a short summary",
     inputs=["text"],
-    outputs=["summary"]
+    outputs=["summary"],
+    uses_model=True
 )
-def summarize_text(text):
-    """Summarize input text using AI"""
-    return ai_call(text)
+def summarize_text(text, chunked=None):
+    """Summarize input text using AI, or locally when utils.SUMMARIZER is "local"
+
+    Inputs over CHUNK_TOKENS (or over the largest model route's
+    max_tokens, if bigger) are split into chunks, summarized in parallel
+    and reduced; pass chunked=True/False to force either mode.
+    """
+    if utils.SUMMARIZER == "local":
+        return summarize_local(text)
+    if chunked is None:
+        chunked = _too_big(text)
+    if not chunked:
+        return _fallback(text, utils.ai_call(text))
+    return _fallback(text, summarize_chunked(text))
+
+
+def _too_big(text):
+    """True if text needs the chunked path: no model route takes it whole"""
+    from vibe_coding.routing import get_router
+
+    return estimate_tokens(text) > max(CHUNK_TOKENS, get_router().largest_context() or 0)
+
+
+# ----------------------
+# Local (extractive) summarization
+# ----------------------
+def summarize_local(text):
+    """Extractive summary of the whole text, computed without the model"""
+    from vibe_coding import extractive
+
+    return AIText(extractive.summarize(text), "local")
+
+
+def _fallback(text, summary):
+    """Swap a stub summary for a local one, still labelled as a stub
+
+    The label keeps outage summaries out of the cache and the incremental
+    memo, so the model is tried again on the next run.
+    """
+    if not LOCAL_FALLBACK or getattr(summary, "source", None) != "stub":
+        return summary
+    try:
+        return AIText(summarize_local(text), "stub")
+    except ImportError:  # NumPy is not installed
+        return summary
+
+
+# ----------------------
+# Chunked (map-reduce) summarization
+# ----------------------
+def split_chunks(text, max_tokens=None):
+    """Split text on paragraph/sentence boundaries into chunks under max_tokens
+
+    Chunks are packed greedily from the start, so appending to the text
+    leaves every chunk but the last unchanged (and cached).
+    """
+    max_tokens = max_tokens or CHUNK_TOKENS
+    max_chars = max_tokens * 4
+
+    chunks = []
+    current = []
+    size = 0
+    for paragraph in _PARAGRAPH_RE.split(text):
+        sentences = [s for s in _SENTENCE_RE.split(paragraph.strip()) if s]
+        for i, sentence in enumerate(sentences):
+            # A single over-long sentence is hard-split by characters
+            for start in range(0, len(sentence), max_chars):
+                piece = sentence[start:start + max_chars]
+                tokens = estimate_tokens(piece)
+                if current and size + tokens > max_tokens:
+                    chunks.append("".join(current))
+                    current, size = [], 0
+                if current:
+                    piece = ("\n\n" if i == 0 and start == 0 else " ") + piece
+                current.append(piece)
+                size += tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+def _group(parts, max_tokens):
+    """Pack partial summaries into groups of at least two under max_tokens"""
+    groups = [[]]
+    size = 0
+    for part in parts:
+        tokens = estimate_tokens(part)
+        if len(groups[-1]) >= 2 and size + tokens > max_tokens:
+            groups.append([])
+            size = 0
+        groups[-1].append(part)
+        size += tokens
+    return groups
+
+
+def _map_reduce(text, max_tokens):
+    """Summarize chunks in parallel and reduce them until one group is left
+
+    Returns (parts, stubbed). A single part is the finished summary;
+    several parts still need one final summary of their joined text.
+    """
+    prompts = split_chunks(text, max_tokens)
+    if not prompts:
+        return [], False
+
+    stubbed = False
+    call = utils.carry_context(utils.ai_call)
+    with ThreadPoolExecutor(max_workers=utils.AI_CONCURRENCY) as executor:
+        while True:
+            parts = list(executor.map(call, prompts))
+            stubbed = stubbed or any(getattr(part, "source", "model") == "stub" for part in parts)
+            groups = _group(parts, max_tokens)
+            if len(groups) == 1:
+                return parts, stubbed
+            prompts = ["\n\n".join(group) for group in groups]
+
+
+def summarize_chunked(text, max_tokens=None):
+    """Summarize chunks in parallel, then tree-reduce the partial summaries"""
+    parts, stubbed = _map_reduce(text, max_tokens or CHUNK_TOKENS)
+    if not parts:
+        return utils.ai_call(text)
+
+    summary = parts[0] if len(parts) == 1 else utils.ai_call("\n\n".join(parts))
+    # A summary built on any stubbed chunk is labelled as a stub
+    if stubbed:
+        return AIText(summary, "stub")
+    return summary
+
+
+@tool_prompt("summarize")
+def summarize_prompt(text):
+    """The one prompt that summarizes text, or None if it must run locally or chunked"""
+    if utils.SUMMARIZER == "local" or _too_big(text):
+        return None
+    return text
+
+
+# ----------------------
+# Streaming summarization
+# ----------------------
+@tool_stream("summarize")
+def summarize_text_stream(text, chunked=None):
+    """Yield the summary in chunks as the model produces it
+
+    In chunked mode the map and intermediate reduce levels run first;
+    only the final summary is streamed. Local and fallback summaries are
+    yielded whole.
+    """
+    if utils.SUMMARIZER == "local":
+        yield summarize_local(text)
+        return
+    if chunked is None:
+        chunked = _too_big(text)
+    if not chunked:
+        chunks = utils.ai_call_stream(text)
+    else:
+        parts, stubbed = _map_reduce(text, CHUNK_TOKENS)
+        if not parts:
+            chunks = utils.ai_call_stream(text)
+        elif len(parts) == 1:
+            chunks = [AIText(parts[0], "stub" if stubbed else getattr(parts[0], "source", "model"))]
+        else:
+            chunks = utils.ai_call_stream("\n\n".join(parts))
+
+    for i, chunk in enumerate(chunks):
+        # A stub only ever arrives first and alone (see ai_call_stream)
+        if i == 0 and getattr(chunk, "source", None) == "stub":
+            chunk = _fallback(text, chunk)
+        yield chunk
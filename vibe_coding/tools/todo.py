@@ -1,13 +1,74 @@
-from vibe_coding.utils import tool
+from vibe_coding import metrics
+from vibe_coding.utils import tool, tool_consume
+
+# Bytes read per buffer when streaming todos from a file
+BUFFER_SIZE = 1 << 20
 
 
 @tool(
     name="todo",
     description="Generate a todo list from text",
     inputs=["text"],
-    outputs=["todos"]
+    outputs=["todos"],
+    cpu_bound=True,
+    split_on="."
 )
 def generate_todos(text):
     """Generate todo list from text by splitting on periods"""
-    lines = [s.strip() for s in text.split(".") if s.strip()]
-    return [f"- {line}" for line in lines]
+    return list(iter_todos([text]))
+
+
+# ----------------------
+# Streaming todos
+# ----------------------
+@tool_consume("todo")
+def iter_todos(chunks):
+    """Lazily yield todos from an iterable of text chunks
+
+    A sentence may span several chunks; only the unfinished tail is kept.
+    """
+    tail = []
+    for chunk in chunks:
+        if "." not in chunk:
+            tail.append(chunk)
+            continue
+        parts = chunk.split(".")
+        parts[0] = "".join(tail) + parts[0]
+        tail = [parts.pop()]
+        for part in parts:
+            line = part.strip()
+            if line:
+                yield f"- {line}"
+
+    line = "".join(tail).strip()
+    if line:
+        yield f"- {line}"
+
+
+def read_chunks(path, buffer_size=None):
+    """Yield a text file in fixed-size buffers"""
+    buffer_size = buffer_size or BUFFER_SIZE
+    with metrics.span("io", "read_input") as span, open(path, "r") as f:
+        while True:
+            chunk = f.read(buffer_size)
+            if not chunk:
+                return
+            span.add(bytes_in=len(chunk))
+            yield chunk
+
+
+def iter_todos_file(path, buffer_size=None):
+    """Lazily yield todos from a file in constant memory
+
+    Recorded as a todo tool span, as generate_todos is, with the text
+    read and the todos yielded.
+    """
+    with metrics.span("tool", "todo") as span:
+        def counted(chunks):
+            for chunk in chunks:
+                span.add(bytes_in=len(chunk))
+                yield chunk
+
+        for line in iter_todos(counted(read_chunks(path, buffer_size))):
+            span.add(bytes_out=len(line))
+            yield line
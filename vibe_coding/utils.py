@@ -1,66 +1,522 @@
-import openai
 import os
+import sys
 import json
+import contextvars
+import importlib
+import threading
+import time
+import weakref
+from vibe_coding import metrics
+from vibe_coding.state import StateLog
 
 STATE_FILE = "agent_state.json"
+MODEL = "gpt-3.5-turbo"
+SYSTEM_PROMPT = "You are a helpful assistant."
+# Summarize backend: "model" (ai_call) or "local" (extractive, no API calls)
+SUMMARIZER = os.getenv("AGENT_SUMMARIZER", "model")
+AI_CONCURRENCY = int(os.getenv("AGENT_CONCURRENCY", 8))
+# Completion tokens reserved against the tokens-per-minute limit per call
+COMPLETION_TOKENS = 256
 
 # ----------------------
 # State management
 # ----------------------
+def _store():
+    return StateLog(STATE_FILE)
+
 def save_state(data):
-    """Save state to JSON file"""
+    """Save state, appending only the keys that changed since the last save"""
     try:
-        with open(STATE_FILE, "w") as f:
-            json.dump(data, f)
+        _store().replace(data)
     except Exception as e:
         print(f"Warning: Could not save state ({e})")
 
 def load_state():
-    """Load state from JSON file"""
+    """Load state from the state log"""
     try:
-        with open(STATE_FILE, "r") as f:
-            return json.load(f)
+        return _store().read()
     except:
         return {}
 
+def get_state(key, default=None):
+    """Return a single state key"""
+    return load_state().get(key, default)
+
+def update_state(changes, deleted=()):
+    """Set and delete keys in one atomic append, leaving other keys alone"""
+    try:
+        _store().update(changes, deleted)
+    except Exception as e:
+        print(f"Warning: Could not save state ({e})")
+
+def put_state(key, value):
+    """Set a single state key"""
+    update_state({key: value})
+
+def transact_state(fn):
+    """Run fn(state) -> changed keys under the state write lock"""
+    try:
+        _store().transact(fn)
+    except Exception as e:
+        print(f"Warning: Could not save state ({e})")
+
+def stream_to_state(key, items):
+    """Yield items while writing them to state[key] as a JSON list
+
+    The list is hashed and compressed into a state blob as items arrive
+    rather than held in memory, and state[key] is set with one small
+    append once the iterator is exhausted; earlier state is never read.
+    Each call writes its own temporary file, so concurrent jobs in one
+    daemon process do not overwrite each other's lists.
+    """
+    store = _store()
+    writer = store.blob_writer()
+    saving = True
+
+    def save(text):
+        nonlocal saving
+        if saving:
+            try:
+                writer.write(text)
+            except OSError as e:
+                print(f"Warning: Could not save state ({e})")
+                saving = False
+                writer.discard()
+
+    try:
+        save("[")
+        for i, item in enumerate(items):
+            save((", " if i else "") + json.dumps(item))
+            yield item
+        save("]")
+        if saving:
+            try:
+                store.put_written(key, writer)
+            except Exception as e:
+                print(f"Warning: Could not save state ({e})")
+    finally:
+        writer.discard()
+
 # ----------------------
 # AI integration
 # ----------------------
-def ai_call(prompt):
-    """Try OpenAI API; fallback to stub if unavailable"""
-    api_key = os.getenv("OPENAI_API_KEY")
-    if api_key:
-        openai.api_key = api_key
+class AIText(str):
+    """ai_call result labelled with where it came from: model, cache or stub"""
+
+    def __new__(cls, text, source):
+        obj = super().__new__(cls, text)
+        obj.source = source
+        return obj
+
+    def __reduce__(self):
+        return (AIText, (str(self), self.source))
+
+def chat_messages(prompt):
+    """The chat messages sent for prompt"""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+def _create_completion(client, prompt, span=metrics.NULL_SPAN, model=None, deadline=None,
+                       **kwargs):
+    """Send one chat completion through the rate limiter, retrying on 429s
+    and transient errors with jittered exponential backoff
+
+    Returns the response, or None once the caller should use the stub.
+    Retries are counted on span. model defaults to MODEL. deadline is the
+    number of seconds allowed from the first send (time spent waiting for
+    the rate limiter before it does not count); each attempt is sent with
+    the time left as its timeout.
+    """
+    import openai
+    from vibe_coding.ratelimit import MAX_RETRIES, backoff_delay, get_limiter, retry_after_seconds
+
+    limiter = get_limiter()
+    expires = None
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire(estimate_tokens(prompt) + COMPLETION_TOKENS)
+        if deadline is not None:
+            if expires is None:
+                expires = time.monotonic() + deadline
+            elif time.monotonic() >= expires:
+                print("OpenAI call missed its deadline — using stub.")
+                return None
+            kwargs["timeout"] = expires - time.monotonic()
         try:
-            response = openai.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": prompt}
-                ]
+            return client.chat.completions.create(
+                model=model or MODEL,
+                messages=chat_messages(prompt),
+                **kwargs
             )
-            return response.choices[0].message.content
-        except openai.error.RateLimitError:
-            print("AI quota exceeded — using stub.")
+        except openai.RateLimitError as e:
+            retry_after = retry_after_seconds(e)
+            if retry_after is not None:
+                limiter.pause(retry_after)
+            if attempt == MAX_RETRIES:
+                print("AI quota exceeded — using stub.")
+                return None
+            delay = backoff_delay(attempt, retry_after)
+        except (openai.APIConnectionError, openai.InternalServerError) as e:
+            if attempt == MAX_RETRIES:
+                print(f"OpenAI call failed ({e}) — using stub.")
+                return None
+            delay = backoff_delay(attempt)
         except Exception as e:
             print(f"OpenAI call failed ({e}) — using stub.")
+            return None
+        if expires is not None and time.monotonic() + delay >= expires:
+            print("OpenAI call missed its deadline — using stub.")
+            return None
+        span.add(retries=1)
+        time.sleep(delay)
+
+def _send(client, prompt, span, route, breaker, tokens):
+    """Send prompt to route within breaker.DEADLINE, hedging it once it is
+    slower than the route's usual latency for prompts of its size
+
+    Returns the response, or None once the caller should use the stub.
+    """
+    from vibe_coding.breaker import DEADLINE, hedged
+
+    def send():
+        return _create_completion(client, prompt, span, model=route.model, deadline=DEADLINE)
+
+    hedge_after = breaker.hedge_delay(tokens)
+    if hedge_after is None:
+        return send()
+    response, duplicated = hedged(send, hedge_after)
+    if duplicated:
+        span.add(hedges=1)
+    return response
+
+def _stub(prompt):
+    return AIText(prompt.split(".")[0] + ".", "stub")
+
+def _count_tokens(span, prompt, content, usage=None):
+    """Add token counts to span, from the API's usage report when present"""
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    span.add(
+        prompt_tokens=prompt_tokens if isinstance(prompt_tokens, int) else estimate_tokens(prompt),
+        completion_tokens=(completion_tokens if isinstance(completion_tokens, int)
+                           else estimate_tokens(content)),
+    )
+
+def _cache_lookup(cache, prompt, span, model=None):
+    """Look prompt up in the response cache (exact, then near-duplicate)"""
+    if not cache:
+        return None
+    found = cache.lookup(model or MODEL, SYSTEM_PROMPT, prompt)
+    if found.value is not None:
+        span.add(cache_hits=1, bytes_out=len(found.value))
+        if found.similarity is not None:
+            span.add(similar_hits=1)
+    return found
+
+def ai_call(prompt):
+    """Try the response cache, then OpenAI API; fallback to stub if unavailable
+
+    The cache also answers near duplicates of earlier prompts when
+    cache.SIMILAR_THRESHOLD is set.
+
+    API calls go through the shared rate limiter and are retried with
+    jittered exponential backoff on rate limits and transient errors,
+    within a per-call deadline; slow requests are hedged and a failing
+    API is skipped by a circuit breaker (see breaker.py). The model and
+    endpoint come from the router (see routing.py).
+    """
+    # Imported here so commands that never call the model start fast
+    from vibe_coding.breaker import get_breaker
+    from vibe_coding.cache import get_cache
+    from vibe_coding.client import get_client
+    from vibe_coding.routing import get_router
+
+    router = get_router()
+    route = router.choose(prompt)
+    with metrics.span("ai_call", route.model) as span:
+        span.add(bytes_in=len(prompt))
+        cache = get_cache()
+        found = _cache_lookup(cache, prompt, span, route.model)
+        if found and found.value is not None:
+            return AIText(found.value, "cache")
+
+        client = get_client(route.base_url, route.api_key_env)
+        breaker = get_breaker(route.name)
+        response = None
+        if client and not breaker.allow():
+            # The API keeps failing: skip straight to the fallback
+            span.add(short_circuits=1)
+        elif client:
+            tokens = estimate_tokens(prompt)
+            started = time.perf_counter()
+            response = _send(client, prompt, span, route, breaker, tokens)
+            seconds = time.perf_counter() - started
+            router.observe(route, seconds, failed=response is None)
+            breaker.record(response is not None, seconds, tokens)
+        if response is None:
+            stub = _stub(prompt)
+            span.add(stubs=1, bytes_out=len(stub))
+            return stub
+
+        content = response.choices[0].message.content
+        span.add(bytes_out=len(content))
+        _count_tokens(span, prompt, content, getattr(response, "usage", None))
+        # Only real model output is cached; stubs are cheap to recompute
+        if cache:
+            cache.put(found.key, content, found.sig)
+        return AIText(content, "model")
+
+def ai_call_stream(prompt):
+    """Like ai_call, but yield the response text in chunks as they arrive
+
+    The assembled text is cached once the stream completes. A stream that
+    breaks part-way keeps what was already yielded and is not cached.
+    Streams share ai_call's deadline (for the first chunk) and circuit
+    breaker but are not hedged.
+    """
+    from vibe_coding.breaker import DEADLINE, get_breaker
+    from vibe_coding.cache import get_cache
+    from vibe_coding.client import get_client
+    from vibe_coding.routing import get_router
+
+    router = get_router()
+    route = router.choose(prompt)
+    with metrics.span("ai_call_stream", route.model) as span:
+        span.add(bytes_in=len(prompt))
+        cache = get_cache()
+        found = _cache_lookup(cache, prompt, span, route.model)
+        if found and found.value is not None:
+            yield AIText(found.value, "cache")
+            return
+
+        client = get_client(route.base_url, route.api_key_env)
+        breaker = get_breaker(route.name)
+        stream = None
+        if client and not breaker.allow():
+            span.add(short_circuits=1)
+        elif client:
+            started = time.perf_counter()
+            stream = _create_completion(client, prompt, span, model=route.model,
+                                        deadline=DEADLINE, stream=True)
+            if stream is None:
+                router.observe(route, time.perf_counter() - started, failed=True)
+                breaker.record(False)
+        if stream is None:
+            span.add(stubs=1)
+            yield _stub(prompt)
+            return
+
+        parts = []
+        try:
+            for event in stream:
+                delta = event.choices[0].delta.content if event.choices else None
+                if delta:
+                    parts.append(delta)
+                    span.add(bytes_out=len(delta))
+                    yield AIText(delta, "model")
+        except Exception as e:
+            print(f"\nOpenAI stream interrupted ({e}).")
+            span.add(errors=1)
+            router.observe(route, time.perf_counter() - started, failed=True)
+            breaker.record(False)
+            if not parts:
+                span.add(stubs=1)
+                yield _stub(prompt)
+            return
 
-    # Stub fallback
-    return prompt.split(".")[0] + "."
+        content = "".join(parts)
+        router.observe(route, time.perf_counter() - started)
+        # Streams are not hedged, so their latencies are not kept for it
+        breaker.record(True)
+        _count_tokens(span, prompt, content)
+        if cache:
+            cache.put(found.key, content, found.sig)
+
+def join_stream(chunks, out=None):
+    """Write chunks to out (stdout by default) as they arrive; return the full AIText"""
+    out = out or sys.stdout
+    parts = []
+    source = "model"
+    for chunk in chunks:
+        out.write(chunk)
+        out.flush()
+        parts.append(chunk)
+        source = getattr(chunk, "source", source)
+    out.write("\n")
+    return AIText("".join(parts), source)
+
+def model_settings():
+    """Settings that change model output, for incremental-run fingerprints"""
+    from vibe_coding.routing import get_router
+
+    settings = {"model": MODEL, "system_prompt": SYSTEM_PROMPT, "summarizer": SUMMARIZER}
+    routes = get_router().settings()
+    if routes:
+        settings["routes"] = routes
+    return settings
+
+def estimate_tokens(text):
+    """Cheap local token estimate (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+def carry_context(fn):
+    """Wrap fn to run with the calling thread's context variables
+
+    Pool threads do not inherit them, so per-job settings such as the
+    daemon's output target would be lost. Each call runs in its own copy,
+    so the wrapper may run in several threads at once.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+# ----------------------
+# Async AI integration
+# ----------------------
+_executor = None
+_executor_lock = threading.Lock()
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def set_concurrency(limit):
+    """Set how many blocking AI calls may be in flight at once"""
+    global AI_CONCURRENCY, _executor
+    with _executor_lock:
+        AI_CONCURRENCY = max(1, int(limit))
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = None
+        _semaphores.clear()
+
+
+def _get_executor():
+    global _executor
+    from concurrent.futures import ThreadPoolExecutor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=AI_CONCURRENCY,
+                                           thread_name_prefix="ai_call")
+        return _executor
+
+
+async def run_limited(fn, *args):
+    """Run a blocking function in the AI worker pool, at most AI_CONCURRENCY at a time"""
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(AI_CONCURRENCY)
+    async with semaphore:
+        return await loop.run_in_executor(_get_executor(), carry_context(fn), *args)
+
+
+async def ai_call_async(prompt):
+    """Asyncio version of ai_call, bounded by the concurrency limit"""
+    return await run_limited(ai_call, prompt)
 
 # ----------------------
 # Tool registry and decorator
 # ----------------------
-TOOLS = {}
+class _LazyTool(dict):
+    """Manifest entry whose functions are imported on first use"""
+
+    def __missing__(self, key):
+        if key not in ("fn", "stream", "prompt", "consume"):
+            raise KeyError(key)
+        importlib.import_module(self["module"])
+        # Importing the module re-registers the tool with its real functions
+        value = TOOLS[self["name"]][key]
+        self[key] = value
+        return value
+
+    def __contains__(self, key):
+        if key == "fn":
+            return True
+        if key == "stream":
+            return dict.get(self, "streaming", False)
+        if key == "prompt":
+            return dict.get(self, "batchable", False)
+        if key == "consume":
+            return dict.get(self, "consumes", False)
+        return dict.__contains__(self, key)
 
-def tool(name, description="", inputs=None, outputs=None):
-    """Decorator to register a tool with metadata"""
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+
+def _load_manifest():
+    """Register every manifest tool without importing its module"""
+    from vibe_coding.tools import MANIFEST
+
+    return {name: _LazyTool(meta, name=name) for name, meta in MANIFEST.items()}
+
+
+TOOLS = _load_manifest()
+
+def tool(name, description="", inputs=None, outputs=None, cpu_bound=False, version=1,
+         uses_model=False, split_on=None):
+    """Decorator to register a tool with metadata
+
+    cpu_bound tools may be run in a worker process instead of a thread;
+    with split_on (a character the text input may be cut after without
+    changing the result, which must be a list), a large input is also
+    partitioned across worker processes (see workers.py).
+    Bump version whenever a change alters the tool's output, so
+    incremental runs do not reuse results from the old code; uses_model
+    tools are also re-run when model_settings() change. Calls are timed
+    by the metrics layer (a flag check while it is off).
+    """
     def wrapper(func):
+        # Returned in place of func so worker processes can unpickle it by name
+        func = metrics.instrument("tool", name, func)
         TOOLS[name] = {
             "fn": func,
             "description": description,
             "inputs": inputs or [],
-            "outputs": outputs or []
+            "outputs": outputs or [],
+            "cpu_bound": cpu_bound,
+            "version": version,
+            "uses_model": uses_model,
+            "split_on": split_on,
         }
         return func
     return wrapper
+
+def tool_stream(name):
+    """Decorator to register a streaming variant of an existing tool
+
+    The function takes the same inputs and yields text chunks.
+    """
+    def wrapper(func):
+        TOOLS[name]["stream"] = func
+        return func
+    return wrapper
+
+def tool_consume(name):
+    """Decorator to register a variant of a tool that consumes a stream
+
+    The function takes an iterator (or async iterator) of text chunks in
+    place of the tool's text input and yields the result's items as soon
+    as they are complete, so a pipelined orchestrator run can start it
+    before the upstream stage has finished.
+    """
+    def wrapper(func):
+        TOOLS[name]["consume"] = func
+        return func
+    return wrapper
+
+def tool_prompt(name):
+    """Decorator to register how a tool maps its inputs to one model prompt
+
+    The function returns the prompt, or None when the inputs need more
+    than one model call. `agent batch` uses it to submit calls in bulk.
+    """
+    def wrapper(func):
+        TOOLS[name]["prompt"] = func
+        return func
+    return wrapper
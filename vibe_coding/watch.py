@@ -0,0 +1,284 @@
+"""`agent watch`: run tools on what was appended to growing files
+
+Each watched file is tracked by (device, inode) and a byte offset saved
+in state, so a run, or a restart after Ctrl-C, reads only bytes appended
+since the last one. Text is processed up to the last complete sentence
+or line; an unfinished tail is read again once it is finished.
+
+Rotation (the path now names a new file) drains the rest of the old file
+first, from the open handle or by finding the renamed file by inode, then
+starts the new file at 0. Truncation (the file shrank below the offset)
+restarts it at 0. Changes are noticed with inotify on Linux and by
+polling elsewhere, so the cost follows the rate of new data rather than
+the size of the files.
+"""
+import os
+import select
+import time
+from vibe_coding.fanout import expand_inputs
+from vibe_coding.utils import TOOLS, transact_state, get_state
+
+# State keys: {abs path: {"dev", "inode", "offset"}} and the latest
+# {abs path: {tool: result}} produced from each file's new content
+OFFSETS_KEY = "watch_offsets"
+RESULTS_KEY = "watch_results"
+
+# Seconds between checks when polling (and the longest wait with inotify)
+POLL_INTERVAL = float(os.getenv("AGENT_WATCH_INTERVAL", 1.0))
+
+# Most bytes processed at once; a larger backlog is handled in pieces
+READ_SIZE = 1 << 20
+
+_BOUNDARIES = (b".", b"\n")
+
+
+# ----------------------
+# Following one file
+# ----------------------
+class Tail:
+    """Follow one path across appends, truncation and rotation"""
+
+    def __init__(self, path, record=None):
+        self.path = path
+        self.key = os.path.abspath(path)
+        record = record or {}
+        self.identity = (record.get("dev"), record.get("inode"))
+        self.offset = record.get("offset", 0)
+        self.file = None
+
+    def record(self):
+        """The state entry for this file"""
+        return {"dev": self.identity[0], "inode": self.identity[1], "offset": self.offset}
+
+    def poll(self, process):
+        """Call process(text) for each complete piece appended since the last poll
+
+        The offset only moves past text once process returns, and is
+        saved to state after each piece.
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None  # rotated away and not recreated yet
+
+        if st is not None and (st.st_dev, st.st_ino) == self.identity:
+            if st.st_size < self.offset:
+                print(f"{self.path}: truncated, reading from the start")
+                self._close()
+                self.offset = 0
+                self._save()
+        else:
+            # A different file (or none) is at the path now; finish the old one
+            if self.identity != (None, None):
+                self._drain_rotated(process)
+            self._close()
+            self.identity = (st.st_dev, st.st_ino) if st else (None, None)
+            self.offset = 0
+            self._save()
+            if st is None:
+                return
+
+        self._read(process, st.st_size)
+
+    def _open(self):
+        if self.file is None:
+            self.file = open(self.path, "rb")
+            # The path may have been replaced between stat() and open()
+            st = os.fstat(self.file.fileno())
+            if (st.st_dev, st.st_ino) != self.identity:
+                self._close()
+                return None
+        return self.file
+
+    def _close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _read(self, process, size, final=False):
+        """Process bytes from offset up to size, in pieces of at most READ_SIZE"""
+        f = self.file if final else self._open()
+        if f is None:
+            return
+        while self.offset < size:
+            f.seek(self.offset)
+            data = f.read(min(READ_SIZE, size - self.offset))
+            if not data:
+                return
+            end = len(data)
+            if not final:
+                # Leave an unfinished sentence for the next poll, unless a
+                # whole piece has no boundary at all
+                end = max(data.rfind(boundary) for boundary in _BOUNDARIES) + 1
+                if end == 0:
+                    if len(data) < READ_SIZE:
+                        return
+                    end = len(data)
+            text = data[:end].decode("utf-8", "replace")
+            if text.strip():
+                process(self.path, text)
+            self.offset += end
+            self._save()
+
+    def _drain_rotated(self, process):
+        """Process what is left of the file this path used to name"""
+        if self.file is None:
+            self.file = _find_by_inode(os.path.dirname(self.key), self.identity)
+        if self.file is not None:
+            print(f"{self.path}: rotated, finishing the previous file")
+            self._read(process, os.fstat(self.file.fileno()).st_size, final=True)
+            self._close()
+
+    def _save(self):
+        record = self.record()
+
+        def merge(state):
+            return {OFFSETS_KEY: {**state.get(OFFSETS_KEY, {}), self.key: record}}
+
+        transact_state(merge)
+
+
+def _find_by_inode(directory, identity):
+    """Open the file in directory with the given (dev, inode), e.g. app.log.1"""
+    try:
+        entries = list(os.scandir(directory or "."))
+    except OSError:
+        return None
+    for entry in entries:
+        try:
+            if entry.inode() == identity[1] and entry.is_file():
+                f = open(entry.path, "rb")
+                st = os.fstat(f.fileno())
+                if (st.st_dev, st.st_ino) == identity:
+                    return f
+                f.close()
+        except OSError:
+            continue
+    return None
+
+
+# ----------------------
+# Change notification
+# ----------------------
+class Inotify:
+    """Minimal Linux inotify wrapper (via ctypes) that wakes on directory changes"""
+
+    # IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    # | IN_CREATE | IN_DELETE
+    MASK = 0x002 | 0x004 | 0x008 | 0x040 | 0x080 | 0x100 | 0x200
+
+    def __init__(self, libc, fd):
+        self.libc = libc
+        self.fd = fd
+        self.watched = set()
+
+    @classmethod
+    def create(cls):
+        """Return an Inotify, or None where inotify is unavailable"""
+        try:
+            import ctypes
+            import ctypes.util
+
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError, TypeError):
+            return None
+        if fd < 0:
+            return None
+        return cls(libc, fd)
+
+    def add(self, directory):
+        """Watch a directory for changes to the files in it"""
+        directory = os.path.abspath(directory)
+        if directory not in self.watched and os.path.isdir(directory):
+            if self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK) >= 0:
+                self.watched.add(directory)
+
+    def wait(self, timeout):
+        """Block until something changed or timeout passed; True on changes"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        # Drain queued events; which file changed is found by polling them all
+        try:
+            while os.read(self.fd, 1 << 16):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _watched_dirs(patterns):
+    """Directories whose changes can affect the watched patterns"""
+    dirs = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            dirs.add(pattern)
+        else:
+            dirs.add(os.path.dirname(pattern.split("*")[0]) or ".")
+    return dirs
+
+
+# ----------------------
+# Watch loop
+# ----------------------
+class Watcher:
+    """Run tools on the new content of every file matched by patterns"""
+
+    def __init__(self, patterns, tools=("todo",), interval=None):
+        self.patterns = patterns
+        self.tools = list(tools)
+        self.interval = POLL_INTERVAL if interval is None else interval
+        self.tails = {}
+        records = get_state(OFFSETS_KEY, {})
+        self.records = records if isinstance(records, dict) else {}
+
+    def scan(self):
+        """Poll every matched file once"""
+        for path in expand_inputs(self.patterns):
+            key = os.path.abspath(path)
+            tail = self.tails.get(key)
+            if tail is None:
+                if not os.path.isfile(path):
+                    continue
+                tail = self.tails[key] = Tail(path, self.records.get(key))
+            tail.poll(self.process)
+
+    def process(self, path, text):
+        """Run the tools on one piece of new text, print and save the results"""
+        results = {name: TOOLS[name]["fn"](text) for name in self.tools}
+        print(f"==> {path} (+{len(text.encode('utf-8'))} bytes) <==")
+        for name, result in results.items():
+            print("\n".join(result) if isinstance(result, list) else result)
+        key = os.path.abspath(path)
+
+        def merge(state):
+            merged = state.get(RESULTS_KEY, {}).copy()
+            merged[key] = results
+            return {RESULTS_KEY: merged}
+
+        transact_state(merge)
+
+    def run(self, once=False):
+        """Process new content now, then (unless once) whenever files change"""
+        notifier = None if once else Inotify.create()
+        if notifier:
+            for directory in _watched_dirs(self.patterns):
+                notifier.add(directory)
+        try:
+            while True:
+                self.scan()
+                if once:
+                    return
+                if notifier:
+                    notifier.wait(self.interval)
+                else:
+                    time.sleep(self.interval)
+        finally:
+            if notifier:
+                notifier.close()
+            for tail in self.tails.values():
+                tail._close()
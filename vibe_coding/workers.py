@@ -0,0 +1,145 @@
+"""Worker-process pool for cpu_bound tools, with partitioned inputs
+
+A cpu_bound tool registered with split_on (a character its input may be
+cut after without changing the result, e.g. "." for todo) can spread one
+large input over several processes. The input is cut into byte ranges
+ending just after split_on. Each range goes to a worker as (tool, path,
+start, end), and the per-range result lists are concatenated in order.
+Workers read their own range from the file, so the text itself is never
+pickled; text that is only in memory is spilled to one temporary file.
+
+Set the pool size with `agent --workers N` or AGENT_WORKERS; with one
+worker, inputs are not partitioned and pipeline stages stay in-process.
+"""
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from vibe_coding.utils import TOOLS
+
+WORKERS = max(1, int(os.getenv("AGENT_WORKERS", 1)))
+
+# Inputs smaller than this are not partitioned; cutting and dispatching
+# them costs more than it saves
+PARTITION_MIN_BYTES = int(os.getenv("AGENT_PARTITION_MIN_BYTES", 4 << 20))
+
+# Ranges per worker, so one slow range does not leave the other cores idle
+PARTITIONS_PER_WORKER = 4
+
+# Bytes read at a time while looking for the next split_on after a cut
+_SEARCH_SIZE = 1 << 16
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def configure(workers):
+    """Set the number of worker processes; the pool is rebuilt on next use"""
+    global WORKERS, _pool
+    with _pool_lock:
+        WORKERS = max(1, workers)
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+
+def get_pool():
+    """Return the shared process pool of WORKERS processes"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=WORKERS)
+        return _pool
+
+
+def can_partition(name, size):
+    """True if tool name should run on an input of size bytes in pieces"""
+    entry = TOOLS[name]
+    return (WORKERS > 1 and size >= PARTITION_MIN_BYTES
+            and entry.get("cpu_bound") and bool(entry.get("split_on")))
+
+
+# ----------------------
+# Partitioning
+# ----------------------
+def partition_file(path, split_on, parts):
+    """Cut a file into at most parts (start, end) byte ranges ending after split_on"""
+    size = os.path.getsize(path)
+    marker = split_on.encode("utf-8")
+    ranges = []
+    start = 0
+    with open(path, "rb") as f:
+        for i in range(1, parts):
+            cut = max(start, size * i // parts)
+            cut = _next_boundary(f, cut, marker, size)
+            if cut >= size:
+                break
+            if cut > start:
+                ranges.append((start, cut))
+                start = cut
+    ranges.append((start, size))
+    return ranges
+
+
+def _next_boundary(f, position, marker, size):
+    """The offset just after the first marker at or after position (size if none)"""
+    f.seek(position)
+    while position < size:
+        window = f.read(_SEARCH_SIZE + len(marker) - 1)
+        found = window.find(marker)
+        if found >= 0:
+            return position + found + len(marker)
+        if len(window) <= len(marker):
+            break
+        position += len(window) - (len(marker) - 1)
+        f.seek(position)
+    return size
+
+
+# ----------------------
+# Running
+# ----------------------
+def _run_range(name, path, start, end):
+    """Worker side: run tool name on one byte range of path"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    text = data.decode("utf-8", "replace")
+    if "\r" in text:
+        # Match the newline translation of reading the file in text mode
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return TOOLS[name]["fn"](text)
+
+
+def run_file(name, path):
+    """Run tool name on a file in worker processes and return its result
+
+    Large files are partitioned when the tool allows it; ranges are
+    merged in file order.
+    """
+    size = os.path.getsize(path)
+    if can_partition(name, size):
+        ranges = partition_file(path, TOOLS[name]["split_on"], WORKERS * PARTITIONS_PER_WORKER)
+    else:
+        ranges = [(0, size)]
+
+    pool = get_pool()
+    futures = [pool.submit(_run_range, name, path, start, end) for start, end in ranges]
+    results = [future.result() for future in futures]
+    if len(results) == 1:
+        return results[0]
+    merged = []
+    for result in results:
+        merged.extend(result)
+    return merged
+
+
+def run_text(name, text):
+    """Run tool name on in-memory text, partitioned across worker processes"""
+    fd, path = tempfile.mkstemp(prefix="agent-", suffix=".txt")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(text.encode("utf-8"))
+        return run_file(name, path)
+    finally:
+        os.remove(path)
@@ -0,0 +1,119 @@
+"""Durable work queue for resumable `orchestrate --manifest` runs
+
+Every input of a manifest has its own state key holding its status
+(pending, running, done or failed) and a checkpoint of the stage results
+finished so far, so each write is one small append that never reads the log (an item is
+only ever handled by one job at a time, so its copy in memory is
+authoritative). A run that crashes
+or is interrupted leaves its items in place; running the same command
+again skips done items and restarts the others from their last
+checkpoint, so a failure costs at most the stages of the items in flight.
+"""
+import hashlib
+import json
+import os
+from vibe_coding.utils import load_state, update_state
+
+# State keys are "<QUEUE_KEY>:<job id>" for the job header and
+# "<QUEUE_KEY>:<job id>:<input path>" for each item
+QUEUE_KEY = "orchestrate_queue"
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def read_manifest(path):
+    """Return the inputs listed in a manifest: one path, glob or directory per line
+
+    Blank lines and lines starting with # are skipped; relative paths are
+    relative to the manifest.
+    """
+    from vibe_coding.fanout import expand_inputs
+
+    base = os.path.dirname(path)
+    patterns = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                patterns.append(os.path.join(base, line))
+    return expand_inputs(patterns)
+
+
+class WorkQueue:
+    """The items of one manifest run and their checkpoints, kept in state"""
+
+    def __init__(self, manifest, pipeline):
+        self.manifest = os.path.abspath(manifest)
+        self.job_id = hashlib.sha256(self.manifest.encode("utf-8")).hexdigest()[:16]
+        self.header_key = f"{QUEUE_KEY}:{self.job_id}"
+        self.pipeline = json.loads(json.dumps(pipeline))
+        self.items = {}
+
+    def _key(self, path):
+        return f"{self.header_key}:{path}"
+
+    def open(self, paths, restart=False):
+        """Load saved items and add new paths as pending
+
+        Returns True when earlier progress was kept. A saved run with a
+        different pipeline, or restart, starts over.
+        """
+        state = load_state()
+        header = state.get(self.header_key)
+        resumed = header is not None and not restart and header.get("pipeline") == self.pipeline
+        if header is not None and not resumed:
+            self.clear()
+            state = {}
+        self.items = {}
+        for path in paths:
+            item = state.get(self._key(path))
+            # copy() leaves checkpointed results stored as blobs unloaded
+            self.items[path] = item.copy() if item else {"status": PENDING, "stages": {}}
+        update_state({self.header_key: {"manifest": self.manifest, "pipeline": self.pipeline,
+                                        "total": len(paths)}})
+        return resumed
+
+    def count(self, status):
+        return sum(1 for item in self.items.values() if item["status"] == status)
+
+    def remaining(self):
+        """Paths not done yet, in manifest order"""
+        return [path for path, item in self.items.items() if item["status"] != DONE]
+
+    def checkpoints(self, path):
+        """{stage: result} saved for path by earlier attempts"""
+        return dict(self.items[path].get("stages") or {})
+
+    def _save(self, path, **changes):
+        item = self.items[path].copy()
+        item.update(changes)
+        self.items[path] = item
+        update_state({self._key(path): item})
+
+    def start(self, path):
+        self._save(path, status=RUNNING)
+
+    def checkpoint(self, path, stage, result):
+        """Save one finished stage's result for path"""
+        # Stub fallbacks are not kept, so a resumed run retries the model
+        if getattr(result, "source", None) == "stub":
+            return
+        stages = (self.items[path].get("stages") or {}).copy()
+        stages[stage] = result
+        self._save(path, stages=stages)
+
+    def finish(self, path, seconds):
+        self._save(path, status=DONE, seconds=seconds, error=None)
+
+    def fail(self, path, error):
+        self._save(path, status=FAILED, error=str(error))
+
+    def clear(self):
+        """Remove the job and all of its items from state"""
+        prefix = self.header_key
+        state = load_state()
+        update_state({}, deleted=[key for key in state
+                                  if key == prefix or key.startswith(prefix + ":")])